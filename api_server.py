@@ -2,9 +2,12 @@ from flask import Flask, request, jsonify, send_file, Response, redirect
 from flask_cors import CORS
 import os
 import logging
+import mimetypes
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional, Union
 import json
+from config import CHANNELS
 from database import DatabaseManager
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, decode_token
 from flask_limiter import Limiter
@@ -80,6 +83,8 @@ def get_posts():
         status = request.args.get('status')
         limit = int(request.args.get('limit', 50))
         offset = int(request.args.get('offset', 0))
+        # One representative per story cluster unless ?grouped=false
+        grouped = request.args.get('grouped', 'true').lower() != 'false'
         
         # Validate parameters
         if limit > 100:
@@ -87,7 +92,7 @@ def get_posts():
         if limit < 1:
             limit = 1
             
-        posts = db.get_posts(status=status, limit=limit, offset=offset)
+        posts = db.get_posts(status=status, limit=limit, offset=offset, group_clusters=grouped)
         
         return jsonify({
             'success': True,
@@ -96,7 +101,8 @@ def get_posts():
             'filters': {
                 'status': status,
                 'limit': limit,
-                'offset': offset
+                'offset': offset,
+                'grouped': grouped
             }
         })
         
@@ -134,6 +140,115 @@ def get_post(post_id: int):
             'error': str(e)
         }), 500
 
+@app.route('/api/posts/<int:post_id>/media', methods=['POST'])
+@jwt_required()
+@limiter.limit("30 per minute")
+def fetch_post_media(post_id: int):
+    """Queue a download of a rejected post's media; the bot worker picks it up"""
+    try:
+        post = db.get_post_media(post_id)
+        if not post:
+            return jsonify({
+                'success': False,
+                'error': 'Post not found'
+            }), 404
+
+        if post['media_path']:
+            return jsonify({
+                'success': True,
+                'media_path': post['media_path'],
+                'message': 'Media already downloaded'
+            })
+
+        if not post['media_ref']:
+            return jsonify({
+                'success': False,
+                'error': 'Post has no media to fetch'
+            }), 400
+
+        job_id = db.create_media_fetch_job(post_id)
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': f'Media fetch queued for post {post_id}'
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error queueing media fetch for post {post_id}: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/media-jobs', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+def get_media_fetch_jobs():
+    """Get media fetch jobs with their status"""
+    try:
+        status = request.args.get('status')
+        jobs = db.get_media_fetch_jobs(statuses=[status] if status else None)
+
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'count': len(jobs)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting media fetch jobs: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/llm-retries', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+def get_llm_retries():
+    """Get messages parked while GPT was unavailable, with counts by status"""
+    try:
+        status = request.args.get('status')
+        jobs = db.get_llm_retries(statuses=[status] if status else None)
+        for job in jobs:
+            job.pop('candidate', None)
+
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'counts': db.get_llm_retry_counts(),
+            'count': len(jobs)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting LLM retries: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/llm-retries/requeue', methods=['POST'])
+@jwt_required()
+@limiter.limit("10 per minute")
+def requeue_llm_retries():
+    """Retry parked messages that ran out of attempts"""
+    try:
+        requeued = db.requeue_failed_llm_retries(time.time())
+
+        return jsonify({
+            'success': True,
+            'requeued': requeued,
+            'message': f'{requeued} messages requeued'
+        })
+
+    except Exception as e:
+        logger.error(f"Error requeueing LLM retries: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/posts/<int:post_id>/action', methods=['POST'])
 @jwt_required()
 @limiter.limit("50 per minute")
@@ -327,11 +442,25 @@ def get_stats():
             'error': str(e)
         }), 500
 
+def pick_thumbnail(stored: Dict[str, Any], width: int) -> tuple:
+    """(path, etag) of the smallest thumbnail at least width wide.
+
+    Photos fall back to the original; videos to their largest thumbnail,
+    since the point of asking for a width is not to download the video.
+    """
+    widths = sorted(stored['thumbnails'])
+    chosen = next((w for w in widths if w >= width), None)
+    if chosen is None:
+        if (mimetypes.guess_type(stored['path'])[0] or '').startswith('image/'):
+            return stored['path'], stored['hash']
+        chosen = widths[-1]
+    return stored['thumbnails'][chosen], f"{stored['hash']}-w{chosen}"
+
 @app.route('/api/media/<path:filename>', methods=['GET'])
 @jwt_required()
-@limiter.limit("100 per minute")
+@limiter.limit("600 per minute")  # Video scrubbing sends a Range request per seek
 def serve_media(filename):
-    """Serve media files"""
+    """Serve media files; ?w=<width> returns a thumbnail of stored media"""
     try:
         # Security check - only allow files in media directory
         if '..' in filename or filename.startswith('/'):
@@ -343,6 +472,20 @@ def serve_media(filename):
         else:
             media_path = os.path.join('media', filename)
             
+        # Files in the media store are found through its index. A stored path
+        # never changes content, so its hash is a strong ETag and clients may
+        # cache it for good; send_file answers Range and If-None-Match requests
+        stored = db.get_media_file(media_path)
+        if stored:
+            path, etag = stored['path'], stored['hash']
+            width = request.args.get('w', type=int)
+            if width and stored['thumbnails']:
+                path, etag = pick_thumbnail(stored, width)
+            response = send_file(path, etag=etag, conditional=True)
+            response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+            return response
+        
+        # Files saved before the media store existed
         if os.path.exists(media_path):
             return send_file(media_path)
         else:
@@ -704,6 +847,87 @@ def cleanup_posts():
             'error': str(e)
         }), 500
 
+@app.route('/api/backfill', methods=['POST'])
+@jwt_required()
+@limiter.limit("10 per minute")
+def create_backfill():
+    """Queue a history backfill for a channel; the bot worker picks it up"""
+    try:
+        data = request.get_json() or {}
+        channel = data.get('channel')
+        since = data.get('since')
+        from_message_id = data.get('from_message_id')
+
+        if not channel or not (since or from_message_id):
+            return jsonify({
+                'success': False,
+                'error': 'channel and one of since/from_message_id are required'
+            }), 400
+
+        if channel not in CHANNELS:
+            return jsonify({
+                'success': False,
+                'error': f'Unknown channel: {channel}'
+            }), 400
+
+        if from_message_id is not None:
+            try:
+                from_message_id = int(from_message_id)
+            except (TypeError, ValueError):
+                return jsonify({
+                    'success': False,
+                    'error': 'from_message_id must be an integer'
+                }), 400
+
+        if since:
+            try:
+                since_date = datetime.fromisoformat(since)
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'since must be an ISO 8601 date'
+                }), 400
+            if since_date.tzinfo is None:
+                since_date = since_date.replace(tzinfo=timezone.utc)
+            since = since_date.isoformat()
+
+        job_id = db.create_backfill_job(channel, since, from_message_id or None)
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': f'Backfill queued for {channel}'
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error creating backfill job: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/backfill', methods=['GET'])
+@jwt_required()
+@limiter.limit("100 per minute")
+def get_backfill_jobs():
+    """Get backfill jobs with their progress"""
+    try:
+        status = request.args.get('status')
+        jobs = db.get_backfill_jobs(statuses=[status] if status else None)
+
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'count': len(jobs)
+        })
+
+    except Exception as e:
+        logger.error(f"Error getting backfill jobs: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
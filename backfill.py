@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Backfill channel history after downtime.
+
+Jobs live in the backfill_jobs table, so they can be queued from the API or
+this CLI and resume from their last completed page after a restart. Each page
+of BACKFILL_PAGE_SIZE messages costs one history request and one bulk
+existence query; new messages go through the normal ingestion pipeline and
+pages are spaced BACKFILL_PAGE_DELAY seconds apart. The saved resume point
+stays below messages that failed, so a job with failures ends as 'failed'
+and --resume processes them again. An album cut off at the end of a page
+waits for the next page and is published as one post.
+
+Usage:
+    python backfill.py --channel conflict_tr --since 2026-10-17T06:00
+    python backfill.py --channel conflict_tr --from-id 12345
+    python backfill.py --resume
+    python backfill.py --status
+"""
+
+import argparse
+import asyncio
+import time
+import traceback
+from datetime import datetime, timezone
+from config import *
+from bot import db
+from ingest import IngestPipeline, fetch_page, governor, group_albums, peers
+from utils import get_sent_hashes
+
+def parse_start_date(value):
+    """Parse an ISO date; naive values are taken as UTC"""
+    start = datetime.fromisoformat(value)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return start
+
+async def run_backfill_job(client, job, sent_hashes):
+    """Page through a channel's history from the job's resume point"""
+    channel = job['channel_name']
+    info = CHANNELS.get(channel)
+    if info is None:
+        await asyncio.to_thread(db.update_backfill_job, job['id'], status='failed', error='Unknown channel')
+        print(f"❌ [BACKFILL] Bilinmeyen kanal: {channel}")
+        return
+
+    await asyncio.to_thread(db.update_backfill_job, job['id'], status='running')
+    offset_id = job['last_message_id'] or job['start_message_id'] or 0
+    offset_date = parse_start_date(job['start_date']) if not offset_id and job['start_date'] else None
+    processed = job['processed'] or 0
+    skipped = job['skipped'] or 0
+    # Messages that failed earlier lie above the resume point and are retried, so they are not counted again
+    failed_ids = set()
+    # Trailing album members of a full page, held back until the rest of the album is fetched
+    carry = []
+    started = time.monotonic()
+    entity = await peers.get_input_channel(client, channel)
+
+    print(f"[BACKFILL] #{job['id']} {channel} başlıyor (offset_id={offset_id}, tarih={offset_date})")
+
+    async with IngestPipeline(client, sent_hashes) as pipeline:
+        while True:
+            # With reverse=True Telethon returns messages newer than the offset, oldest first
+            kwargs = {'reverse': True}
+            if offset_id:
+                kwargs['offset_id'] = offset_id
+            elif offset_date:
+                kwargs['offset_date'] = offset_date
+            page = await fetch_page(client, entity, **kwargs)
+            messages, carry = carry + page, []
+            grouped_id = getattr(page[-1], 'grouped_id', None) if len(page) == BACKFILL_PAGE_SIZE else None
+            while grouped_id is not None and messages and getattr(messages[-1], 'grouped_id', None) == grouped_id:
+                carry.insert(0, messages.pop())
+            if not messages and not carry:
+                break
+
+            existing = await asyncio.to_thread(
+                db.get_existing_message_ids, [f"{channel}_{message.id}" for message in messages]
+            )
+            for message, album in group_albums(messages):
+                if f"{channel}_{message.id}" in existing:
+                    skipped += 1
+                    continue
+                await pipeline.put(IngestPipeline.make_job(channel, info, message, album, min_age=0, check_db=False))
+                processed += 1
+
+            await pipeline.join()
+            failed_ids |= pipeline.failed.pop(channel, set())
+            if page:
+                offset_id = page[-1].id
+            # Resume below failed messages and held-back album members so they are fetched again
+            resume_id = min([offset_id] + [message.id - 1 for message in carry[:1]] +
+                            [message_id - 1 for message_id in failed_ids])
+            await asyncio.to_thread(
+                db.update_backfill_job, job['id'],
+                last_message_id=resume_id, processed=processed, skipped=skipped, failed=len(failed_ids)
+            )
+
+            rate = processed / max(time.monotonic() - started, 1e-6)
+            print(f"[BACKFILL] #{job['id']} {channel}: son id {offset_id}, {processed} işlendi, "
+                  f"{skipped} zaten kayıtlı, {len(failed_ids)} hata ({rate:.1f} msg/s)")
+
+            if len(page) < BACKFILL_PAGE_SIZE:
+                break
+            await asyncio.sleep(BACKFILL_PAGE_DELAY)
+
+    if failed_ids:
+        # Kept out of the worker's loop; --resume retries the failed messages from last_message_id
+        await asyncio.to_thread(db.update_backfill_job, job['id'], status='failed',
+                                error=f"{len(failed_ids)} messages failed")
+        print(f"⚠️ [BACKFILL] #{job['id']} {channel}: {len(failed_ids)} mesaj işlenemedi, "
+              f"--resume ile yeniden denenebilir.")
+        return
+    await asyncio.to_thread(db.update_backfill_job, job['id'], status='done')
+    print(f"✅ [BACKFILL] #{job['id']} {channel} tamamlandı: {processed} işlendi, {skipped} atlandı.")
+
+async def run_pending_backfills(client):
+    """Run queued jobs and resume interrupted ones, oldest first"""
+    jobs = await asyncio.to_thread(db.get_backfill_jobs, ['running', 'queued'])
+    if not jobs:
+        return 0
+
+    sent_hashes = await asyncio.to_thread(get_sent_hashes)
+    for job in jobs:
+        try:
+            await run_backfill_job(client, job, sent_hashes)
+        except Exception as e:
+            print(f"❌ [BACKFILL] #{job['id']} hata:", e)
+            traceback.print_exc()
+            # Left as 'running' with its progress so the next pass resumes it
+            await asyncio.to_thread(db.update_backfill_job, job['id'], error=str(e))
+    return len(jobs)
+
+async def backfill_worker(client):
+    """Background task that picks up backfill jobs queued through the API"""
+    while True:
+        try:
+            await run_pending_backfills(client)
+        except Exception as e:
+            print("❌ [BACKFILL] Worker hatası:", e)
+            traceback.print_exc()
+        await asyncio.sleep(BACKFILL_POLL_INTERVAL)
+
+def print_status():
+    for job in db.get_backfill_jobs():
+        print(f"#{job['id']} {job['channel_name']:<20} {job['status']:<8} "
+              f"son id={job['last_message_id']} işlendi={job['processed']} "
+              f"atlandı={job['skipped']} hata={job['failed']} {job['error'] or ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill Telegram channel history")
+    parser.add_argument('--channel', help="Channel to backfill (key in CHANNELS)")
+    parser.add_argument('--since', help="Start date, ISO format (UTC if no offset)")
+    parser.add_argument('--from-id', type=int, help="Start after this message id")
+    parser.add_argument('--resume', action='store_true', help="Resume queued/interrupted jobs and retry failed ones only")
+    parser.add_argument('--status', action='store_true', help="Show job progress and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return
+
+    if args.resume:
+        # Jobs that finished with failed messages continue from below the first of them
+        for job in db.get_backfill_jobs(['failed']):
+            db.update_backfill_job(job['id'], status='queued', error=None)
+    else:
+        if not args.channel or not (args.since or args.from_id):
+            parser.error("--channel and one of --since/--from-id are required")
+        if args.channel not in CHANNELS:
+            parser.error(f"Unknown channel: {args.channel}")
+        since = parse_start_date(args.since).isoformat() if args.since else None
+        job_id = db.create_backfill_job(args.channel, since, args.from_id)
+        print(f"[BACKFILL] İş #{job_id} oluşturuldu.")
+
+    # Importing main connects the shared Telegram session
+    from main import client
+    governor.install(client)
+    client.loop.run_until_complete(run_pending_backfills(client))
+
+if __name__ == "__main__":
+    main()
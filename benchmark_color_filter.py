@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image color filter against the old per-pixel implementation.
+
+Runs the old getpixel loop, the vectorized is_image_red_or_black_heavy and the
+process-pool red_or_black_heavy_batch over the images in a folder (media/ by
+default). When the folder has no images, it uses a set of generated JPEGs.
+Reports the time per image and how often the old and new filters agree.
+
+Usage:
+    python benchmark_color_filter.py [folder] [--limit 500] [--workers 4]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from PIL import Image
+from utils import is_image_red_or_black_heavy, red_or_black_heavy_batch
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+def legacy_is_image_red_or_black_heavy(image_path, threshold=0.7):
+    """The original implementation: 10,000 getpixel calls per image"""
+    try:
+        image = Image.open(image_path).convert('RGB')
+        image = image.resize((100, 100))
+        total_pixels = image.width * image.height
+        red_pixels = 0
+        black_pixels = 0
+        for x in range(image.width):
+            for y in range(image.height):
+                r, g, b = image.getpixel((x, y))
+                if r > 150 and g < 80 and b < 80:
+                    red_pixels += 1
+                elif r < 50 and g < 50 and b < 50:
+                    black_pixels += 1
+        return (red_pixels + black_pixels) / total_pixels >= threshold
+    except Exception as e:
+        print(f"[COLOR FILTER ERROR] {e}")
+        return False
+
+def generate_images(folder, count=200):
+    """Photo-sized JPEGs, a quarter of them dominated by red/black"""
+    random.seed(42)
+    paths = []
+    for index in range(count):
+        heavy = index % 4 == 0
+        base = random.choice([(200, 20, 20), (10, 10, 10)]) if heavy else \
+            (random.randrange(60, 255), random.randrange(60, 255), random.randrange(60, 255))
+        image = Image.new('RGB', (1280, 960), base)
+        # Some noise blocks so the images are not trivially uniform
+        for _ in range(20):
+            x, y = random.randrange(0, 1200), random.randrange(0, 900)
+            color = tuple(random.randrange(0, 256) for _ in range(3))
+            image.paste(color, (x, y, x + random.randrange(20, 200), y + random.randrange(20, 200)))
+        path = os.path.join(folder, f"bench_{index}.jpg")
+        image.save(path, quality=85)
+        paths.append(path)
+    return paths
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {elapsed:7.2f}s  {elapsed / count * 1000:7.2f} ms/görsel")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the red/black image color filter")
+    parser.add_argument('folder', nargs='?', default='media', help="Folder of images to scan")
+    parser.add_argument('--limit', type=int, default=500, help="Maximum images to use")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processes for the batch run")
+    args = parser.parse_args()
+
+    paths = []
+    if os.path.isdir(args.folder):
+        paths = sorted(os.path.join(args.folder, name) for name in os.listdir(args.folder)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))[:args.limit]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if not paths:
+            print(f"[BENCH] {args.folder} içinde görsel yok, örnek görseller üretiliyor.")
+            paths = generate_images(scratch, min(args.limit, 200))
+
+        count = len(paths)
+        print(f"[BENCH] {count} görsel")
+        legacy = timed("legacy getpixel", lambda: [legacy_is_image_red_or_black_heavy(p) for p in paths], count)
+        vectorized = timed("vectorized", lambda: [is_image_red_or_black_heavy(p) for p in paths], count)
+        timed(f"batch ({args.workers} işlem)", lambda: red_or_black_heavy_batch(paths, workers=args.workers), count)
+
+    agree = sum(old == new for old, new in zip(legacy, vectorized))
+    print(f"[BENCH] Sonuç uyumu: {agree}/{count}, filtrelenen: {sum(legacy)} (eski) / {sum(vectorized)} (yeni)")
+
+if __name__ == "__main__":
+    main()
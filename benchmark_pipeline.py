@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark GPT throughput and latency of the pipeline against the local stand-in.
+
+Feeds synthetic screened messages through the translate stage as ingest.py
+configures it (batching, thread workers, the LLM client's concurrency
+limit, retries and circuit breaker) and measures throughput and per-message
+latency, from entering the pipeline to leaving the translate stage. GPT is
+always the stand-in from llm_standin.py. By default it is served from this
+process at LLM_STANDIN_URL; --external uses one already running there.
+The run happens in a temporary working directory, so bot.py creates a
+fresh database there and the bot's osint_bot.db, translation cache and
+token budgets are untouched. The pre-classifier is disabled, so every
+message reaches the stand-in and results depend only on the arguments.
+
+Usage:
+    python benchmark_pipeline.py [--messages 500] [--rate 0] [--latency 0.8]
+                                 [--error-rate 0.02] [--rate-limit-rate 0.02] [--seed 1]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+# Never benchmark against the paid API, and keep results independent of a locally trained model
+os.environ['LLM_BACKEND'] = 'standin'
+os.environ['PRECLASSIFIER_ENABLED'] = 'false'
+
+# bot.py opens osint_bot.db and its other state files in the working directory on import
+scratch = tempfile.TemporaryDirectory(prefix='benchmark_pipeline_')
+os.chdir(scratch.name)
+
+from werkzeug.serving import make_server
+import bot
+from config import *
+from llm_standin import StandIn, create_app
+from llm_usage import utc_day
+from pipeline import Pipeline, Stage
+
+WORDS = ('missile', 'strike', 'border', 'ceasefire', 'minister', 'talks', 'sanctions', 'troops', 'drone',
+         'embassy', 'election', 'protest', 'navy', 'summit', 'oil', 'grain', 'port', 'airspace', 'refugees',
+         'parliament', 'army', 'convoy', 'attack', 'agreement', 'statement', 'officials', 'region', 'city')
+
+def generate_candidates(count, seed):
+    """Screened-message dicts of news-like texts, 15-200 words, spread over the configured channels"""
+    rng = random.Random(seed)
+    channels = list(CHANNELS)
+    candidates = []
+    for index in range(count):
+        channel = channels[index % len(channels)]
+        text = f"#{index} " + ' '.join(rng.choice(WORDS) for _ in range(rng.randint(15, 200)))
+        candidates.append({
+            'message_id': f"{channel}_bench{index}",
+            'channel': channel,
+            'telegram_id': index,
+            'sender_name': 'benchmark',
+            'cleaned': text,
+            'content_hash': f"bench{seed}_{index}",
+            'quality_score': 0.5,
+            'bias_score': 0.0,
+        })
+    return candidates
+
+def translate_jobs(jobs):
+    """The translate stage of IngestPipeline"""
+    results = bot.translate_candidates([job['candidate'] for job in jobs])
+    for job, (translated, _) in zip(jobs, results):
+        job['translated'] = translated
+    return jobs
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))] if ordered else 0
+
+async def run(candidates, rate):
+    latencies = []
+    outcomes = {'accepted': 0, 'skip': 0, 'deferred': 0}
+
+    async def finish(job):
+        latencies.append(time.monotonic() - job['started'])
+        if job['translated'] is None:
+            outcomes['deferred'] += 1
+        elif bot.is_rejected(job['translated']):
+            outcomes['skip'] += 1
+        else:
+            outcomes['accepted'] += 1
+        return job
+
+    stages = [
+        Stage('translate', translate_jobs, PIPELINE_WORKERS['translate'], kind='thread',
+              batch_size=TRANSLATION_BATCH_MAX, batch_wait=TRANSLATION_BATCH_WAIT),
+        Stage('done', finish, 1, kind='async'),
+    ]
+    started = time.monotonic()
+    async with Pipeline(stages) as pipeline:
+        for candidate in candidates:
+            await pipeline.put({'candidate': candidate, 'started': time.monotonic()})
+            if rate:
+                await asyncio.sleep(1 / rate)
+        await pipeline.join()
+    return time.monotonic() - started, latencies, outcomes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the GPT path of the pipeline against the stand-in")
+    parser.add_argument('--messages', type=int, default=500, help="Synthetic messages to send")
+    parser.add_argument('--rate', type=float, default=0, help="Arrival rate (messages/s); 0 sends all at once")
+    parser.add_argument('--latency', type=float, default=LLM_STANDIN_LATENCY)
+    parser.add_argument('--sigma', type=float, default=LLM_STANDIN_LATENCY_SIGMA)
+    parser.add_argument('--error-rate', type=float, default=LLM_STANDIN_ERROR_RATE)
+    parser.add_argument('--rate-limit-rate', type=float, default=LLM_STANDIN_RATE_LIMIT_RATE)
+    parser.add_argument('--skip-rate', type=float, default=LLM_STANDIN_SKIP_RATE)
+    parser.add_argument('--seed', type=int, default=LLM_STANDIN_SEED)
+    parser.add_argument('--external', action='store_true', help="Use a stand-in already serving LLM_STANDIN_URL")
+    args = parser.parse_args()
+
+    standin = None
+    if not args.external:
+        address = urlparse(LLM_STANDIN_URL)
+        standin = StandIn(latency=args.latency, sigma=args.sigma, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, skip_rate=args.skip_rate, seed=args.seed)
+        server = make_server(address.hostname, address.port, create_app(standin), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    candidates = generate_candidates(args.messages, args.seed)
+    print(f"[BENCH] {len(candidates)} mesaj, {PIPELINE_WORKERS['translate']} çeviri işçisi, "
+          f"batch {TRANSLATION_BATCH_MAX}, eşzamanlılık {LLM_CONCURRENCY}")
+    elapsed, latencies, outcomes = asyncio.run(run(candidates, args.rate))
+    bot.usage_ledger.flush()
+    tokens = sum(bot.db.get_llm_usage_by_channel(utc_day()).values())
+
+    print(f"[BENCH] {elapsed:.2f}s, {len(latencies) / elapsed:.1f} mesaj/s")
+    print(f"[BENCH] Gecikme p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s  "
+          f"p99 {percentile(latencies, 0.99):.2f}s  max {max(latencies, default=0):.2f}s")
+    print(f"[BENCH] Sonuç: {outcomes}, {tokens} token")
+    print(f"[BENCH] İstemci: {bot.llm.stats}, devre {bot.llm.breaker.state}")
+    if standin is not None:
+        print(f"[BENCH] Stand-in: {dict(standin.stats)}")
+
+if __name__ == "__main__":
+    main()
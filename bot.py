@@ -1,9 +1,11 @@
-import openai
 import hashlib
+import json
 import time
 import traceback
 import os
+import threading
 from datetime import datetime, timezone
+from types import SimpleNamespace
 from telethon.sync import TelegramClient
 from config import *
 from utils import *
@@ -11,9 +13,17 @@ import re
 from urllib.parse import quote
 import requests
 from database import DatabaseManager
+from scoring import keyword_matcher, calculate_content_quality, calculate_bias_score
+from classifier import PreClassifier
+from near_duplicates import MinHashIndex
+from story_clusters import StoryClusterer
+from media_store import MediaStore
+from translation_cache import TranslationCache
+from llm_client import LLMClient, LLMUnavailable
+from llm_usage import UsageLedger, estimate_tokens, next_reset, truncate_to_tokens
 
-# Configure OpenAI client properly for newer versions
-client = openai.OpenAI(api_key=OPENAI_API_KEY)
+# GPT requests on the LLM_BACKEND backend: bounded concurrency, retries and a circuit breaker
+llm = LLMClient()
 
 # Disable any proxy settings that might cause issues
 os.environ['NO_PROXY'] = '*'
@@ -21,277 +31,482 @@ os.environ['NO_PROXY'] = '*'
 # Initialize database
 db = DatabaseManager()
 
-def calculate_content_quality(text, sender_name="", channel=""):
-    """Calculate content quality score based on various factors"""
-    score = 0.5  # Base score
-    
-    # Length factor (optimal around 100-200 chars for Twitter)
-    length = len(text)
-    if 80 <= length <= 250:
-        score += 0.3
-    elif 50 <= length <= 300:
-        score += 0.2
-    elif length > 300:
-        score -= 0.1
-    
-    # Breaking news indicators (positive for quality)
-    breaking_terms = ['breaking', 'urgent', 'just in', 'developing', 'latest', 'update']
-    breaking_count = sum(1 for term in breaking_terms if term in text.lower())
-    score += min(breaking_count * 0.15, 0.3)
-    
-    # Official source indicators
-    official_terms = ['confirmed', 'official', 'statement', 'announces', 'declares', 'reports']
-    official_count = sum(1 for term in official_terms if term in text.lower())
-    score += min(official_count * 0.1, 0.2)
-    
-    # Geopolitical relevance (higher weight)
-    geo_terms = ['government', 'military', 'president', 'minister', 'embassy', 'border', 'sanctions', 
-                 'diplomatic', 'treaty', 'alliance', 'conflict', 'peace', 'war', 'crisis', 'summit']
-    geo_count = sum(1 for term in geo_terms if term in text.lower())
-    score += min(geo_count * 0.15, 0.4)  # Higher weight for geopolitical terms
-    
-    # Country/region mentions (positive for geopolitical relevance)
-    country_terms = ['russia', 'ukraine', 'israel', 'palestine', 'china', 'taiwan', 'iran', 'syria', 
-                    'turkey', 'germany', 'france', 'uk', 'usa', 'nato', 'eu', 'un']
-    country_count = sum(1 for term in country_terms if term in text.lower())
-    score += min(country_count * 0.1, 0.3)
-    
-    # Reduce score for promotional content
-    promo_terms = ['subscribe', 'follow', 'join', 'channel', 'link', 'click', 'download']
-    promo_count = sum(1 for term in promo_terms if term in text.lower())
-    score -= min(promo_count * 0.2, 0.4)
-    
-    # Reduce score for excessive punctuation (spam indicator)
-    punctuation_count = text.count('!') + text.count('?') + text.count('...')
-    if punctuation_count > 3:
-        score -= 0.2
-    
-    # Bonus for well-structured content
-    if any(char.isupper() for char in text[:10]):  # Starts with proper capitalization
-        score += 0.1
-    
-    return min(max(score, 0), 1)  # Clamp between 0 and 1
-
-def calculate_bias_score(text):
-    """Calculate bias score (0 = neutral, 1 = highly biased)"""
-    bias_terms = [
-        'puppet government', 'puppet regime', 'puppet state',
-        'evil empire', 'axis of evil', 'terrorist state', 'rogue state',
-        'nazi', 'fascist', 'terrorist regime', 'dictator regime'
-    ]
-    
-    bias_count = sum(1 for term in bias_terms if term in text.lower())
-    return min(bias_count * 0.25, 1)  # Max bias score of 1
+# Near-duplicate index shared by every channel (reloaded from the database)
+near_duplicates = MinHashIndex(db)
 
-def translate_if_geopolitical(text):
-    prompt = (
-        "Analyze this news post:\n\n"
-        "1. If NOT about international politics, global affairs, or geopolitical events → respond: \"SKIP\"\n"
-        "2. If IS geopolitical → translate/rewrite into concise English (max 280 chars) for Twitter audience\n\n"
-        "Guidelines:\n"
-        "- Start with country flag emoji 🌍 or specific country flag\n"
-        "- Stay neutral and factual\n"
-        "- Remove extreme biased terms like 'puppet government', 'evil empire'\n"
-        "- Use neutral terms: 'government', 'officials', 'authorities'\n"
-        "- No hashtags\n\n"
-        "Return only the translated version or \"SKIP\"."
-    )
-    try:
-        messages = [
-            {"role": "system", "content": prompt},
+# Groups accepted posts reporting the same event for the review queue
+story_clusters = StoryClusterer(db)
+
+# Downloaded files are kept once per content and evicted by retention/budget
+media_store = MediaStore(db)
+
+# Earlier GPT answers for reposted texts
+translation_cache = TranslationCache(db)
+
+# Token usage per channel, and the daily budgets checked before each request
+usage_ledger = UsageLedger(db)
+
+TRANSLATE_PROMPT = (
+    "Analyze this news post:\n\n"
+    "1. If NOT about international politics, global affairs, or geopolitical events → respond: \"SKIP\"\n"
+    "2. If IS geopolitical → translate/rewrite into concise English (max 280 chars) for Twitter audience\n\n"
+    "Guidelines:\n"
+    "- Start with country flag emoji 🌍 or specific country flag\n"
+    "- Stay neutral and factual\n"
+    "- Remove extreme biased terms like 'puppet government', 'evil empire'\n"
+    "- Use neutral terms: 'government', 'officials', 'authorities'\n"
+    "- No hashtags\n\n"
+    "Return only the translated version or \"SKIP\"."
+)
+# Part of the cache key: editing the prompt invalidates earlier translations
+TRANSLATE_PROMPT_VERSION = hashlib.sha256(TRANSLATE_PROMPT.encode()).hexdigest()[:12]
+
+def translation_request(text):
+    """Chat completion arguments for translating one text"""
+    return {
+        'model': TRANSLATION_MODEL,
+        'messages': [
+            {"role": "system", "content": TRANSLATE_PROMPT},
             {"role": "user", "content": text}
-        ]
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=300,
-        )
-        output = (response.choices[0].message.content or '').strip()
-        return output, response.usage
+        ],
+        'temperature': 0.7,
+        'max_tokens': 300,
+    }
+
+def translation_result(text, future):
+    """(output, usage) of a single translation request, caching a non-empty answer.
+
+    Returns (None, None) when GPT is unavailable, so the message is parked
+    for a retry instead of being stored as rejected.
+    """
+    try:
+        response = future.result()
+    except LLMUnavailable as e:
+        print(f"[GPT] Çeviri ertelendi, yeniden denenecek: {e}")
+        return None, None
     except Exception as e:
         print(f"[GPT TRANSLATE ERROR] {type(e).__name__}: {e}")
         print(f"[GPT TRANSLATE ERROR] Full traceback: {traceback.format_exc()}")
         return "", None
+    output = (response.choices[0].message.content or '').strip()
+    if output:
+        translation_cache.put(text, TRANSLATE_PROMPT_VERSION, TRANSLATION_MODEL, output)
+    return output, response.usage
 
-def process_channel(client, channel, info, sent_hashes):
-    allowed_senders = info['allowed_senders']
-    print(f"[INFO] Kanal: {channel}")
+def translate_if_geopolitical(text):
+    cached = translation_cache.get(text, TRANSLATE_PROMPT_VERSION, TRANSLATION_MODEL)
+    if cached is not None:
+        print("[CACHE] Çeviri önbellekten alındı, GPT atlanıyor.")
+        return cached, None
+    return translation_result(text, llm.submit(**translation_request(text)))
 
-    # Add more detailed logging for debugging
-    print(f"[DEBUG] Processing channel {channel} with {MESSAGE_LIMIT} message limit")
-    print(f"[DEBUG] Current sent_hashes count: {len(sent_hashes)}")
+# Several posts per GPT request: the same rules, answered as JSON keyed by message id
+BATCH_PROMPT = TRANSLATE_PROMPT.replace(
+    "Analyze this news post:", "Analyze each news post in the JSON object below, keyed by id:"
+).replace(
+    "Return only the translated version or \"SKIP\".",
+    "Return one result per id, with output set to the translated version or \"SKIP\"."
+)
+BATCH_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "post_verdicts",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"id": {"type": "string"}, "output": {"type": "string"}},
+                        "required": ["id", "output"],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
 
-    for message in client.iter_messages(channel, limit=MESSAGE_LIMIT):
-        if not message.text or not message.sender:
-            continue
+def plan_batches(texts):
+    """Split texts (index, text) into batches that fit the prompt token budget"""
+    batches, batch, tokens = [], [], 0
+    for index, text in texts:
+        # Each entry also carries its id and JSON quoting
+        cost = estimate_tokens(text) + 8
+        if batch and (len(batch) >= TRANSLATION_BATCH_MAX or tokens + cost > TRANSLATION_BATCH_TOKENS):
+            batches.append(batch)
+            batch, tokens = [], 0
+        batch.append((index, text))
+        tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
 
-        sender_name = getattr(message.sender, 'first_name', '') or getattr(message.sender, 'title', '')
-        
-        # If allowed_senders is empty, allow all senders (for discovering sender names)
-        if allowed_senders and sender_name not in allowed_senders:
-            print(f"[SKIP] Filtreden geçmedi: {sender_name}")
-            continue
-        
-        # Log sender name for new channels to help identify actual sender names
-        if not allowed_senders:
-            print(f"[INFO] Gönderen: {sender_name} (kanal: {channel})")
+def share_usage(usage, weight, total):
+    """The part of a batch request's token usage that falls on one message"""
+    if usage is None:
+        return None
+    fraction = weight / max(total, 1)
+    prompt = round((usage.prompt_tokens or 0) * fraction)
+    completion = round((usage.completion_tokens or 0) * fraction)
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
 
-        raw_text = message.text.strip()
-        lower_text = raw_text.lower()
+def batch_request(batch):
+    """Chat completion arguments for a batch of (index, text), numbered from 1"""
+    posts = {str(number): text for number, (_, text) in enumerate(batch, 1)}
+    return {
+        'model': TRANSLATION_MODEL,
+        'messages': [
+            {"role": "system", "content": BATCH_PROMPT},
+            {"role": "user", "content": json.dumps(posts, ensure_ascii=False)}
+        ],
+        'temperature': 0.7,
+        'max_tokens': TRANSLATION_BATCH_OUTPUT_TOKENS * len(batch) + 50,
+        'response_format': BATCH_RESPONSE_FORMAT,
+    }
 
-        if any(keyword in lower_text for keyword in BLOCKED_KEYWORDS):
-            print("[SKIP] Yasaklı içerik, atlanıyor.")
-            continue
+def batch_outputs(batch, response):
+    """{index: output} from a batch response.
 
-        if re.search(r"https?://\S+", raw_text) or any(e in raw_text for e in BLOCKED_EMOJIS):
-            print("[SKIP] Uygunsuz içerik, atlanıyor.")
-            continue
+    Results with an unknown id or an empty output are left out. A truncated
+    or malformed response gives an empty dict, so every message falls back
+    to a single request.
+    """
+    ids = {str(number): index for number, (index, _) in enumerate(batch, 1)}
+    choice = response.choices[0]
+    if choice.finish_reason == 'length':
+        print(f"[GPT BATCH] Yanıt kesildi ({len(batch)} mesaj), tek tek çevrilecek.")
+        return {}
+    try:
+        results = json.loads(choice.message.content or '')['results']
+        outputs = {ids[str(result['id'])]: result['output'].strip()
+                   for result in results if str(result.get('id')) in ids and isinstance(result.get('output'), str)}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"[GPT BATCH] Geçersiz yanıt ({type(e).__name__}), tek tek çevrilecek.")
+        return {}
+    return {index: output for index, output in outputs.items() if output}
 
-        current_hash = hashlib.md5((channel + raw_text).encode()).hexdigest()
-        print(f"[DEBUG] Processing message {message.id} from {channel}, hash: {current_hash[:8]}...")
-        
-        if current_hash in sent_hashes:
-            print(f"[DUPLICATE] Hash {current_hash[:8]}... already in sent_hashes, skipping.")
-            continue
-            
-        # Also check database for duplicates before processing
-        message_id = f"{channel}_{message.id}"
-        existing_post = db.get_post_by_message_id(message_id)
-        if existing_post:
-            print(f"[DUPLICATE] Post already exists in database: {message_id}")
-            continue
+def translate_batch(texts):
+    """translate_if_geopolitical for many texts, packing cache misses into batch requests.
 
-        # Check if message is too recent (within last 1 minute) to prevent rapid processing
-        message_date = message.date
-        if message_date:
-            # Ensure both times are in UTC for proper comparison
-            if message_date.tzinfo is None:
-                # If message date has no timezone info, assume UTC
-                message_date = message_date.replace(tzinfo=timezone.utc)
-            else:
-                # Convert to UTC if it has timezone info
-                message_date = message_date.astimezone(timezone.utc)
-            
-            now = datetime.now(timezone.utc)
-            time_diff = now - message_date
-            if time_diff.total_seconds() < 60:  # 1 minute
-                print(f"[SKIP] Message too recent ({time_diff.total_seconds():.0f}s ago), skipping to prevent duplicates")
-                continue
+    Returns (output, usage) per text, in order; output is None when GPT is
+    unavailable. All batch requests are in flight at once, within the LLM
+    client's concurrency limit. A batch request's usage is split over its
+    messages by length. Messages missing from a batch answer are translated
+    one by one.
+    """
+    results = [None] * len(texts)
+    pending = []
+    for index, text in enumerate(texts):
+        cached = translation_cache.get(text, TRANSLATE_PROMPT_VERSION, TRANSLATION_MODEL)
+        if cached is not None:
+            results[index] = (cached, None)
+        else:
+            pending.append((index, text))
+    if len(pending) < len(texts):
+        print(f"[CACHE] {len(texts) - len(pending)}/{len(texts)} çeviri önbellekten alındı.")
 
-        cleaned = remove_hashtags(raw_text)
-        
-        # Calculate quality and bias scores
-        quality_score = calculate_content_quality(cleaned, sender_name, channel)
-        bias_score = calculate_bias_score(cleaned)
-        
-        # Create message ID for database
-        message_id = f"{channel}_{message.id}"
-        
-        # Determine media type and path
-        media_type = None
-        media_path = None
-        is_video = False
-        
-        if message.video:
-            media_type = "video"
-            try:
-                media_path = client.download_media(message.video, file="media/")
-                is_video = True
-            except Exception as e:
-                print("[WARN] Video indirilemedi:", e)
-        elif message.photo:
-            media_type = "photo"
+    batches = plan_batches(pending)
+    futures = [llm.submit(**batch_request(batch)) if len(batch) > 1 else None for batch in batches]
+    singles = []
+    for batch, future in zip(batches, futures):
+        outputs, usage = {}, None
+        if future is not None:
             try:
-                media_path = client.download_media(message.photo, file="media/")
-                if is_image_red_or_black_heavy(media_path, MEDIA_THRESHOLD):
-                    print("[SKIP] Görselde kırmızı/siyah baskın. Atlanıyor.")
-                    continue
+                response = future.result()
+            except LLMUnavailable as e:
+                print(f"[GPT BATCH] {len(batch)} mesaj ertelendi, yeniden denenecek: {e}")
+                for index, _ in batch:
+                    results[index] = (None, None)
+                continue
             except Exception as e:
-                print("[WARN] Fotoğraf indirilemedi:", e)
-        
-        # Translate and check if geopolitical
-        translated, usage = translate_if_geopolitical(cleaned)
-        
-        # Check if translation failed or returned empty
-        if not translated or translated.upper() == "SKIP":
-            print("[SKIP] GPT 'SKIP' dedi veya çeviri başarısız.")
-            log_gpt_interaction(CSV_FILE, "Translate & Filter", datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M"), channel, cleaned, False, usage)
-            
-            # Still save to database as rejected content
-            post_data = {
-                'message_id': message_id,
-                'channel_name': channel,
-                'sender_name': sender_name,
-                'original_text': cleaned,
-                'translated_text': None,
-                'media_type': media_type,
-                'media_path': media_path,
-                'classification': 'non_geopolitical',
-                'quality_score': quality_score,
-                'bias_score': bias_score,
-                'status': 'rejected',
-                'content_hash': current_hash,
-                'similarity_hash': hashlib.md5(cleaned.encode()).hexdigest(),
-                'priority': info.get('priority', 1),
-                'telegram_url': f"https://t.me/{channel}/{message.id}"
-            }
-            db.add_post(post_data)
-            
-            # Save hash for rejected posts too to prevent reprocessing
-            save_sent_hash(current_hash)
-            continue
+                print(f"[GPT BATCH ERROR] {type(e).__name__}: {e}")
+            else:
+                outputs, usage = batch_outputs(batch, response), response.usage
+            print(f"[GPT BATCH] {len(outputs)}/{len(batch)} mesaj tek istekte işlendi.")
+
+        answered = sum(len(text) for index, text in batch if index in outputs)
+        for index, text in batch:
+            if index in outputs:
+                translation_cache.put(text, TRANSLATE_PROMPT_VERSION, TRANSLATION_MODEL, outputs[index])
+                results[index] = (outputs[index], share_usage(usage, len(text), answered))
+            else:
+                singles.append((index, text, llm.submit(**translation_request(text))))
+
+    for index, text, future in singles:
+        results[index] = translation_result(text, future)
+    return results
+
+# Local pre-classifier, reloaded whenever `python classifier.py --train` writes a new model
+_preclassifier = None
+_preclassifier_mtime = None
+_preclassifier_lock = threading.Lock()
+
+def get_preclassifier():
+    """Current pre-classifier model, or None when none has been trained"""
+    global _preclassifier, _preclassifier_mtime
+    try:
+        mtime = os.path.getmtime(PRECLASSIFIER_MODEL_FILE)
+    except OSError:
+        return None
 
-        # Validate translated content before creating message
-        if len(translated.strip()) < 10:
-            print("[SKIP] Çeviri çok kısa veya boş.")
+    with _preclassifier_lock:
+        if mtime != _preclassifier_mtime:
+            _preclassifier = PreClassifier.load(PRECLASSIFIER_MODEL_FILE)
+            _preclassifier_mtime = mtime
+            print("[CLASSIFIER] Ön sınıflandırıcı modeli yüklendi.")
+        return _preclassifier
+
+def translate_candidate(candidate):
+    """Translate a screened candidate, skipping GPT when the local model rejects it.
+
+    Locally rejected candidates are flagged with 'prefiltered' and come back
+    as ("SKIP", None), like a GPT rejection. Candidates over their token
+    budget are flagged with 'throttled' and come back as (None, None), like
+    an unreachable GPT.
+    """
+    return translate_candidates([candidate])[0]
+
+def translate_candidates(candidates):
+    """translate_candidate for a list of candidates, sharing GPT requests between them.
+
+    Long messages are truncated to LLM_MAX_INPUT_TOKENS before the budget
+    check, and the token usage of every GPT answer is recorded per channel.
+    """
+    results = [None] * len(candidates)
+    pending, texts = [], []
+    for index, candidate in enumerate(candidates):
+        if PRECLASSIFIER_ENABLED:
+            model = get_preclassifier()
+            if model is not None and model.is_irrelevant(candidate['cleaned']):
+                print("[SKIP] Yerel sınıflandırıcı: jeopolitik değil, GPT atlanıyor.")
+                candidate['prefiltered'] = True
+                results[index] = ("SKIP", None)
+                continue
+        text = truncate_to_tokens(candidate['cleaned'], LLM_MAX_INPUT_TOKENS)
+        if not usage_ledger.allows(candidate['channel'], estimate_tokens(text) + TRANSLATION_BATCH_OUTPUT_TOKENS):
+            print(f"[BUDGET] {candidate['channel']} token bütçesi doldu, mesaj erteleniyor.")
+            candidate['throttled'] = True
+            results[index] = (None, None)
             continue
+        candidate.pop('throttled', None)
+        pending.append(index)
+        texts.append(text)
 
-        # Create X (Twitter) URL
-        tweet_url = "https://x.com/intent/tweet?text=" + quote(translated)
-        final_message = f"{translated}\n\n🔗 Post on X: {tweet_url}"
-
-        # Save to database as pending
-        post_data = {
-            'message_id': message_id,
-            'channel_name': channel,
-            'sender_name': sender_name,
-            'original_text': cleaned,
-            'translated_text': translated,
-            'media_type': media_type,
-            'media_path': media_path,
-            'classification': 'geopolitical',
-            'quality_score': quality_score,
-            'bias_score': bias_score,
-            'status': 'pending',
-            'content_hash': current_hash,
-            'similarity_hash': hashlib.md5(cleaned.encode()).hexdigest(),
-            'priority': info.get('priority', 1),
-            'telegram_url': f"https://t.me/{channel}/{message.id}"
-        }
-        
-        post_id = db.add_post(post_data)
-        
-        if post_id:
-            print(f"[DATABASE] Saved post {post_id} to database")
-            
-            # Save hash BEFORE sending to prevent duplicates on restart
-            save_sent_hash(current_hash)
-            
-            # For now, still auto-post to Telegram (can be disabled later)
-            print("[SEND] Gönderiliyor:\n", final_message)
-            send_to_telegram(BOT_TOKEN, CHAT_ID, final_message, media_path, is_video=is_video)
-            
-            # Update status to posted
-            db.update_post_status(post_id, 'posted')
-            
-            log_gpt_interaction(CSV_FILE, "Final", datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M"), channel, cleaned, True, usage)
-
-            # Add delay to prevent rapid duplicate processing
-            print("[WAIT] Waiting 10 seconds before processing next message...")
-            time.sleep(10)
-            return True  # Indicate a new message was processed
+    for index, (translated, usage) in zip(pending, translate_batch(texts)):
+        results[index] = (translated, usage)
+        usage_ledger.record(candidates[index]['channel'], candidates[index]['message_id'], usage,
+                            accepted=translated is not None and not is_rejected(translated))
+    return results
+
+def screen_message(channel, info, message, sender_name, sent_hashes, min_age=60, check_db=True):
+    """Apply sender, keyword, duplicate and recency filters to a message.
+
+    Messages younger than min_age seconds are skipped (polling only; pushed
+    events pass 0). Callers that already ran a bulk existence query pass
+    check_db=False. Returns a candidate dict for messages worth translating,
+    otherwise None.
+    """
+    allowed_senders = info['allowed_senders']
+
+    # If allowed_senders is empty, allow all senders (for discovering sender names)
+    if allowed_senders and sender_name not in allowed_senders:
+        print(f"[SKIP] Filtreden geçmedi: {sender_name}")
+        return None
+
+    # Log sender name for new channels to help identify actual sender names
+    if not allowed_senders:
+        print(f"[INFO] Gönderen: {sender_name} (kanal: {channel})")
+
+    raw_text = message.text.strip()
+    raw_hits = keyword_matcher.counts(raw_text)
+
+    if raw_hits['blocked']:
+        print("[SKIP] Yasaklı içerik, atlanıyor.")
+        return None
+
+    if re.search(r"https?://\S+", raw_text) or raw_hits['blocked_emoji']:
+        print("[SKIP] Uygunsuz içerik, atlanıyor.")
+        return None
+
+    current_hash = hashlib.md5((channel + raw_text).encode()).hexdigest()
+    print(f"[DEBUG] Processing message {message.id} from {channel}, hash: {current_hash[:8]}...")
+
+    if current_hash in sent_hashes:
+        print(f"[DUPLICATE] Hash {current_hash[:8]}... already in sent_hashes, skipping.")
+        return None
+
+    # Also check database for duplicates before processing
+    message_id = f"{channel}_{message.id}"
+    if check_db and db.get_post_by_message_id(message_id):
+        print(f"[DUPLICATE] Post already exists in database: {message_id}")
+        return None
+
+    # Check if message is too recent (within last 1 minute) to prevent rapid processing
+    message_date = message.date
+    if message_date and min_age:
+        # Ensure both times are in UTC for proper comparison
+        if message_date.tzinfo is None:
+            # If message date has no timezone info, assume UTC
+            message_date = message_date.replace(tzinfo=timezone.utc)
         else:
-            print("[WARN] Failed to save post to database or duplicate detected")
-            
-    return False 
\ No newline at end of file
+            # Convert to UTC if it has timezone info
+            message_date = message_date.astimezone(timezone.utc)
+
+        now = datetime.now(timezone.utc)
+        time_diff = now - message_date
+        if time_diff.total_seconds() < min_age:
+            print(f"[SKIP] Message too recent ({time_diff.total_seconds():.0f}s ago), skipping to prevent duplicates")
+            return None
+
+    cleaned = remove_hashtags(raw_text)
+
+    # Same story reposted with small edits, in this or another channel
+    duplicate = near_duplicates.check_and_add(message_id, channel, cleaned)
+    if duplicate:
+        print(f"[DUPLICATE] {duplicate[0]} ile %{duplicate[1] * 100:.0f} benzer, atlanıyor.")
+        return None
+
+    hits = keyword_matcher.counts(cleaned) if cleaned != raw_text else raw_hits
+
+    return {
+        'message_id': message_id,
+        'channel': channel,
+        'telegram_id': message.id,
+        'sender_name': sender_name,
+        'cleaned': cleaned,
+        'content_hash': current_hash,
+        # Calculate quality and bias scores
+        'quality_score': calculate_content_quality(cleaned, sender_name, channel, hits),
+        'bias_score': calculate_bias_score(cleaned, hits),
+    }
+
+def is_rejected(translated):
+    """True when GPT (or the local model) rejected the message or translation failed or was deferred"""
+    return not translated or translated.upper() == "SKIP"
+
+def media_reference(channel, message_ids):
+    """Lazy reference to the media of Telegram messages, resolved by media_fetch on demand"""
+    return json.dumps({'channel': channel, 'message_ids': list(message_ids)})
+
+def park_candidate(channel, candidate, media_type=None, media_ref=None):
+    """Queue a candidate GPT could not be reached for (or over budget); its hash is not saved, so it is not lost"""
+    parked = db.park_llm_retry({
+        'message_id': candidate['message_id'],
+        'channel_name': channel,
+        'candidate': json.dumps(candidate),
+        'media_type': media_type,
+        'media_ref': media_ref,
+        # Over budget: wait for the daily reset instead of retrying soon
+        'next_attempt_at': next_reset() if candidate.get('throttled') else time.time() + LLM_RETRY_DELAY,
+    })
+    if parked and candidate.get('throttled'):
+        print(f"[BUDGET] {candidate['message_id']} bütçe yenilenene kadar kuyruğa alındı.")
+    elif parked:
+        print(f"[RETRY] {candidate['message_id']} GPT'ye ulaşılamadı, yeniden deneme kuyruğuna alındı.")
+
+def store_candidate(channel, info, candidate, translated, media_type=None, media_path=None,
+                    is_video=False, media_items=None, media_ref=None):
+    """Persist a translated (or GPT-rejected) candidate and send accepted ones.
+
+    Albums pass every downloaded file as media_items [(path, is_video), ...];
+    they are stored as one row and sent with a single sendMediaGroup call.
+    Rejected candidates pass media_ref instead of downloaded files.
+    Candidates GPT could not be reached for (translated is None) are parked
+    in the LLM retry queue instead of being stored.
+    Returns True when the message was accepted and sent.
+    """
+    if translated is None:
+        park_candidate(channel, candidate, media_type, media_ref)
+        return False
+
+    cleaned = candidate['cleaned']
+    message_id = candidate['message_id']
+
+    post_data = {
+        'message_id': message_id,
+        'channel_name': channel,
+        'sender_name': candidate['sender_name'],
+        'original_text': cleaned,
+        'media_type': media_type,
+        'media_path': media_path,
+        'quality_score': candidate['quality_score'],
+        'bias_score': candidate['bias_score'],
+        'content_hash': candidate['content_hash'],
+        'similarity_hash': hashlib.md5(cleaned.encode()).hexdigest(),
+        'priority': info.get('priority', 1),
+        'telegram_url': f"https://t.me/{channel}/{candidate['telegram_id']}",
+        'media_paths': json.dumps([path for path, _ in media_items]) if media_items else None,
+        # Earlier post whose media this one reposts (set by the fingerprint stage)
+        'duplicate_of': candidate.get('duplicate_of'),
+        # Kept after eviction releases the files, so they can be downloaded again
+        'media_ref': media_ref,
+    }
+
+    # Check if translation failed or returned empty
+    if is_rejected(translated):
+        prefiltered = candidate.get('prefiltered', False)
+        if not prefiltered:
+            print("[SKIP] GPT 'SKIP' dedi veya çeviri başarısız.")
+
+        # Still save to database as rejected content; local rejections are kept
+        # apart so the pre-classifier is never retrained on its own output
+        post_data.update({
+            'translated_text': None,
+            'classification': 'non_geopolitical_local' if prefiltered else 'non_geopolitical',
+            'status': 'rejected',
+        })
+        if media_ref:
+            post_data.update({'media_path': None, 'media_paths': None})
+        db.add_post(post_data)
+
+        # Save hash for rejected posts too to prevent reprocessing
+        save_sent_hash(candidate['content_hash'])
+        return False
+
+    # Validate translated content before creating message
+    if len(translated.strip()) < 10:
+        print("[SKIP] Çeviri çok kısa veya boş.")
+        return False
+
+    # Create X (Twitter) URL
+    tweet_url = "https://x.com/intent/tweet?text=" + quote(translated)
+    final_message = f"{translated}\n\n🔗 Post on X: {tweet_url}"
+
+    # Save to database as pending
+    post_data.update({
+        'translated_text': translated,
+        'classification': 'geopolitical',
+        'status': 'pending',
+    })
+
+    post_id = db.add_post(post_data)
+
+    if not post_id:
+        print("[WARN] Failed to save post to database or duplicate detected")
+        return False
+
+    print(f"[DATABASE] Saved post {post_id} to database")
+
+    cluster_id = story_clusters.assign(post_id, translated)
+    db.set_post_cluster(post_id, cluster_id)
+    if cluster_id != post_id:
+        print(f"[CLUSTER] Post {post_id} hikâye #{cluster_id} ile gruplandı.")
+
+    # Save hash BEFORE sending to prevent duplicates on restart
+    save_sent_hash(candidate['content_hash'])
+
+    # For now, still auto-post to Telegram (can be disabled later)
+    print("[SEND] Gönderiliyor:\n", final_message)
+    if media_items and len(media_items) > 1:
+        send_media_group_to_telegram(BOT_TOKEN, CHAT_ID, final_message, media_items)
+    else:
+        send_to_telegram(BOT_TOKEN, CHAT_ID, final_message, media_path, is_video=is_video)
+
+    # Update status to posted
+    db.update_post_status(post_id, 'posted')
+    return True
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Local pre-classifier that screens out obviously non-geopolitical messages.
+
+A multinomial naive Bayes model over hashed word unigrams and bigrams, trained
+from the posts table. The labels come from gpt-4o: rows classified
+'geopolitical' or 'non_geopolitical'. Rows the local model rejected itself
+('non_geopolitical_local') are never used for training. When the model is at
+least PRECLASSIFIER_THRESHOLD sure that a message is irrelevant, the GPT call
+is skipped.
+
+Usage:
+    python classifier.py --train      # retrain from posts and report held-out accuracy
+    python classifier.py --evaluate   # evaluate the saved model on all labeled posts
+"""
+
+import argparse
+import os
+import re
+import zlib
+import numpy as np
+from config import (PRECLASSIFIER_MODEL_FILE, PRECLASSIFIER_THRESHOLD,
+                    PRECLASSIFIER_MIN_SAMPLES, PRECLASSIFIER_FEATURES)
+
+LABELS = ['non_geopolitical', 'geopolitical']
+
+def tokenize(text):
+    """Lowercased word unigrams and bigrams"""
+    words = re.findall(r'\w+', (text or "").lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def hashed_counts(texts, n_features=PRECLASSIFIER_FEATURES):
+    """Sparse (rows, columns, counts) of hashed n-gram counts for a batch of texts"""
+    rows, columns = [], []
+    for row, text in enumerate(texts):
+        for token in tokenize(text):
+            rows.append(row)
+            columns.append(zlib.crc32(token.encode()) % n_features)
+    pairs = np.unique(np.array([rows, columns], dtype=np.int64).reshape(2, -1), axis=1, return_counts=True)
+    return pairs[0][0], pairs[0][1], pairs[1]
+
+class PreClassifier:
+    def __init__(self, log_prior, log_likelihood, threshold=PRECLASSIFIER_THRESHOLD):
+        self.log_prior = log_prior
+        self.log_likelihood = log_likelihood
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, texts, labels, n_features=PRECLASSIFIER_FEATURES, alpha=1.0):
+        """Fit on texts with labels from LABELS (Laplace smoothing alpha)"""
+        y = np.array([LABELS.index(label) for label in labels])
+        rows, columns, counts = hashed_counts(texts, n_features)
+        feature_counts = np.zeros((len(LABELS), n_features))
+        np.add.at(feature_counts, (y[rows], columns), counts)
+
+        class_counts = np.bincount(y, minlength=len(LABELS))
+        log_prior = np.log((class_counts + 1) / (len(y) + len(LABELS)))
+        smoothed = feature_counts + alpha
+        log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).astype(np.float32)
+        return cls(log_prior, log_likelihood)
+
+    def predict_proba(self, texts):
+        """Probability that each text is geopolitical"""
+        rows, columns, counts = hashed_counts(texts, self.log_likelihood.shape[1])
+        scores = np.tile(self.log_prior, (len(texts), 1))
+        for label in range(len(LABELS)):
+            np.add.at(scores[:, label], rows, counts * self.log_likelihood[label, columns])
+        # Softmax over the two classes, computed stably
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        return probabilities[:, 1] / probabilities.sum(axis=1)
+
+    def is_irrelevant(self, text):
+        """True when the model is confident the text is not geopolitical"""
+        return 1 - self.predict_proba([text])[0] >= self.threshold
+
+    def save(self, path=PRECLASSIFIER_MODEL_FILE):
+        np.savez_compressed(path, log_prior=self.log_prior, log_likelihood=self.log_likelihood)
+
+    @classmethod
+    def load(cls, path=PRECLASSIFIER_MODEL_FILE):
+        """Load a saved model; None when no model has been trained yet"""
+        if not os.path.isfile(path):
+            return None
+        with np.load(path) as model:
+            return cls(model['log_prior'], model['log_likelihood'])
+
+def evaluate(model, texts, labels):
+    """Print how many messages would skip GPT and how many geopolitical ones that loses"""
+    y = np.array([LABELS.index(label) for label in labels])
+    skipped = (1 - model.predict_proba(texts)) >= model.threshold
+    geopolitical = y == 1
+    missed = int((skipped & geopolitical).sum())
+    print(f"[CLASSIFIER] {len(y)} örnek, eşik {model.threshold}: "
+          f"{int(skipped.sum())} GPT çağrısı atlanır ({skipped.mean():.1%}), "
+          f"{missed} jeopolitik mesaj kaçar ({missed / max(geopolitical.sum(), 1):.1%})")
+    return skipped, missed
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or evaluate the local pre-classifier")
+    parser.add_argument('--train', action='store_true', help="Retrain from labeled posts")
+    parser.add_argument('--evaluate', action='store_true', help="Evaluate the saved model")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    rows = DatabaseManager().get_labeled_texts(LABELS)
+    texts = [text for text, _ in rows]
+    labels = [label for _, label in rows]
+
+    if args.train:
+        if len(rows) < PRECLASSIFIER_MIN_SAMPLES or len(set(labels)) < len(LABELS):
+            print(f"❌ [CLASSIFIER] Eğitim için yeterli etiketli post yok ({len(rows)}/{PRECLASSIFIER_MIN_SAMPLES}).")
+            return
+
+        # Hold out every fifth post to report how the new model would behave
+        held_out = set(range(0, len(rows), 5))
+        train = [i for i in range(len(rows)) if i not in held_out]
+        model = PreClassifier.train([texts[i] for i in train], [labels[i] for i in train])
+        evaluate(model, [texts[i] for i in held_out], [labels[i] for i in held_out])
+
+        model = PreClassifier.train(texts, labels)
+        model.save()
+        print(f"✅ [CLASSIFIER] Model {len(rows)} post ile eğitildi: {PRECLASSIFIER_MODEL_FILE}")
+    elif args.evaluate:
+        model = PreClassifier.load()
+        if model is None:
+            print("❌ [CLASSIFIER] Kayıtlı model yok, önce --train çalıştırın.")
+            return
+        evaluate(model, texts, labels)
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
@@ -85,8 +85,10 @@ api_hash = os.getenv("API_HASH")
 if api_hash is None:
     raise ValueError("API_HASH is missing")
 API_HASH = api_hash
+# GPT backend: "openai", or "standin" for the local simulator (llm_standin.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
 openai_key = os.getenv("OPENAI_API_KEY")
-if openai_key is None:
+if openai_key is None and LLM_BACKEND == "openai":
     raise ValueError("OPENAI_API_KEY is missing")
 OPENAI_API_KEY = openai_key
 bot_token = os.getenv("BOT_TOKEN")
@@ -97,7 +99,6 @@ chat_id = os.getenv("CHAT_ID")
 if chat_id is None:
     raise ValueError("CHAT_ID is missing")
 CHAT_ID = chat_id
-CSV_FILE = os.getenv("CSV_FILE", "gpt_full_log.csv")
 
 # Hardcoded configurations (non-sensitive)
 CHANNELS = {
@@ -130,4 +131,157 @@ SESSION_NAME = "multi_session"
 SESSION_FILE = get_session_file()  # Use dynamic session file path
 MESSAGE_LIMIT = 4
 LOOP_INTERVAL = 300  # 5 minutes
-MEDIA_THRESHOLD = 0.7  # For image color filter 
\ No newline at end of file
+MEDIA_THRESHOLD = 0.7  # For image color filter
+
+# Ingestion engine: 'async' polls all channels concurrently, 'events' listens for
+# NewMessage updates, 'sync' keeps the legacy serial loop
+INGESTION_MODE = os.getenv("INGESTION_MODE", "async")
+MAX_CONCURRENT_CHANNELS = int(os.getenv("MAX_CONCURRENT_CHANNELS", "8"))
+CHANNEL_TIMEOUT = 120  # Seconds a single channel may take per cycle
+EVENT_SWEEP_INTERVAL = 900  # Catch-up sweep period in events mode (seconds)
+
+# Processing pipeline: workers per stage and the bound on each inter-stage queue
+PIPELINE_QUEUE_SIZE = 100
+PIPELINE_WORKERS = {
+    'screen': 2,     # SQLite/hash checks (thread pool)
+    'media': 4,      # Telegram downloads (asyncio tasks)
+    'color': 2,      # Image color filter (process pool)
+    'fingerprint': 2,  # Image dHash + media duplicate check (thread pool)
+    'download': 4,   # Full-size media downloads after the filters (asyncio tasks)
+    'translate': 4,  # GPT calls (thread pool)
+    'publish': 1,    # DB insert + Bot API send (asyncio, serialised to respect Bot API limits)
+}
+
+# Adaptive polling: each channel gets its own interval between these bounds (seconds)
+MIN_POLL_INTERVAL = 30      # Floor for priority 1; multiplied by the channel priority
+MAX_POLL_INTERVAL = 1800
+POLL_BACKOFF = 2.0          # Interval multiplier after an empty or low-yield poll
+POLL_TARGET_BATCH = 3       # Busy channels are polled about every this many expected messages
+LOW_YIELD_RATE = 0.05       # Acceptance rate below which a channel counts as low-yield
+
+# Backfill: history is paged in batches and throttled to stay clear of flood waits
+BACKFILL_PAGE_SIZE = 100     # Messages per history request (Telegram's maximum)
+BACKFILL_PAGE_DELAY = 2.0    # Seconds between pages
+BACKFILL_POLL_INTERVAL = 30  # How often the worker checks for queued jobs
+
+# Peer cache: resolved channel InputPeers and sender names are reused for this long
+PEER_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+# Telegram rate governor: (requests per second, burst) per request kind
+TELEGRAM_RATE_LIMITS = {
+    'history': (1.0, 5),    # iter_messages / history pages
+    'download': (3.0, 10),  # download_media
+    'resolve': (0.2, 2),    # username / entity resolution
+}
+FLOOD_WAIT_MAX_RETRIES = 3
+
+# Batch scoring / rescoring of stored posts
+RESCORE_CHUNK_SIZE = 5000  # Posts read, scored and written back per transaction
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))  # Processes for feature extraction
+
+# Local pre-classifier: skips the GPT call for messages it is confident are not geopolitical
+PRECLASSIFIER_ENABLED = os.getenv("PRECLASSIFIER_ENABLED", "true").lower() == "true"
+PRECLASSIFIER_MODEL_FILE = "preclassifier.npz"  # Written by `python classifier.py --train`
+PRECLASSIFIER_THRESHOLD = 0.98   # Minimum P(non-geopolitical) to skip GPT
+PRECLASSIFIER_MIN_SAMPLES = 200  # Labeled posts required before training
+PRECLASSIFIER_FEATURES = 2 ** 18  # Hashed n-gram buckets
+
+# Near-duplicate detection (MinHash/LSH over word shingles, across all channels)
+NEAR_DUPLICATE_THRESHOLD = 0.6      # Estimated Jaccard similarity at which a message counts as a repost
+NEAR_DUPLICATE_WINDOW = 48 * 3600   # Seconds a screened message stays in the index
+NEAR_DUPLICATE_SHINGLE = 2          # Words per shingle
+NEAR_DUPLICATE_PERMUTATIONS = 64    # Signature length
+NEAR_DUPLICATE_BANDS = 16           # LSH bands (permutations / bands rows each)
+
+# Story clustering of accepted posts (TF-IDF cosine over a sliding window)
+CLUSTER_THRESHOLD = 0.35       # Minimum cosine similarity to join an existing story
+CLUSTER_WINDOW = 12 * 3600     # Seconds a story stays open for new posts
+
+# Media fingerprints: Telegram file ids and image dHashes of earlier posts
+MEDIA_DHASH_DISTANCE = 6  # Max differing bits (of 64) for two images to count as the same
+
+# Thumbnail-first media: filters run on a small preview, full files are only
+# fetched for posts that pass them
+MEDIA_PREVIEW_DIR = "media/previews/"
+PREVIEW_MIN_SIDE = 90  # Smallest usable thumbnail side (px) for the color filter and dHash
+MEDIA_SIZE_CAPS = {
+    'photo': 10 * 1024 * 1024,  # Bot API sendPhoto limit
+    'video': 50 * 1024 * 1024,  # Bot API upload limit
+}
+
+# Deferred media: rejected posts keep a Telegram reference instead of files,
+# downloaded when the dashboard asks for them
+MEDIA_FETCH_POLL_INTERVAL = 10  # How often the worker checks for queued media fetches (seconds)
+
+# Content-addressed media store: one file per distinct content, evicted by
+# post status/age and a total size budget
+MEDIA_STORE_DIR = "media/store/"
+MEDIA_STORE_BUDGET = int(os.getenv("MEDIA_STORE_BUDGET_MB", "2048")) * 1024 * 1024
+MEDIA_RETENTION_DAYS = {  # Days a post keeps its media files, by status
+    'deleted': 0,
+    'rejected': 1,
+    'archived': 3,
+    'posted': 7,
+    'processed': 7,
+    'approved': 14,
+    'pending': 14,
+}
+MEDIA_RETENTION_DEFAULT_DAYS = 7
+MEDIA_ORPHAN_GRACE = 3600      # Unreferenced files younger than this (seconds) may still get their post
+MEDIA_EVICT_INTERVAL = 600     # Seconds between eviction passes in the bot worker
+
+# Thumbnails generated for stored media, served by /api/media/<path>?w=<width>
+THUMBNAIL_WIDTHS = (160, 480, 960)
+THUMBNAIL_QUALITY = 80
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Translation cache: normalized text + prompt version + model -> GPT output
+TRANSLATION_MODEL = "gpt-4o"
+TRANSLATION_CACHE_SIZE = 2048                 # Entries kept in memory (LRU)
+TRANSLATION_CACHE_TTL = 7 * 24 * 3600         # Seconds a cached translation stays valid
+TRANSLATION_CACHE_MAX_ROWS = 50000            # Rows kept in SQLite; least recently used go first
+TRANSLATION_CACHE_PRUNE_EVERY = 500           # New entries between SQLite prunes
+
+# Batched GPT translation: several screened posts per request
+TRANSLATION_BATCH_MAX = 12                    # Posts per request at most (1 disables batching)
+TRANSLATION_BATCH_TOKENS = 3000               # Estimated prompt tokens of the posts in one request
+TRANSLATION_BATCH_OUTPUT_TOKENS = 150         # Completion tokens allowed per post
+TRANSLATION_BATCH_WAIT = 0.5                  # Seconds the translate stage waits to fill a batch
+
+# OpenAI client: concurrency, retries with backoff and a circuit breaker
+LLM_CONCURRENCY = 8              # Requests in flight at once
+LLM_TIMEOUT = 60                 # Seconds per request
+LLM_MAX_RETRIES = 4              # Retries of rate-limited, timed out or 5xx requests
+LLM_BACKOFF_BASE = 1.0           # First retry delay (seconds), doubled each time
+LLM_BACKOFF_MAX = 60             # Longest retry delay (seconds)
+LLM_BREAKER_THRESHOLD = 5        # Failed requests in a row that open the circuit
+LLM_BREAKER_COOLDOWN = 60        # Seconds the circuit stays open before a trial request
+
+# Messages parked while the LLM is unavailable, retried by the bot worker
+LLM_RETRY_POLL_INTERVAL = 30     # Seconds between passes over the retry queue
+LLM_RETRY_BATCH = 24             # Messages retried per pass
+LLM_RETRY_DELAY = 60             # First delay (seconds) after a failed retry, doubled each time
+LLM_RETRY_DELAY_MAX = 3600       # Longest delay between retries of one message
+LLM_RETRY_MAX_ATTEMPTS = 24      # Attempts before a message is left as 'failed' for a manual retry
+
+# GPT token accounting (llm_usage table) and daily budgets
+LLM_USAGE_FLUSH_SIZE = 50        # Usage rows buffered before a database write
+LLM_USAGE_FLUSH_INTERVAL = 30    # Longest time (seconds) a usage row stays buffered
+LLM_MAX_INPUT_TOKENS = 1000      # Estimated tokens a message is truncated to before GPT
+LLM_DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "0"))      # All channels; 0 = no limit
+LLM_CHANNEL_TOKEN_BUDGET = int(os.getenv("LLM_CHANNEL_TOKEN_BUDGET", "0"))  # Per channel unless CHANNELS sets 'token_budget'; 0 = no limit
+LLM_PRIORITY_BUDGET_SHARE = {    # Part of the daily budget a channel of each priority may use up to
+    1: 1.0,
+    2: 0.7,
+    3: 0.4,
+}
+
+# Local OpenAI-compatible stand-in (LLM_BACKEND=standin): simulated latency, errors and decisions
+LLM_STANDIN_URL = os.getenv("LLM_STANDIN_URL", "http://127.0.0.1:8765/v1")
+LLM_STANDIN_LATENCY = 0.8            # Median seconds per request
+LLM_STANDIN_LATENCY_SIGMA = 0.5      # Log-normal spread of the latency (tail)
+LLM_STANDIN_TOKEN_LATENCY = 0.01     # Extra seconds per completion token
+LLM_STANDIN_ERROR_RATE = 0.02        # Share of requests answered with a 500
+LLM_STANDIN_RATE_LIMIT_RATE = 0.02   # Share of requests answered with a 429
+LLM_STANDIN_SKIP_RATE = 0.6          # Share of messages answered with SKIP
+LLM_STANDIN_SEED = 1                 # Same seed, same decisions, latencies and errors
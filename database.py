@@ -1,5 +1,6 @@
 import sqlite3
 import json
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional, Any
 import logging
@@ -7,6 +8,13 @@ import werkzeug.security as security
 
 logger = logging.getLogger(__name__)
 
+def _post_media_files(media_path: Optional[str], media_paths: Optional[str]) -> set:
+    """Distinct files a post references through media_path and the media_paths JSON list"""
+    paths = set(json.loads(media_paths)) if media_paths else set()
+    if media_path:
+        paths.add(media_path)
+    return paths
+
 class DatabaseManager:
     def __init__(self, db_path: str = "osint_bot.db"):
         self.db_path = db_path
@@ -82,6 +90,157 @@ class DatabaseManager:
             )
         ''')
         
+        # Columns added after the initial schema (existing databases are migrated in place)
+        self._ensure_column(cursor, 'channels', 'last_message_id', 'INTEGER DEFAULT 0')
+        self._ensure_column(cursor, 'channels', 'message_rate', 'REAL DEFAULT 0')
+        self._ensure_column(cursor, 'channels', 'poll_interval', 'REAL')
+        self._ensure_column(cursor, 'posts', 'media_paths', 'TEXT')  # JSON list for albums
+        self._ensure_column(cursor, 'posts', 'cluster_id', 'INTEGER')  # Story cluster (id of its first post)
+        self._ensure_column(cursor, 'posts', 'duplicate_of', 'TEXT')  # message_id of the post whose media this reposts
+        self._ensure_column(cursor, 'posts', 'media_ref', 'TEXT')  # JSON Telegram reference of undownloaded media
+        
+        # Backfill jobs - resumable history catch-up requests
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_name TEXT NOT NULL,
+                start_date TEXT,
+                start_message_id INTEGER,
+                last_message_id INTEGER,
+                processed INTEGER DEFAULT 0,
+                skipped INTEGER DEFAULT 0,
+                failed INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'queued',
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Peer cache - resolved Telegram channels and sender names by id
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS peer_cache (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                peer_id INTEGER,
+                access_hash INTEGER,
+                peer_type TEXT,
+                name TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        ''')
+        
+        # Rescore jobs - recompute quality/bias scores of stored posts in id order
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rescore_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                last_post_id INTEGER DEFAULT 0,
+                processed INTEGER DEFAULT 0,
+                changed INTEGER DEFAULT 0,
+                status TEXT DEFAULT 'queued',
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # MinHash signatures of recently screened messages (near-duplicate index)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS minhash_index (
+                message_id TEXT PRIMARY KEY,
+                channel_name TEXT,
+                added_at REAL NOT NULL,
+                signature BLOB NOT NULL
+            )
+        ''')
+        
+        # Media fingerprints - Telegram file ids and image dHashes of earlier posts
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_fingerprints (
+                media_key TEXT PRIMARY KEY,
+                access_hash INTEGER,
+                kind TEXT,
+                path TEXT,
+                dhash INTEGER,
+                message_id TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Media fetch jobs - dashboard requests to download a rejected post's media
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_fetch_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id INTEGER NOT NULL,
+                status TEXT DEFAULT 'queued',
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Media files - content-addressed store index with post reference counts
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS media_files (
+                hash TEXT PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                size INTEGER NOT NULL,
+                refcount INTEGER DEFAULT 0,
+                created_at REAL NOT NULL,
+                thumbnails TEXT
+            )
+        ''')
+        self._ensure_column(cursor, 'media_files', 'thumbnails', 'TEXT')  # JSON {width: path}
+        
+        # Translation cache - GPT outputs by normalized text, prompt version and model
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS translation_cache (
+                key TEXT PRIMARY KEY,
+                output TEXT NOT NULL,
+                prompt_version TEXT,
+                model TEXT,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER DEFAULT 0
+            )
+        ''')
+        
+        # LLM retry queue - screened messages parked while GPT was unavailable
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_retry_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                message_id TEXT UNIQUE NOT NULL,
+                channel_name TEXT NOT NULL,
+                candidate TEXT NOT NULL,
+                media_type TEXT,
+                media_ref TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                status TEXT DEFAULT 'queued',
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # LLM usage - tokens per GPT request and message, written in batches
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS llm_usage (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                day TEXT NOT NULL,
+                channel_name TEXT,
+                message_id TEXT,
+                stage TEXT,
+                model TEXT,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                total_tokens INTEGER DEFAULT 0,
+                accepted INTEGER
+            )
+        ''')
+        
         # Users table for authentication
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -100,11 +259,25 @@ class DatabaseManager:
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_hash ON posts(content_hash)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_actions_post ON user_actions(post_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_analytics_date ON analytics(date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_backfill_status ON backfill_jobs(status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_minhash_added ON minhash_index(added_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_cluster ON posts(cluster_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_fetch_status ON media_fetch_jobs(status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_files_refcount ON media_files(refcount)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_translation_cache_used ON translation_cache(last_used)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_retry_due ON llm_retry_jobs(status, next_attempt_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_usage_day ON llm_usage(day, channel_name)')
         
         conn.commit()
         conn.close()
         logger.info("Database initialized successfully")
     
+    def _ensure_column(self, cursor, table: str, column: str, definition: str):
+        """Add a column to an existing table if it is missing"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row[1] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
     def seed_users(self):
         """Seed initial users if they don't exist"""
         users = [
@@ -163,8 +336,8 @@ class DatabaseManager:
                     message_id, channel_name, sender_name, original_text, 
                     translated_text, media_type, media_path, classification,
                     quality_score, bias_score, status, content_hash, 
-                    similarity_hash, priority, telegram_url
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    similarity_hash, priority, telegram_url, media_paths, duplicate_of, media_ref
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 post_data.get('message_id'),
                 post_data.get('channel_name'),
@@ -180,10 +353,16 @@ class DatabaseManager:
                 post_data.get('content_hash'),
                 post_data.get('similarity_hash'),
                 post_data.get('priority', 1),
-                post_data.get('telegram_url')
+                post_data.get('telegram_url'),
+                post_data.get('media_paths'),
+                post_data.get('duplicate_of'),
+                post_data.get('media_ref')
             ))
             
             post_id = cursor.lastrowid
+            self._adjust_media_refs(
+                cursor, dict.fromkeys(_post_media_files(post_data.get('media_path'), post_data.get('media_paths')), 1), 1
+            )
             conn.commit()
             logger.info(f"Added post {post_id} to database")
             return post_id
@@ -205,7 +384,7 @@ class DatabaseManager:
                 id, message_id, channel_name, sender_name, original_text,
                 translated_text, media_type, media_path, classification,
                 quality_score, bias_score, status, created_at, processed_at,
-                posted_at, twitter_url, telegram_url, priority
+                posted_at, twitter_url, telegram_url, priority, media_paths
             FROM posts
             WHERE message_id = ?
         ''', (message_id,))
@@ -218,31 +397,56 @@ class DatabaseManager:
                 'id', 'message_id', 'channel_name', 'sender_name', 'original_text',
                 'translated_text', 'media_type', 'media_path', 'classification',
                 'quality_score', 'bias_score', 'status', 'created_at', 'processed_at',
-                'posted_at', 'twitter_url', 'telegram_url', 'priority'
+                'posted_at', 'twitter_url', 'telegram_url', 'priority', 'media_paths'
             ]
             return dict(zip(columns, row))
         return None
 
-    def get_posts(self, status: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
-        """Get posts with optional filtering"""
+    def get_posts(self, status: Optional[str] = None, limit: int = 50, offset: int = 0,
+                  group_clusters: bool = False) -> List[Dict]:
+        """Get posts with optional filtering.
+
+        With group_clusters, each story cluster is returned once: its best
+        scoring post, with cluster_size members, ordered by the cluster's
+        latest post. Unclustered posts count as clusters of one.
+        """
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        query = '''
-            SELECT 
-                id, message_id, channel_name, sender_name, original_text,
-                translated_text, media_type, media_path, classification,
-                quality_score, bias_score, status, created_at, processed_at,
-                posted_at, twitter_url, telegram_url, priority
-            FROM posts
-        '''
+        columns = [
+            'id', 'message_id', 'channel_name', 'sender_name', 'original_text',
+            'translated_text', 'media_type', 'media_path', 'classification',
+            'quality_score', 'bias_score', 'status', 'created_at', 'processed_at',
+            'posted_at', 'twitter_url', 'telegram_url', 'priority', 'media_paths', 'cluster_id',
+            'duplicate_of', 'media_ref'
+        ]
         params: List[Any] = []
-        
+        where = ''
         if status:
-            query += ' WHERE status = ?'
+            where = ' WHERE status = ?'
             params.append(status)
         
-        query += ' ORDER BY created_at DESC LIMIT ? OFFSET ?'
+        if group_clusters:
+            query = f'''
+                SELECT {', '.join(columns)}, cluster_size FROM (
+                    SELECT {', '.join(columns)},
+                        ROW_NUMBER() OVER story_members AS member_rank,
+                        COUNT(*) OVER story AS cluster_size,
+                        MAX(created_at) OVER story AS last_activity
+                    FROM posts{where}
+                    WINDOW story AS (PARTITION BY COALESCE(cluster_id, -id)),
+                           story_members AS (story ORDER BY quality_score DESC, id ASC)
+                )
+                WHERE member_rank = 1
+                ORDER BY last_activity DESC LIMIT ? OFFSET ?
+            '''
+            columns = columns + ['cluster_size']
+        else:
+            query = f'''
+                SELECT {', '.join(columns)}
+                FROM posts{where}
+                ORDER BY created_at DESC LIMIT ? OFFSET ?
+            '''
         params.append(str(limit))
         params.append(str(offset))
         
@@ -250,13 +454,6 @@ class DatabaseManager:
         rows = cursor.fetchall()
         conn.close()
         
-        columns = [
-            'id', 'message_id', 'channel_name', 'sender_name', 'original_text',
-            'translated_text', 'media_type', 'media_path', 'classification',
-            'quality_score', 'bias_score', 'status', 'created_at', 'processed_at',
-            'posted_at', 'twitter_url', 'telegram_url', 'priority'
-        ]
-        
         return [dict(zip(columns, row)) for row in rows]
     
     def update_post_status(self, post_id: int, status: str, **kwargs) -> bool:
@@ -371,6 +568,24 @@ class DatabaseManager:
             'total_posts': row[2] or 0
         }
         
+        # GPT token usage per day and per channel
+        usage_columns = ['requests', 'prompt_tokens', 'completion_tokens', 'total_tokens', 'accepted']
+        usage_select = '''
+            COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(total_tokens),
+            COALESCE(SUM(accepted), 0)
+        '''
+        cursor.execute(f'''
+            SELECT day, {usage_select} FROM llm_usage
+            WHERE day >= ? GROUP BY day ORDER BY day
+        ''', (start_date.strftime('%Y-%m-%d'),))
+        analytics['llm_usage_daily'] = {row[0]: dict(zip(usage_columns, row[1:])) for row in cursor.fetchall()}
+        
+        cursor.execute(f'''
+            SELECT channel_name, {usage_select} FROM llm_usage
+            WHERE day >= ? GROUP BY channel_name ORDER BY SUM(total_tokens) DESC
+        ''', (start_date.strftime('%Y-%m-%d'),))
+        analytics['llm_usage_by_channel'] = {row[0]: dict(zip(usage_columns, row[1:])) for row in cursor.fetchall()}
+        
         conn.close()
         return analytics
     
@@ -393,4 +608,901 @@ class DatabaseManager:
         conn.close()
         
         logger.info(f"Archived {archived_count} old posts")
-        return archived_count 
\ No newline at end of file
+        return archived_count 
+    
+    def get_existing_message_ids(self, message_ids: List[str]) -> set:
+        """Return the subset of message_ids already stored, in one query per 500 ids"""
+        existing = set()
+        if not message_ids:
+            return existing
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        for i in range(0, len(message_ids), 500):
+            chunk = message_ids[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT message_id FROM posts WHERE message_id IN ({placeholders})', chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        
+        conn.close()
+        return existing
+    
+    def get_channel_cursor(self, channel_name: str) -> int:
+        """Get the highest Telegram message id already processed for a channel"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute(
+            "SELECT last_message_id FROM channels WHERE name = ?",
+            (channel_name,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+        
+        return (row[0] or 0) if row else 0
+    
+    def update_channel_cursor(self, channel_name: str, message_id: int):
+        """Advance a channel's message cursor; never moves it backwards"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO channels (name, last_message_id, last_processed)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(name) DO UPDATE SET
+                last_message_id = MAX(COALESCE(last_message_id, 0), excluded.last_message_id),
+                last_processed = CURRENT_TIMESTAMP
+        ''', (channel_name, message_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_channel_stats(self) -> Dict[str, Dict]:
+        """Get scheduling statistics for all known channels, keyed by name"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT name, priority, last_processed, total_posts, success_rate,
+                   message_rate, poll_interval
+            FROM channels
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['name', 'priority', 'last_processed', 'total_posts', 'success_rate',
+                   'message_rate', 'poll_interval']
+        return {row[0]: dict(zip(columns, row)) for row in rows}
+    
+    def record_channel_poll(self, channel_name: str, priority: int, posted: int,
+                            message_rate: float, success_rate: float, poll_interval: float):
+        """Store the outcome of one poll of a channel"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO channels (name, priority, last_processed, total_posts,
+                                  success_rate, message_rate, poll_interval)
+            VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET
+                priority = excluded.priority,
+                last_processed = CURRENT_TIMESTAMP,
+                total_posts = COALESCE(total_posts, 0) + excluded.total_posts,
+                success_rate = excluded.success_rate,
+                message_rate = excluded.message_rate,
+                poll_interval = excluded.poll_interval
+        ''', (channel_name, priority, posted, success_rate, message_rate, poll_interval))
+        
+        conn.commit()
+        conn.close()
+    
+    def create_backfill_job(self, channel_name: str, start_date: Optional[str] = None,
+                            start_message_id: Optional[int] = None) -> int:
+        """Queue a backfill of a channel from a date or message id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO backfill_jobs (channel_name, start_date, start_message_id)
+            VALUES (?, ?, ?)
+        ''', (channel_name, start_date, start_message_id))
+        
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        logger.info(f"Queued backfill job {job_id} for {channel_name}")
+        return job_id
+    
+    def get_backfill_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+        """Get backfill jobs, oldest first when filtering by status, newest first otherwise"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT id, channel_name, start_date, start_message_id, last_message_id,
+                   processed, skipped, failed, status, error, created_at, updated_at
+            FROM backfill_jobs
+        '''
+        params: List[Any] = []
+        
+        if statuses:
+            query += f' WHERE status IN ({", ".join("?" * len(statuses))}) ORDER BY id ASC'
+            params.extend(statuses)
+        else:
+            query += ' ORDER BY id DESC'
+        
+        query += ' LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = [
+            'id', 'channel_name', 'start_date', 'start_message_id', 'last_message_id',
+            'processed', 'skipped', 'failed', 'status', 'error', 'created_at', 'updated_at'
+        ]
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def update_backfill_job(self, job_id: int, **fields) -> bool:
+        """Update progress/status fields of a backfill job"""
+        allowed = ['last_message_id', 'processed', 'skipped', 'failed', 'status', 'error']
+        update_fields = ['updated_at = CURRENT_TIMESTAMP']
+        params: List[Any] = []
+        
+        for key, value in fields.items():
+            if key in allowed:
+                update_fields.append(f'{key} = ?')
+                params.append(value)
+        params.append(job_id)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE backfill_jobs SET {", ".join(update_fields)} WHERE id = ?', params)
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return success
+    
+    def get_cached_peers(self, min_updated_at: float = 0) -> List[Dict]:
+        """Get cached peers refreshed after min_updated_at (unix time)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT kind, key, peer_id, access_hash, peer_type, name, updated_at
+            FROM peer_cache
+            WHERE updated_at >= ?
+        ''', (min_updated_at,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['kind', 'key', 'peer_id', 'access_hash', 'peer_type', 'name', 'updated_at']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def save_cached_peer(self, peer: Dict[str, Any]):
+        """Insert or refresh a cached peer"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO peer_cache
+                (kind, key, peer_id, access_hash, peer_type, name, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            peer['kind'], peer['key'], peer.get('peer_id'), peer.get('access_hash'),
+            peer.get('peer_type'), peer.get('name'), peer['updated_at']
+        ))
+        
+        conn.commit()
+        conn.close()
+    
+    def create_rescore_job(self) -> int:
+        """Queue a rescore of every stored post"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('INSERT INTO rescore_jobs DEFAULT VALUES')
+        
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        logger.info(f"Queued rescore job {job_id}")
+        return job_id
+    
+    def get_rescore_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+        """Get rescore jobs, oldest first when filtering by status, newest first otherwise"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT id, last_post_id, processed, changed, status, error, created_at, updated_at
+            FROM rescore_jobs
+        '''
+        params: List[Any] = []
+        
+        if statuses:
+            query += f' WHERE status IN ({", ".join("?" * len(statuses))}) ORDER BY id ASC'
+            params.extend(statuses)
+        else:
+            query += ' ORDER BY id DESC'
+        
+        query += ' LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['id', 'last_post_id', 'processed', 'changed', 'status', 'error', 'created_at', 'updated_at']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def update_rescore_job(self, job_id: int, **fields) -> bool:
+        """Update status fields of a rescore job"""
+        allowed = ['status', 'error']
+        update_fields = ['updated_at = CURRENT_TIMESTAMP']
+        params: List[Any] = []
+        
+        for key, value in fields.items():
+            if key in allowed:
+                update_fields.append(f'{key} = ?')
+                params.append(value)
+        params.append(job_id)
+        
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(f'UPDATE rescore_jobs SET {", ".join(update_fields)} WHERE id = ?', params)
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return success
+    
+    def get_posts_for_rescore(self, after_id: int, limit: int) -> List[tuple]:
+        """Next chunk of (id, original_text, quality_score, bias_score) with id > after_id"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, original_text, quality_score, bias_score
+            FROM posts
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def save_rescore_chunk(self, job_id: int, scores: List[tuple], last_post_id: int,
+                           processed: int, changed: int):
+        """Write (quality_score, bias_score, id) rows and the job's progress in one transaction"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('UPDATE posts SET quality_score = ?, bias_score = ? WHERE id = ?', scores)
+        cursor.execute('''
+            UPDATE rescore_jobs
+            SET last_post_id = ?, processed = ?, changed = ?, status = 'running',
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (last_post_id, processed, changed, job_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_labeled_texts(self, classifications: List[str]) -> List[tuple]:
+        """(original_text, classification) of posts with one of the given classifications"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        placeholders = ', '.join('?' * len(classifications))
+        cursor.execute(f'''
+            SELECT original_text, classification
+            FROM posts
+            WHERE classification IN ({placeholders})
+            ORDER BY id
+        ''', classifications)
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def get_minhashes(self, since: float) -> List[tuple]:
+        """(message_id, added_at, signature) of indexed messages added after since, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT message_id, added_at, signature
+            FROM minhash_index
+            WHERE added_at >= ?
+            ORDER BY added_at
+        ''', (since,))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def save_minhash(self, message_id: str, channel_name: str, added_at: float, signature: bytes):
+        """Persist the MinHash signature of a screened message"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO minhash_index (message_id, channel_name, added_at, signature)
+            VALUES (?, ?, ?, ?)
+        ''', (message_id, channel_name, added_at, signature))
+        
+        conn.commit()
+        conn.close()
+    
+    def prune_minhashes(self, before: float) -> int:
+        """Drop signatures that fell out of the near-duplicate window"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM minhash_index WHERE added_at < ?', (before,))
+        deleted = cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_clustered_posts(self, since: float) -> List[tuple]:
+        """(id, cluster_id, translated_text, created unix time) of clustered posts created after since"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, cluster_id, translated_text, CAST(strftime('%s', created_at) AS REAL)
+            FROM posts
+            WHERE cluster_id IS NOT NULL AND created_at >= datetime(?, 'unixepoch')
+            ORDER BY id
+        ''', (since,))
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def set_post_cluster(self, post_id: int, cluster_id: int):
+        """Assign a post to a story cluster"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE posts SET cluster_id = ? WHERE id = ?', (cluster_id, post_id))
+        
+        conn.commit()
+        conn.close()
+    
+    def get_media_fingerprints(self) -> List[Dict]:
+        """All recorded media fingerprints, oldest first"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT media_key, access_hash, kind, path, dhash, message_id
+            FROM media_fingerprints
+            ORDER BY rowid
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['media_key', 'access_hash', 'kind', 'path', 'dhash', 'message_id']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def save_media_fingerprint(self, entry: Dict[str, Any]):
+        """Record media the first time it is seen"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO media_fingerprints
+                (media_key, access_hash, kind, path, dhash, message_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            entry['media_key'], entry.get('access_hash'), entry.get('kind'),
+            entry.get('path'), entry.get('dhash'), entry.get('message_id')
+        ))
+        
+        conn.commit()
+        conn.close()
+    
+    def set_media_fingerprint_path(self, media_key: str, path: str):
+        """Point a fingerprint at the full file once it has been downloaded"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('UPDATE media_fingerprints SET path = ? WHERE media_key = ?', (path, media_key))
+        
+        conn.commit()
+        conn.close()
+    
+    def create_media_fetch_job(self, post_id: int) -> int:
+        """Queue a download of a post's deferred media; reuses an unfinished job for the same post"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id FROM media_fetch_jobs
+            WHERE post_id = ? AND status IN ('queued', 'running')
+        ''', (post_id,))
+        row = cursor.fetchone()
+        if row:
+            conn.close()
+            return row[0]
+        
+        cursor.execute('INSERT INTO media_fetch_jobs (post_id) VALUES (?)', (post_id,))
+        job_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        logger.info(f"Queued media fetch job {job_id} for post {post_id}")
+        return job_id
+    
+    def get_media_fetch_jobs(self, statuses: Optional[List[str]] = None, limit: int = 50) -> List[Dict]:
+        """Get media fetch jobs, oldest first when filtering by status, newest first otherwise"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        query = 'SELECT id, post_id, status, error, created_at, updated_at FROM media_fetch_jobs'
+        params: List[Any] = []
+        
+        if statuses:
+            query += f' WHERE status IN ({", ".join("?" * len(statuses))}) ORDER BY id ASC'
+            params.extend(statuses)
+        else:
+            query += ' ORDER BY id DESC'
+        
+        query += ' LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['id', 'post_id', 'status', 'error', 'created_at', 'updated_at']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def update_media_fetch_job(self, job_id: int, status: str, error: Optional[str] = None) -> bool:
+        """Set the status (and error) of a media fetch job"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE media_fetch_jobs SET status = ?, error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, error, job_id))
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return success
+    
+    def get_post_media(self, post_id: int) -> Optional[Dict]:
+        """Media fields of a post, including its deferred media reference"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, media_type, media_path, media_paths, media_ref
+            FROM posts WHERE id = ?
+        ''', (post_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            return dict(zip(['id', 'media_type', 'media_path', 'media_paths', 'media_ref'], row))
+        return None
+    
+    def set_post_media(self, post_id: int, media_path: Optional[str], media_paths: Optional[str]) -> bool:
+        """Store the downloaded files of a post's deferred media"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT media_path, media_paths FROM posts WHERE id = ?', (post_id,))
+        row = cursor.fetchone()
+        cursor.execute('''
+            UPDATE posts SET media_path = ?, media_paths = ? WHERE id = ?
+        ''', (media_path, media_paths, post_id))
+        success = cursor.rowcount > 0
+        if success:
+            self._adjust_media_refs(cursor, dict.fromkeys(_post_media_files(*row), 1), -1)
+            self._adjust_media_refs(cursor, dict.fromkeys(_post_media_files(media_path, media_paths), 1), 1)
+        conn.commit()
+        conn.close()
+        return success
+    
+    def add_media_file(self, file_hash: str, path: str, size: int, created_at: float) -> str:
+        """Index a stored file; returns the path already stored for this content if there is one.
+
+        Storing known content again refreshes created_at, which protects a
+        file that is about to get a reference from orphan eviction.
+        """
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO media_files (hash, path, size, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(hash) DO UPDATE SET created_at = excluded.created_at
+        ''', (file_hash, path, size, created_at))
+        cursor.execute('SELECT path FROM media_files WHERE hash = ?', (file_hash,))
+        stored_path = cursor.fetchone()[0]
+        
+        conn.commit()
+        conn.close()
+        return stored_path
+    
+    def get_media_file(self, path: str) -> Optional[Dict]:
+        """Index entry of a stored file by path"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT hash, path, size, refcount, created_at, thumbnails FROM media_files WHERE path = ?
+        ''', (path,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        if row:
+            entry = dict(zip(['hash', 'path', 'size', 'refcount', 'created_at', 'thumbnails'], row))
+            entry['thumbnails'] = {int(width): thumbnail for width, thumbnail in
+                                   json.loads(entry['thumbnails'] or '{}').items()}
+            return entry
+        return None
+    
+    def get_media_store_usage(self, orphan_before: float = 0) -> Dict[str, int]:
+        """File count and bytes of the store, leaving out unreferenced files newer than orphan_before"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_files
+            WHERE refcount > 0 OR created_at < ?
+        ''', (orphan_before,))
+        files, size = cursor.fetchone()
+        conn.close()
+        return {'files': files, 'size': size}
+    
+    def get_unreferenced_media_files(self, before: float) -> List[Dict]:
+        """Stored files no post references, indexed before the given time"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT hash, path, size, thumbnails FROM media_files
+            WHERE refcount = 0 AND created_at < ?
+        ''', (before,))
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(zip(['hash', 'path', 'size', 'thumbnails'], row)) for row in rows]
+    
+    def delete_media_files(self, hashes: List[str], before: float) -> List[str]:
+        """Drop index entries that are still unreferenced; returns the hashes actually deleted"""
+        deleted: List[str] = []
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            condition = f'hash IN ({placeholders}) AND refcount = 0 AND created_at < ?'
+            cursor.execute(f'SELECT hash FROM media_files WHERE {condition}', chunk + [before])
+            deleted.extend(row[0] for row in cursor.fetchall())
+            cursor.execute(f'DELETE FROM media_files WHERE {condition}', chunk + [before])
+        
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_expired_media_posts(self, retention_days: Dict[str, float], default_days: float) -> List[int]:
+        """Ids of posts with media older than the retention of their status"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cases = ' '.join('WHEN ? THEN ?' for _ in retention_days)
+        params: List[Any] = [value for item in retention_days.items() for value in item]
+        cursor.execute(f'''
+            SELECT id FROM posts
+            WHERE (media_path IS NOT NULL OR media_paths IS NOT NULL)
+              AND julianday('now') - julianday(created_at) > CASE status {cases} ELSE ? END
+        ''', params + [default_days])
+        post_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return post_ids
+    
+    def get_media_posts_by_value(self, retention_days: Dict[str, float], default_days: float,
+                                 limit: int = 100) -> List[int]:
+        """Ids of posts with media, least valuable first: shortest retention, then oldest"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cases = ' '.join('WHEN ? THEN ?' for _ in retention_days)
+        params: List[Any] = [value for item in retention_days.items() for value in item]
+        cursor.execute(f'''
+            SELECT id FROM posts
+            WHERE media_path IS NOT NULL OR media_paths IS NOT NULL
+            ORDER BY CASE status {cases} ELSE ? END ASC, created_at ASC
+            LIMIT ?
+        ''', params + [default_days, limit])
+        post_ids = [row[0] for row in cursor.fetchall()]
+        conn.close()
+        return post_ids
+    
+    def release_post_media(self, post_ids: List[int]) -> int:
+        """Detach the files of posts and drop their references; media_ref is kept for re-downloads"""
+        released = 0
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT media_path, media_paths FROM posts WHERE id IN ({placeholders})', chunk)
+            references = Counter()
+            for media_path, media_paths in cursor.fetchall():
+                references.update(_post_media_files(media_path, media_paths))
+            cursor.execute(f'''
+                UPDATE posts SET media_path = NULL, media_paths = NULL WHERE id IN ({placeholders})
+            ''', chunk)
+            released += cursor.rowcount
+            self._adjust_media_refs(cursor, references, -1)
+        
+        conn.commit()
+        conn.close()
+        return released
+    
+    def get_post_media_files(self) -> List[tuple]:
+        """(media_path, media_paths) of every post that has media files"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT media_path, media_paths FROM posts
+            WHERE media_path IS NOT NULL OR media_paths IS NOT NULL
+        ''')
+        rows = cursor.fetchall()
+        conn.close()
+        return rows
+    
+    def recount_media_refs(self) -> int:
+        """Recompute every stored file's reference count from the posts table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        references = Counter()
+        cursor.execute('''
+            SELECT media_path, media_paths FROM posts
+            WHERE media_path IS NOT NULL OR media_paths IS NOT NULL
+        ''')
+        for media_path, media_paths in cursor.fetchall():
+            references.update(_post_media_files(media_path, media_paths))
+        cursor.execute('UPDATE media_files SET refcount = 0')
+        self._adjust_media_refs(cursor, references, 1)
+        
+        conn.commit()
+        conn.close()
+        return len(references)
+    
+    def replace_media_paths(self, moved: Dict[str, str]):
+        """Point posts and media fingerprints at files that moved (old path -> new path)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT id, media_path, media_paths FROM posts
+            WHERE media_path IS NOT NULL OR media_paths IS NOT NULL
+        ''')
+        updates = []
+        for post_id, media_path, media_paths in cursor.fetchall():
+            paths = json.loads(media_paths) if media_paths else None
+            new_path = moved.get(media_path, media_path)
+            new_paths = [moved.get(path, path) for path in paths] if paths else None
+            if new_path != media_path or new_paths != paths:
+                updates.append((new_path, json.dumps(new_paths) if new_paths else None, post_id))
+        cursor.executemany('UPDATE posts SET media_path = ?, media_paths = ? WHERE id = ?', updates)
+        cursor.executemany('UPDATE media_fingerprints SET path = ? WHERE path = ?',
+                           [(new, old) for old, new in moved.items()])
+        
+        conn.commit()
+        conn.close()
+    
+    def _adjust_media_refs(self, cursor, references: Dict[str, int], sign: int):
+        """Add (sign=1) or remove (sign=-1) post references to stored files"""
+        cursor.executemany('''
+            UPDATE media_files SET refcount = MAX(refcount + ?, 0) WHERE path = ?
+        ''', [(sign * count, path) for path, count in references.items()])
+
+    def set_media_thumbnails(self, file_hash: str, thumbnails: str, size: int):
+        """Record the thumbnails of a stored file (JSON {width: path}); their bytes count toward its size"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            UPDATE media_files SET thumbnails = ?, size = size + ? WHERE hash = ?
+        ''', (thumbnails, size, file_hash))
+        
+        conn.commit()
+        conn.close()
+
+    def get_cached_translation(self, key: str, min_created_at: float) -> Optional[Dict]:
+        """Cached translation created after min_created_at; counts the hit"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT output, created_at FROM translation_cache
+            WHERE key = ? AND created_at >= ?
+        ''', (key, min_created_at))
+        row = cursor.fetchone()
+        if row:
+            cursor.execute('''
+                UPDATE translation_cache SET hits = hits + 1, last_used = ? WHERE key = ?
+            ''', (datetime.now(timezone.utc).timestamp(), key))
+            conn.commit()
+        conn.close()
+        
+        if row:
+            return {'output': row[0], 'created_at': row[1]}
+        return None
+    
+    def save_cached_translation(self, key: str, output: str, prompt_version: str, model: str,
+                                created_at: float):
+        """Insert or refresh a cached translation"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO translation_cache
+                (key, output, prompt_version, model, created_at, last_used, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+        ''', (key, output, prompt_version, model, created_at, created_at))
+        
+        conn.commit()
+        conn.close()
+    
+    def prune_translation_cache(self, min_created_at: float, max_rows: int) -> int:
+        """Delete expired translations, then the least recently used beyond max_rows"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM translation_cache WHERE created_at < ?', (min_created_at,))
+        deleted = cursor.rowcount
+        cursor.execute('''
+            DELETE FROM translation_cache WHERE key IN (
+                SELECT key FROM translation_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+            )
+        ''', (max_rows,))
+        deleted += cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return deleted
+    
+    def get_translation_cache_stats(self) -> Dict[str, int]:
+        """Number of cached translations and the hits they served"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM translation_cache')
+        rows, hits = cursor.fetchone()
+        conn.close()
+        return {'rows': rows, 'hits': hits}
+
+    def park_llm_retry(self, entry: Dict[str, Any]) -> bool:
+        """Queue a screened message whose GPT request failed; False if it is already queued"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO llm_retry_jobs
+                (message_id, channel_name, candidate, media_type, media_ref, next_attempt_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(message_id) DO NOTHING
+        ''', (entry['message_id'], entry['channel_name'], entry['candidate'], entry.get('media_type'),
+              entry.get('media_ref'), entry['next_attempt_at']))
+        
+        parked = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return parked
+    
+    def get_due_llm_retries(self, now: float, limit: int) -> List[Dict]:
+        """Queued messages whose next attempt is due, oldest first"""
+        return self.get_llm_retries(['queued'], limit, due_before=now)
+    
+    def get_llm_retries(self, statuses: Optional[List[str]] = None, limit: int = 50,
+                        due_before: Optional[float] = None) -> List[Dict]:
+        """Get parked messages, oldest first when filtering by status, newest first otherwise"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        query = '''
+            SELECT id, message_id, channel_name, candidate, media_type, media_ref, attempts,
+                   next_attempt_at, status, error, created_at, updated_at
+            FROM llm_retry_jobs
+        '''
+        conditions = []
+        params: List[Any] = []
+        
+        if statuses:
+            conditions.append(f'status IN ({", ".join("?" * len(statuses))})')
+            params.extend(statuses)
+        if due_before is not None:
+            conditions.append('next_attempt_at <= ?')
+            params.append(due_before)
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY id ASC' if statuses else ' ORDER BY id DESC'
+        
+        query += ' LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        columns = ['id', 'message_id', 'channel_name', 'candidate', 'media_type', 'media_ref', 'attempts',
+                   'next_attempt_at', 'status', 'error', 'created_at', 'updated_at']
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def update_llm_retry(self, job_id: int, status: str, attempts: Optional[int] = None,
+                         next_attempt_at: Optional[float] = None, error: Optional[str] = None) -> bool:
+        """Set the status of a parked message, and its attempt count and next attempt when given"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE llm_retry_jobs
+            SET status = ?, attempts = COALESCE(?, attempts), next_attempt_at = COALESCE(?, next_attempt_at),
+                error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (status, attempts, next_attempt_at, error, job_id))
+        success = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return success
+    
+    def requeue_failed_llm_retries(self, now: float) -> int:
+        """Give messages that ran out of attempts a fresh set; returns how many were requeued"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE llm_retry_jobs
+            SET status = 'queued', attempts = 0, next_attempt_at = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'failed'
+        ''', (now,))
+        requeued = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return requeued
+    
+    def get_llm_retry_counts(self) -> Dict[str, int]:
+        """Number of parked messages by status"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) FROM llm_retry_jobs GROUP BY status')
+        counts = dict(cursor.fetchall())
+        conn.close()
+        return counts
+
+    def add_llm_usage(self, rows: List[Dict[str, Any]]):
+        """Insert buffered token usage rows in one transaction"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        
+        cursor.executemany('''
+            INSERT INTO llm_usage
+                (created_at, day, channel_name, message_id, stage, model,
+                 prompt_tokens, completion_tokens, total_tokens, accepted)
+            VALUES (:created_at, :day, :channel_name, :message_id, :stage, :model,
+                    :prompt_tokens, :completion_tokens, :total_tokens, :accepted)
+        ''', rows)
+        
+        conn.commit()
+        conn.close()
+    
+    def get_llm_usage_by_channel(self, day: str) -> Dict[str, int]:
+        """Total tokens per channel on a UTC day (YYYY-MM-DD)"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT channel_name, SUM(total_tokens) FROM llm_usage
+            WHERE day = ? GROUP BY channel_name
+        ''', (day,))
+        totals = dict(cursor.fetchall())
+        conn.close()
+        return totals
@@ -0,0 +1,624 @@
+"""
+Asyncio ingestion engine.
+
+Polls every configured channel concurrently on the async TelegramClient, so a
+cycle takes as long as the slowest channel instead of the sum of all of them.
+The 'events' mode subscribes to NewMessage updates instead and only polls to
+catch up after (re)connecting. Fetched messages flow through IngestPipeline
+(screen -> media previews -> color filter -> fingerprint -> translate ->
+full download -> publish), and a cycle only
+ends once the whole backlog has been drained.
+"""
+
+import asyncio
+import os
+import time
+import traceback
+from collections import defaultdict
+from telethon import events
+from telethon.tl.types import Document, PhotoCachedSize, PhotoSize, PhotoSizeProgressive
+from config import *
+from telethon import utils as telethon_utils
+from bot import (db, is_rejected, media_reference, media_store, screen_message, translate_candidate,
+                 translate_candidates, store_candidate, translation_cache)
+from media_index import MediaIndex, media_key
+from peer_cache import PeerCache
+from pipeline import Pipeline, Stage
+from rate_governor import RateGovernor
+from scheduler import ChannelScheduler
+from utils import get_sent_hashes, is_image_red_or_black_heavy, image_dhash
+
+# Shared by polling, events and backfill: one request budget and peers resolved once per TTL
+governor = RateGovernor()
+peers = PeerCache(db, governor)
+media_index = MediaIndex(db)
+
+async def collect(messages):
+    """Drain a Telethon message iterator into a list"""
+    return [message async for message in messages]
+
+def group_albums(messages):
+    """Collapse messages sharing a grouped_id into one (primary, album) entry.
+
+    Single messages come back as (message, None). For albums the primary is
+    the member carrying the caption. Order of first appearance is kept.
+    """
+    entries = []
+    albums = {}
+    for message in messages:
+        grouped_id = getattr(message, 'grouped_id', None)
+        if grouped_id is None:
+            entries.append([message, None])
+        elif grouped_id in albums:
+            albums[grouped_id].append(message)
+        else:
+            albums[grouped_id] = [message]
+            entries.append([None, albums[grouped_id]])
+
+    for entry in entries:
+        album = entry[1]
+        if album is not None:
+            entry[0] = next((message for message in album if message.text), album[0])
+    return [tuple(entry) for entry in entries]
+
+def preview_thumb(media):
+    """Smallest thumbnail of a photo/video at least PREVIEW_MIN_SIDE px on its short side, or None"""
+    sizes = getattr(media, 'sizes', None) or getattr(media, 'thumbs', None) or []
+    usable = [size for size in sizes
+              if isinstance(size, (PhotoSize, PhotoCachedSize, PhotoSizeProgressive))
+              and min(size.w, size.h) >= PREVIEW_MIN_SIDE]
+    return min(usable, key=lambda size: size.w * size.h, default=None)
+
+def media_size(media):
+    """Bytes of the full photo/video as reported by Telegram, or None"""
+    if isinstance(media, Document):
+        return media.size
+    sizes = [size.size for size in getattr(media, 'sizes', []) if isinstance(size, PhotoSize)]
+    sizes += [max(size.sizes) for size in getattr(media, 'sizes', []) if isinstance(size, PhotoSizeProgressive)]
+    return max(sizes, default=None)
+
+def remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def discard_previews(job):
+    """Delete the preview files of a dropped post"""
+    for (path, _), ref in zip(job['media_items'], job['media_refs']):
+        if ref['preview']:
+            remove_file(path)
+
+def set_media_type(job):
+    """Derive media_type/media_path/is_video from media_items"""
+    items = job['media_items']
+    if items:
+        job['media_type'] = "album" if len(items) > 1 else ("video" if items[0][1] else "photo")
+        job['media_path'], job['is_video'] = items[0]
+    else:
+        job['media_path'], job['is_video'] = None, False
+
+def color_filter_stage(job):
+    """Drop posts whose photos are dominated by red/black pixels (runs in the process pool).
+
+    Runs on the previews, so rejected photos are never downloaded in full.
+    """
+    photos = [path for path, is_video in job['media_items'] if not is_video]
+    if any(is_image_red_or_black_heavy(path, MEDIA_THRESHOLD) for path in photos):
+        print("[SKIP] Görselde kırmızı/siyah baskın. Atlanıyor.")
+        discard_previews(job)
+        return None
+    return job
+
+class IngestPipeline(Pipeline):
+    """Pipeline wired with the ingestion stages"""
+
+    def __init__(self, client, sent_hashes):
+        self.client = client
+        self.sent_hashes = sent_hashes
+        self.posted = 0
+        self.posted_by_channel = defaultdict(int)
+        # Telegram ids per channel whose processing raised; the cursor stays below them
+        self.failed = defaultdict(set)
+        super().__init__([
+            Stage('screen', self.screen, PIPELINE_WORKERS['screen'], kind='thread'),
+            Stage('media', self.fetch_media, PIPELINE_WORKERS['media'], kind='async'),
+            Stage('color', color_filter_stage, PIPELINE_WORKERS['color'], kind='process',
+                  when=lambda job: any(not is_video for _, is_video in job['media_items'])),
+            Stage('fingerprint', self.fingerprint, PIPELINE_WORKERS['fingerprint'], kind='thread',
+                  when=lambda job: bool(job['media_items'])),
+            Stage('translate', self.translate, PIPELINE_WORKERS['translate'], kind='thread',
+                  batch_size=TRANSLATION_BATCH_MAX, batch_wait=TRANSLATION_BATCH_WAIT),
+            Stage('download', self.download_full, PIPELINE_WORKERS['download'], kind='async',
+                  when=lambda job: any(ref['preview'] for ref in job['media_refs'])),
+            Stage('publish', self.publish, PIPELINE_WORKERS['publish'], kind='async'),
+        ], queue_size=PIPELINE_QUEUE_SIZE, on_error=self.record_failure)
+
+    @staticmethod
+    def make_job(channel, info, message, album=None, min_age=0, check_db=True):
+        return {
+            'channel': channel,
+            'info': info,
+            'message': message,
+            'album': album,
+            'telegram_id': message.id,
+            'min_age': min_age,
+            'check_db': check_db,
+            'media_type': None,
+            'media_path': None,
+            'media_items': [],
+            # Per media item: {'key', 'access_hash', 'duplicate_of', 'media', 'preview', 'telegram_id'}
+            # (parallel to media_items)
+            'media_refs': [],
+            'is_video': False,
+        }
+
+    def record_failure(self, stage, job, error):
+        print(f"❌ Pipeline hatası ({stage.name}, {job['channel']}/{job['telegram_id']}):", error)
+        traceback.print_exc()
+        self.failed[job['channel']].add(job['telegram_id'])
+
+    def screen(self, job):
+        message = job['message']
+        if not message.text:
+            return None
+
+        sender_name = peers.sender_name(message)
+        if sender_name is None:
+            return None
+        candidate = screen_message(job['channel'], job['info'], message, sender_name,
+                                   self.sent_hashes, job['min_age'], job['check_db'])
+        if candidate is None:
+            return None
+        job['candidate'] = candidate
+        return job
+
+    async def fetch_preview(self, message):
+        """Fetch a small preview of a message's photo or video; returns ((path, is_video), ref) or None.
+
+        Media already recorded in the fingerprint index is linked to the
+        existing full file instead. Otherwise the smallest thumbnail that is
+        big enough for the filters is downloaded; the full file is fetched by
+        download_full once the post has passed them and GPT accepted it.
+        Photos without a usable thumbnail are downloaded in full right away,
+        videos without one get no preview (path None).
+        """
+        media = message.video or message.photo
+        if not media:
+            return None
+        is_video = bool(message.video)
+        ref = {'key': media_key(media), 'access_hash': getattr(media, 'access_hash', None),
+               'duplicate_of': None, 'media': media, 'preview': True, 'telegram_id': message.id}
+
+        known = media_index.lookup(media)
+        if known is not None:
+            ref['duplicate_of'] = known['message_id']
+            ref['preview'] = False
+            return (known['path'], is_video), ref
+
+        thumb = preview_thumb(media)
+        if thumb is None and is_video:
+            return (None, True), ref
+        if thumb is None:
+            ref['preview'] = False
+        try:
+            path = await governor.call('download', lambda: self.client.download_media(
+                media, file=MEDIA_PREVIEW_DIR if thumb else "media/", thumb=thumb))
+        except Exception as e:
+            print("[WARN] Medya indirilemedi:", e)
+            return None
+        if path and not ref['preview']:
+            path = await asyncio.to_thread(media_store.put, path)
+        return ((path, is_video), ref) if path else None
+
+    async def fetch_media(self, job):
+        # Telethon messages are not picklable, so they stop here
+        message = job.pop('message')
+        album = job.pop('album')
+
+        if album:
+            # Album members are fetched concurrently and published together
+            members = album
+        elif message.video or message.photo:
+            members = [message]
+        else:
+            return job
+
+        results = [result for result in await asyncio.gather(*(self.fetch_preview(member) for member in members))
+                   if result]
+        job['media_items'] = [item for item, _ in results]
+        job['media_refs'] = [ref for _, ref in results]
+        set_media_type(job)
+        return job
+
+    def fingerprint(self, job):
+        """Record new media and flag posts whose media all appeared in an earlier post.
+
+        Such a post keeps going with candidate['duplicate_of'] set, so the
+        review queue can show the repost. It is only dropped when the earlier
+        post also had the same text.
+        """
+        message_id = job['candidate']['message_id']
+        for (path, is_video), ref in zip(job['media_items'], job['media_refs']):
+            if ref['duplicate_of'] is not None:
+                continue
+            dhash = None
+            if not is_video:
+                try:
+                    # Computed on the preview; every indexed hash comes from the same thumbnail size class
+                    dhash = image_dhash(path)
+                    ref['duplicate_of'] = media_index.find_similar(dhash, exclude=message_id)
+                except Exception as e:
+                    print("[WARN] Görsel parmak izi alınamadı:", e)
+            # The full file is recorded by download_full
+            media_index.add(ref['key'], ref['access_hash'], 'video' if is_video else 'photo',
+                            None if ref['preview'] else path, dhash, message_id)
+
+        duplicates = [ref['duplicate_of'] for ref in job['media_refs'] if ref['duplicate_of'] not in (None, message_id)]
+        if job['media_refs'] and len(duplicates) == len(job['media_refs']):
+            earlier = db.get_post_by_message_id(duplicates[0])
+            if earlier and earlier['original_text'] == job['candidate']['cleaned']:
+                print(f"[DUPLICATE] Medya ve metin daha önce {duplicates[0]} içinde paylaşıldı, atlanıyor.")
+                discard_previews(job)
+                return None
+            print(f"[DUPLICATE] Medya daha önce {duplicates[0]} içinde paylaşıldı, tekrar olarak işaretlendi.")
+            job['candidate']['duplicate_of'] = duplicates[0]
+        return job
+
+    async def download_full(self, job):
+        """Replace previews with the full media, skipping files over MEDIA_SIZE_CAPS.
+
+        Runs after translation: rejected posts only drop their previews and
+        keep a lazy reference to the media (see publish).
+        """
+        if is_rejected(job['translated']):
+            discard_previews(job)
+            return job
+
+        items = []
+        refs = []
+        for (path, is_video), ref in zip(job['media_items'], job['media_refs']):
+            if not ref['preview']:
+                items.append((path, is_video))
+                refs.append(ref)
+                continue
+
+            kind = 'video' if is_video else 'photo'
+            size = media_size(ref['media'])
+            if size is not None and size > MEDIA_SIZE_CAPS[kind]:
+                print(f"[SKIP] Medya çok büyük ({size / 1048576:.1f} MB > "
+                      f"{MEDIA_SIZE_CAPS[kind] / 1048576:.0f} MB), yalnızca metin gönderilecek.")
+                remove_file(path)
+                continue
+            try:
+                full_path = await governor.call('download', lambda: self.client.download_media(ref['media'], file="media/"))
+            except Exception as e:
+                print("[WARN] Medya indirilemedi:", e)
+                full_path = None
+            if full_path:
+                # A video's Telegram thumbnail becomes its poster in the store
+                full_path = await asyncio.to_thread(media_store.put, full_path, path if is_video else None)
+            remove_file(path)
+            if full_path:
+                media_index.set_path(ref['key'], full_path)
+                ref['preview'] = False
+                items.append((full_path, is_video))
+                refs.append(ref)
+
+        job['media_items'], job['media_refs'] = items, refs
+        set_media_type(job)
+        return job
+
+    def translate(self, jobs):
+        results = translate_candidates([job['candidate'] for job in jobs])
+        for job, (translated, _) in zip(jobs, results):
+            job['translated'] = translated
+        return jobs
+
+    async def publish(self, job):
+        # Stored instead of the files when the post is rejected
+        media_ref = media_reference(job['channel'], [ref['telegram_id'] for ref in job['media_refs']]) \
+            if job['media_refs'] else None
+        posted = await asyncio.to_thread(
+            store_candidate, job['channel'], job['info'], job['candidate'], job['translated'],
+            job['media_type'], job['media_path'], job['is_video'], job['media_items'], media_ref
+        )
+        # Long-lived event pipelines reuse this set, so keep it current
+        self.sent_hashes.add(job['candidate']['content_hash'])
+        if posted:
+            self.posted += 1
+            self.posted_by_channel[job['channel']] += 1
+        return job
+
+async def fetch_page(client, entity, **kwargs):
+    """One history request (at most BACKFILL_PAGE_SIZE messages) under the governor"""
+    kwargs.setdefault('limit', BACKFILL_PAGE_SIZE)
+    return await governor.call('history', lambda: collect(client.iter_messages(entity, **kwargs)))
+
+async def fetch_new_messages(client, channel, cursor):
+    """Fetch every message above the channel cursor, oldest first.
+
+    Pages through the delta one governed request at a time, so a FloodWait
+    only repeats the page it interrupted.
+    """
+    entity = await peers.get_input_channel(client, channel)
+    if cursor:
+        messages = []
+        offset_id = cursor
+        while True:
+            # With reverse=True Telethon returns messages newer than the offset, oldest first
+            page = await fetch_page(client, entity, offset_id=offset_id, reverse=True)
+            messages.extend(page)
+            if len(page) < BACKFILL_PAGE_SIZE:
+                return messages
+            offset_id = page[-1].id
+
+    # No cursor yet: start from the newest MESSAGE_LIMIT messages instead of the whole history
+    latest = await fetch_page(client, entity, limit=MESSAGE_LIMIT)
+    return list(reversed(latest))
+
+def process_channel(client, channel, info, sent_hashes):
+    """One pass over a channel's latest MESSAGE_LIMIT messages for INGESTION_MODE=sync.
+
+    Stops at the first stored post. Telegram requests run under the governor
+    and the peer cache on the client's event loop, like in the async modes.
+    """
+    run = client.loop.run_until_complete
+    print(f"[INFO] Kanal: {channel}")
+
+    # Add more detailed logging for debugging
+    print(f"[DEBUG] Processing channel {channel} with {MESSAGE_LIMIT} message limit")
+    print(f"[DEBUG] Current sent_hashes count: {len(sent_hashes)}")
+
+    entity = run(peers.get_input_channel(client, channel))
+    for message in run(fetch_page(client, entity, limit=MESSAGE_LIMIT)):
+        if not message.text:
+            continue
+
+        sender_name = peers.sender_name(message)
+        if sender_name is None:
+            continue
+        candidate = screen_message(channel, info, message, sender_name, sent_hashes)
+        if candidate is None:
+            continue
+
+        # Photos pass the color filter on a preview before GPT is paid for them
+        preview = None
+        thumb = preview_thumb(message.photo) if message.photo else None
+        if message.photo:
+            try:
+                preview = run(governor.call('download', lambda: client.download_media(
+                    message.photo, file=MEDIA_PREVIEW_DIR if thumb else "media/", thumb=thumb)))
+            except Exception as e:
+                print("[WARN] Fotoğraf indirilemedi:", e)
+            if preview and is_image_red_or_black_heavy(preview, MEDIA_THRESHOLD):
+                print("[SKIP] Görselde kırmızı/siyah baskın. Atlanıyor.")
+                remove_file(preview)
+                continue
+
+        # Translate and check if geopolitical; full media is only downloaded for accepted messages
+        translated, _ = translate_candidate(candidate)
+
+        # Determine media type and path
+        media_type = None
+        media_path = None
+        media_ref = None
+        is_video = False
+
+        if message.video or message.photo:
+            media_type = "video" if message.video else "photo"
+            media_ref = media_reference(channel, [message.id])
+            if is_rejected(translated):
+                remove_file(preview)
+            elif message.video:
+                try:
+                    media_path = media_store.put(run(governor.call(
+                        'download', lambda: client.download_media(message.video, file="media/"))))
+                    is_video = True
+                except Exception as e:
+                    print("[WARN] Video indirilemedi:", e)
+            elif preview:
+                try:
+                    # Without a usable thumbnail the preview already is the full photo
+                    full_path = run(governor.call(
+                        'download', lambda: client.download_media(message.photo, file="media/"))) if thumb else preview
+                    media_path = media_store.put(full_path)
+                except Exception as e:
+                    print("[WARN] Fotoğraf indirilemedi:", e)
+                if thumb:
+                    remove_file(preview)
+
+        if store_candidate(channel, info, candidate, translated, media_type, media_path, is_video,
+                           media_ref=media_ref):
+            # Add delay to prevent rapid duplicate processing
+            print("[WAIT] Waiting 10 seconds before processing next message...")
+            time.sleep(10)
+            return True  # Indicate a new message was processed
+
+    return False
+
+async def run_cycle(client, sent_hashes, pipeline=None, channels=None, scheduler=None,
+                    max_concurrency=MAX_CONCURRENT_CHANNELS):
+    """Fetch each channel's delta concurrently and drain it through the pipeline.
+
+    Polls all CHANNELS unless a subset is given, and reports per-channel
+    results to the scheduler when one is passed. Returns the number of posts
+    published in this cycle.
+    """
+    if channels is None:
+        channels = CHANNELS
+    own_pipeline = pipeline is None
+    if own_pipeline:
+        pipeline = IngestPipeline(client, sent_hashes)
+        await pipeline.start()
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    fed = {}
+    fetched = defaultdict(int)
+    posted_before = pipeline.posted
+    channel_posted_before = dict(pipeline.posted_by_channel)
+
+    async def feed_channel(channel, info):
+        async with semaphore:
+            try:
+                cursor = await asyncio.to_thread(db.get_channel_cursor, channel)
+                print(f"[INFO] Kanal: {channel} (cursor: {cursor})")
+                messages = await asyncio.wait_for(fetch_new_messages(client, channel, cursor), timeout=CHANNEL_TIMEOUT)
+            except asyncio.TimeoutError:
+                print(f"[WARN] Kanal zaman aşımı ({channel}), {CHANNEL_TIMEOUT}s sonra bırakıldı.")
+                return
+            except Exception as e:
+                print(f"❌ Kanal hatası ({channel}):", e)
+                traceback.print_exc()
+                return
+
+        fetched[channel] = len(messages)
+        if not messages:
+            return
+        print(f"[DEBUG] {len(messages)} new messages in {channel}")
+
+        existing = await asyncio.to_thread(
+            db.get_existing_message_ids, [f"{channel}_{message.id}" for message in messages]
+        )
+        for message, album in group_albums(messages):
+            if f"{channel}_{message.id}" not in existing:
+                # The cursor already rules out re-reads, so the legacy recency skip is not needed here
+                await pipeline.put(IngestPipeline.make_job(channel, info, message, album, min_age=0, check_db=False))
+        fed[channel] = (cursor, messages[-1].id)
+
+    try:
+        await asyncio.gather(*(feed_channel(channel, info) for channel, info in channels.items()))
+        await pipeline.join()
+
+        # Only advance past messages that were fully handled
+        for channel, (cursor, last_id) in fed.items():
+            failed = pipeline.failed.pop(channel, None)
+            new_cursor = min(failed) - 1 if failed else last_id
+            if new_cursor > cursor:
+                await asyncio.to_thread(db.update_channel_cursor, channel, new_cursor)
+
+        if scheduler is not None:
+            for channel in channels:
+                posted = pipeline.posted_by_channel[channel] - channel_posted_before.get(channel, 0)
+                await asyncio.to_thread(scheduler.record, channel, fetched[channel], posted)
+    finally:
+        if own_pipeline:
+            await pipeline.close()
+
+    return pipeline.posted - posted_before
+
+async def run_forever(client):
+    """Main async polling loop; each channel is polled on its own adaptive interval"""
+    print("🚀 Bot çalışmaya başladı (async). Kanallar eşzamanlı taranıyor...\n")
+    print("[STARTUP] Waiting 5 seconds before first scan...")
+    await asyncio.sleep(5)
+    governor.install(client)
+    await peers.warm(client, CHANNELS)
+    scheduler = await asyncio.to_thread(ChannelScheduler, db)
+
+    while True:
+        try:
+            due = scheduler.due_channels()
+            if due:
+                print(f"[INFO] Kanallar kontrol ediliyor: {', '.join(due)}")
+                sent_hashes = await asyncio.to_thread(get_sent_hashes)
+                print(f"[DEBUG] Loaded {len(sent_hashes)} sent hashes")
+
+                started = time.monotonic()
+                new_messages = await run_cycle(client, sent_hashes, channels=due, scheduler=scheduler)
+                print(f"[INFO] {len(due)} kanal {time.monotonic() - started:.1f}s içinde tarandı, {new_messages} gönderi.")
+                cache = translation_cache.stats()
+                print(f"[CACHE] Çeviri önbelleği: {cache['memory_hits']} bellek + {cache['db_hits']} SQLite isabet, "
+                      f"{cache['misses']} ıskalama (%{cache['hit_rate'] * 100:.0f}).")
+
+                if new_messages == 0:
+                    print("[INFO] Yeni mesaj bulunamadı.")
+        except Exception as e:
+            print("❌ Genel hata:", e)
+            traceback.print_exc()
+            print("[ERROR] Waiting 60 seconds before retry...")
+            await asyncio.sleep(60)
+
+        wait = scheduler.seconds_until_next()
+        print(f"[WAIT] Sonraki tarama {wait:.0f}s sonra...\n")
+        await asyncio.sleep(max(wait, 1))
+
+async def catch_up_sweep(client, pipeline):
+    """Poll every channel once so messages missed while disconnected are processed"""
+    print("[CATCH-UP] Kanallar kaçırılan mesajlar için taranıyor...")
+    new_messages = await run_cycle(client, pipeline.sent_hashes, pipeline)
+    print(f"[CATCH-UP] Tamamlandı, {new_messages} yeni gönderi.")
+
+async def run_events(client):
+    """Push-based ingestion: handle NewMessage updates as they arrive"""
+    sent_hashes = await asyncio.to_thread(get_sent_hashes)
+    governor.install(client)
+    await peers.warm(client, CHANNELS)
+    # Updates carry marked chat ids; map them back without fetching the chat
+    channels_by_chat_id = {}
+    for channel in CHANNELS:
+        try:
+            input_peer = await peers.get_input_channel(client, channel)
+            channels_by_chat_id[telethon_utils.get_peer_id(input_peer)] = channel
+        except Exception as e:
+            print(f"[WARN] Kanal dinlenemiyor ({channel}):", e)
+    chats = list(channels_by_chat_id)
+
+    pipeline = IngestPipeline(client, sent_hashes)
+    await pipeline.start()
+
+    # The cursor is left to the catch-up sweep so a gap before an event is still swept
+    @client.on(events.NewMessage(chats=chats))
+    async def on_new_message(event):
+        if event.message.grouped_id:
+            return  # Delivered as a whole by on_album
+        channel = channels_by_chat_id.get(event.chat_id)
+        if channel is None:
+            return
+
+        print(f"[EVENT] Yeni mesaj: {channel}/{event.message.id}")
+        await pipeline.put(IngestPipeline.make_job(channel, CHANNELS[channel], event.message))
+
+    @client.on(events.Album(chats=chats))
+    async def on_album(event):
+        channel = channels_by_chat_id.get(event.chat_id)
+        if channel is None:
+            return
+
+        (message, album), = group_albums(event.messages)
+        print(f"[EVENT] Yeni albüm: {channel}/{message.id} ({len(album)} medya)")
+        await pipeline.put(IngestPipeline.make_job(channel, CHANNELS[channel], message, album))
+
+    async def periodic_sweep():
+        # Safety net for gaps Telethon recovers from silently
+        while True:
+            await asyncio.sleep(EVENT_SWEEP_INTERVAL)
+            try:
+                await catch_up_sweep(client, pipeline)
+            except Exception as e:
+                print("❌ Catch-up hatası:", e)
+                traceback.print_exc()
+
+    print("🚀 Bot çalışmaya başladı (events). Yeni mesajlar anlık dinleniyor...\n")
+    await catch_up_sweep(client, pipeline)
+    sweeper = asyncio.create_task(periodic_sweep())
+
+    try:
+        while True:
+            try:
+                await client.run_until_disconnected()
+            except Exception as e:
+                print("❌ Bağlantı hatası:", e)
+                traceback.print_exc()
+
+            print("[RECONNECT] Bağlantı koptu, yeniden bağlanılıyor...")
+            await asyncio.sleep(5)
+            try:
+                await client.connect()
+                await catch_up_sweep(client, pipeline)
+            except Exception as e:
+                print("❌ Yeniden bağlanma hatası:", e)
+    finally:
+        sweeper.cancel()
+        await pipeline.close()
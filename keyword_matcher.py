@@ -0,0 +1,106 @@
+"""
+Compiled multi-pattern keyword matcher.
+
+All term lists are compiled into one regular expression, so a single pass
+over the lowercased text returns the hits for every category. Each category
+picks how terms are anchored:
+
+    'word'      whole words only ("un" does not match inside "until")
+    'prefix'    must start a word but may carry a suffix ("reklam" matches "reklamı")
+    'substring' anywhere in the text (emoji lists)
+
+Boundaries are only applied on sides where the term starts/ends with a word
+character, so emoji and punctuation terms always match as substrings.
+"""
+
+import re
+
+MODES = ('word', 'prefix', 'substring')
+WORD = re.compile(r'\w')
+
+class KeywordMatcher:
+    def __init__(self, categories):
+        """categories: {name: (terms, mode)}"""
+        self.categories = list(categories)
+        # (boundary before, boundary after) -> {term: categories it counts for}
+        self.buckets = {}
+
+        for name, (terms, mode) in categories.items():
+            if mode not in MODES:
+                raise ValueError(f"Unknown match mode for {name}: {mode}")
+            for term in terms:
+                term = term.lower()
+                bounds = self._boundaries(term, mode)
+                self.buckets.setdefault(bounds, {}).setdefault(term, set()).add(name)
+
+        # Per bucket: (pattern, terms, boundary after, whether some term is a prefix of another)
+        self.bucket_patterns = []
+        alternatives = []
+        for (before, after), terms in self.buckets.items():
+            alternative = (r'(?<!\w)' if before else '') + self._trie_pattern(terms) + (r'(?!\w)' if after else '')
+            alternatives.append(alternative)
+            nested = any(other != term and other.startswith(term) for term in terms for other in terms)
+            self.bucket_patterns.append((re.compile(alternative), terms, after, nested))
+        # Wrapped in a lookahead so overlapping terms ("puppet government" and
+        # "government") are each found, matching the old per-term scans. It
+        # only finds where terms start; match() then reads every term there.
+        self.regex = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+
+    @staticmethod
+    def _boundaries(term, mode):
+        """Which sides of the term must sit on a word boundary"""
+        before = mode != 'substring' and bool(re.match(r'\w', term))
+        after = mode == 'word' and bool(re.search(r'\w$', term))
+        return before, after
+
+    @staticmethod
+    def _trie_pattern(terms):
+        """Regex for a set of literals with shared prefixes factored out.
+
+        At each position only the branch for the next character is tried, and
+        longer terms are preferred over their own prefixes.
+        """
+        trie = {}
+        for term in terms:
+            node = trie
+            for char in term:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def render(node):
+            branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            if len(branches) == 1 and '' not in node:
+                return branches[0]
+            pattern = f"(?:{'|'.join(branches)})"
+            return pattern + '?' if '' in node else pattern
+
+        return render(trie)
+
+    def match(self, text):
+        """Distinct terms found per category: {category: set(terms)}"""
+        hits = {name: set() for name in self.categories}
+        if self.regex is None or not text:
+            return hits
+
+        text = text.lower()
+        for start in {found.start() for found in self.regex.finditer(text)}:
+            # Every bucket, since the combined pattern stops at the first one matching here
+            for pattern, terms, after, nested in self.bucket_patterns:
+                found = pattern.match(text, start)
+                if found is None:
+                    continue
+                longest = found.group()
+                # The trie prefers the longest term; shorter terms it contains start here as well
+                ends = range(1, len(longest) + 1) if nested else (len(longest),)
+                for end in ends:
+                    term = longest[:end]
+                    if term in terms and not (after and WORD.match(text, start + end)):
+                        for name in terms[term]:
+                            hits[name].add(term)
+        return hits
+
+    def counts(self, text):
+        """Number of distinct terms found per category"""
+        return {name: len(terms) for name, terms in self.match(text).items()}
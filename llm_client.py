@@ -0,0 +1,200 @@
+"""
+OpenAI client with bounded concurrency, backoff and a circuit breaker.
+
+Requests run on openai.AsyncOpenAI inside a background event loop owned by
+LLMClient, so the synchronous bot code, the pipeline's thread stages and
+async callers all share one concurrency limit (LLM_CONCURRENCY requests in
+flight). Rate limits, timeouts, connection errors and 5xx answers are
+retried with exponential backoff. A 429 blocks every request until its
+Retry-After has passed, like a FloodWait in rate_governor. Once
+LLM_BREAKER_THRESHOLD requests in a row have failed, the circuit opens:
+requests fail at once with LLMUnavailable until LLM_BREAKER_COOLDOWN has
+passed, after which a single trial request decides whether it closes again.
+
+LLMUnavailable means "try again later", never "the message was rejected".
+Callers park such messages in the llm_retry queue.
+
+The backend is picked by LLM_BACKEND from BACKENDS: 'openai' for the real
+API, 'standin' for the local simulator in llm_standin.py. A backend is any
+object with an async chat.completions.create() that raises openai's errors.
+"""
+
+import asyncio
+import random
+import threading
+import time
+import openai
+from config import (OPENAI_API_KEY, LLM_BACKEND, LLM_STANDIN_URL, LLM_CONCURRENCY, LLM_TIMEOUT, LLM_MAX_RETRIES,
+                    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN)
+
+# Worth retrying: the same request may well succeed a little later
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                    openai.InternalServerError, openai.ConflictError)
+# Not retried, but no message can get through either: a configuration problem
+OUTAGE_ERRORS = (openai.AuthenticationError, openai.PermissionDeniedError)
+
+def openai_backend():
+    return openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT, max_retries=0)
+
+def standin_backend():
+    """The OpenAI client pointed at a running `python llm_standin.py`"""
+    return openai.AsyncOpenAI(api_key='standin', base_url=LLM_STANDIN_URL, timeout=LLM_TIMEOUT, max_retries=0)
+
+# Backend name -> zero-argument factory, called on the client's event loop
+BACKENDS = {
+    'openai': openai_backend,
+    'standin': standin_backend,
+}
+
+class LLMUnavailable(Exception):
+    """The request could not be made now; the message should be retried later"""
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one trial through after `cooldown`"""
+
+    def __init__(self, threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False  # A half-open trial request is in flight
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if time.monotonic() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        """(allowed, trial): whether a new request may go out and whether it took the half-open trial slot"""
+        with self.lock:
+            state = self.state
+            if state == 'closed':
+                return True, False
+            if state == 'half_open' and not self.trial:
+                self.trial = True
+                return True, True
+            return False, False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print("✅ [LLM] Devre kapandı, istekler yeniden gönderiliyor.")
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def record_failure(self, trial=False):
+        """Count a failed request; `trial` is True when it was the half-open trial"""
+        with self.lock:
+            self.failures += 1
+            if trial or (self.opened_at is None and self.failures >= self.threshold):
+                print(f"⚠️ [LLM] Devre açıldı ({self.failures} ardışık hata), {self.cooldown}s bekleniyor.")
+                self.opened_at = time.monotonic()
+            if trial:
+                self.trial = False
+
+def retry_after(error):
+    """Seconds the server asked us to wait, from the Retry-After header of a 429"""
+    response = getattr(error, 'response', None)
+    value = response.headers.get('retry-after') if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+class LLMClient:
+    def __init__(self, backend=LLM_BACKEND, concurrency=LLM_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                 breaker=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown LLM backend: {backend} (expected one of {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker()
+        self.blocked_until = 0
+        self.loop = None
+        self.client = None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.start_lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'rate_limited': 0, 'failed': 0, 'rejected_open': 0}
+
+    def _start(self):
+        """Background event loop (created on first use) that runs every request"""
+        with self.start_lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='llm-client', daemon=True).start()
+                self.loop = loop
+        return self.loop
+
+    def available(self):
+        """False while the circuit is open and requests would fail at once"""
+        return self.breaker.state != 'open'
+
+    def submit(self, **request):
+        """Start a chat completion; returns a concurrent.futures.Future of the response"""
+        return asyncio.run_coroutine_threadsafe(self._complete(request), self._start())
+
+    def complete(self, **request):
+        """Chat completion, blocking the calling thread until it is done"""
+        return self.submit(**request).result()
+
+    async def acomplete(self, **request):
+        """Chat completion from coroutines running on another event loop"""
+        return await asyncio.wrap_future(self.submit(**request))
+
+    async def _complete(self, request):
+        if self.client is None:
+            # Created on the background loop, which its connection pool belongs to
+            self.client = BACKENDS[self.backend]()
+
+        trial = False
+        for attempt in range(self.max_retries + 1):
+            # Retries of a request already let through only stop when the circuit is fully open
+            if attempt == 0:
+                allowed, trial = self.breaker.allow()
+            else:
+                allowed = self.breaker.state != 'open'
+            if not allowed:
+                self.stats['rejected_open'] += 1
+                raise LLMUnavailable("circuit open")
+            delay = self.blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            async with self.semaphore:
+                self.stats['requests'] += 1
+                try:
+                    response = await self.client.chat.completions.create(**request)
+                except RETRYABLE_ERRORS as e:
+                    error = e
+                except OUTAGE_ERRORS as e:
+                    self.stats['failed'] += 1
+                    self.breaker.record_failure(trial)
+                    raise LLMUnavailable(f"{type(e).__name__}: {e}") from e
+                except openai.APIStatusError:
+                    # The request itself is bad (400, 404, 422): retrying will not help
+                    self.breaker.record_success()
+                    raise
+                else:
+                    self.breaker.record_success()
+                    return response
+
+            # Exponential backoff with jitter, or exactly what a 429 asked for
+            wait = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1)
+            if isinstance(error, openai.RateLimitError):
+                self.stats['rate_limited'] += 1
+                wait = retry_after(error) or wait
+                self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+            if trial:
+                break  # This request was the half-open trial: reopen without waiting out the retries
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                print(f"[LLM] {type(error).__name__}, {wait:.1f}s sonra tekrar (deneme {attempt + 1}/{self.max_retries + 1})")
+                await asyncio.sleep(wait)
+
+        self.stats['failed'] += 1
+        self.breaker.record_failure(trial)
+        raise LLMUnavailable(f"{type(error).__name__}: {error}") from error
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Retry messages that were parked while GPT was unavailable.
+
+When the LLM client gives up on a request (retries exhausted or circuit
+open), the screened candidate is stored in llm_retry_jobs instead of being
+saved as rejected, and its hash is not recorded. The bot worker retries due
+messages every LLM_RETRY_POLL_INTERVAL seconds while the circuit is closed,
+with exponential delays per message. Accepted messages get their media
+downloaded again through the stored media reference. Messages still failing
+after LLM_RETRY_MAX_ATTEMPTS are left as 'failed' until --requeue. Messages
+deferred by the token budgets (see llm_usage) wait for the daily reset and
+do not use up attempts.
+
+Usage:
+    python llm_retry.py --status
+    python llm_retry.py --requeue
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import traceback
+from config import *
+from bot import db, is_rejected, llm, store_candidate, translate_candidates
+from llm_usage import next_reset
+from media_fetch import resolve_post_media
+
+def next_delay(attempts):
+    """Seconds before the next attempt of a message that failed `attempts` times"""
+    return min(LLM_RETRY_DELAY_MAX, LLM_RETRY_DELAY * 2 ** max(attempts - 1, 0))
+
+async def fetch_media(client, job):
+    """Downloaded files [(path, is_video), ...] of an accepted message, or [] when unavailable"""
+    if not job['media_ref']:
+        return []
+    try:
+        paths = await resolve_post_media(client, job)
+    except Exception as e:
+        print(f"[RETRY] {job['message_id']} medyası indirilemedi:", e)
+        return []
+    return [(path, not path.lower().endswith(IMAGE_EXTENSIONS)) for path in paths]
+
+async def run_due_retries(client):
+    """Retry the messages whose next attempt is due; returns how many were tried"""
+    if not llm.available():
+        return 0
+    jobs = await asyncio.to_thread(db.get_due_llm_retries, time.time(), LLM_RETRY_BATCH)
+    if not jobs:
+        return 0
+
+    candidates = [json.loads(job['candidate']) for job in jobs]
+    for job, candidate in zip(jobs, candidates):
+        candidate.setdefault('channel', job['channel_name'])
+    results = await asyncio.to_thread(translate_candidates, candidates)
+    recovered = 0
+    for job, candidate, (translated, _) in zip(jobs, candidates, results):
+        if translated is None and candidate.get('throttled'):
+            # Over budget is not a failed attempt
+            await asyncio.to_thread(db.update_llm_retry, job['id'], 'queued', None, next_reset(), 'Token budget')
+            continue
+        if translated is None:
+            attempts = job['attempts'] + 1
+            if attempts >= LLM_RETRY_MAX_ATTEMPTS:
+                await asyncio.to_thread(db.update_llm_retry, job['id'], 'failed', attempts,
+                                        error='GPT unavailable')
+                print(f"❌ [RETRY] {job['message_id']} {attempts} denemede çevrilemedi.")
+            else:
+                await asyncio.to_thread(db.update_llm_retry, job['id'], 'queued', attempts,
+                                        time.time() + next_delay(attempts), 'GPT unavailable')
+            continue
+
+        media_items = [] if is_rejected(translated) else await fetch_media(client, job)
+        media_path, is_video = media_items[0] if media_items else (None, False)
+        channel = job['channel_name']
+        await asyncio.to_thread(
+            store_candidate, channel, CHANNELS.get(channel, {}), candidate, translated,
+            job['media_type'], media_path, is_video, media_items if len(media_items) > 1 else None,
+            job['media_ref']
+        )
+        await asyncio.to_thread(db.update_llm_retry, job['id'], 'done')
+        recovered += 1
+
+    if recovered:
+        print(f"✅ [RETRY] {recovered}/{len(jobs)} bekleyen mesaj işlendi.")
+    return len(jobs)
+
+async def llm_retry_worker(client):
+    """Background task that drains the retry queue once GPT is reachable again"""
+    while True:
+        try:
+            await run_due_retries(client)
+        except Exception as e:
+            print("❌ [RETRY] Worker hatası:", e)
+            traceback.print_exc()
+        await asyncio.sleep(LLM_RETRY_POLL_INTERVAL)
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or requeue messages parked while GPT was unavailable")
+    parser.add_argument('--status', action='store_true', help="Show queue counts and recent entries")
+    parser.add_argument('--requeue', action='store_true', help="Retry messages that ran out of attempts")
+    args = parser.parse_args()
+
+    if args.requeue:
+        print(f"[RETRY] {db.requeue_failed_llm_retries(time.time())} mesaj yeniden kuyruğa alındı.")
+    elif args.status:
+        print(f"[RETRY] {db.get_llm_retry_counts()}")
+        for job in db.get_llm_retries():
+            print(f"#{job['id']} {job['message_id']:<28} {job['status']:<7} "
+                  f"deneme={job['attempts']:<3} {job['error'] or ''}")
+    else:
+        parser.print_help()
+
+if __name__ == "__main__":
+    main()
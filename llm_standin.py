@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in for load tests and benchmarks.
+
+Serves POST /v1/chat/completions like the OpenAI API, for both single
+translation requests and the JSON-schema batch requests of bot.py. Nothing
+is translated: a message is answered with SKIP or with a "translation"
+made from its own text. Latency follows a log-normal distribution around
+LLM_STANDIN_LATENCY, plus a cost per completion token. A share of the
+requests fails with a 500 or a 429 (with Retry-After), and answers that
+exceed max_tokens are cut off with finish_reason 'length'.
+
+Every decision, latency and error is derived from a hash of the seed and
+the request content (and its attempt number for errors), so a rerun with
+the same seed and messages behaves the same however requests interleave.
+
+Run the bot against it with LLM_BACKEND=standin.
+
+Usage:
+    python llm_standin.py [--port 8765] [--latency 0.8] [--error-rate 0.02]
+                          [--rate-limit-rate 0.02] [--skip-rate 0.6] [--seed 1]
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+from collections import Counter
+from statistics import NormalDist
+from urllib.parse import urlparse
+from flask import Flask, jsonify, request
+from config import (LLM_STANDIN_URL, LLM_STANDIN_LATENCY, LLM_STANDIN_LATENCY_SIGMA, LLM_STANDIN_TOKEN_LATENCY,
+                    LLM_STANDIN_ERROR_RATE, LLM_STANDIN_RATE_LIMIT_RATE, LLM_STANDIN_SKIP_RATE, LLM_STANDIN_SEED)
+from llm_usage import estimate_tokens
+
+def unit(*parts):
+    """Deterministic number in [0, 1) from the given parts"""
+    digest = hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64
+
+class StandIn:
+    def __init__(self, latency=LLM_STANDIN_LATENCY, sigma=LLM_STANDIN_LATENCY_SIGMA,
+                 token_latency=LLM_STANDIN_TOKEN_LATENCY, error_rate=LLM_STANDIN_ERROR_RATE,
+                 rate_limit_rate=LLM_STANDIN_RATE_LIMIT_RATE, skip_rate=LLM_STANDIN_SKIP_RATE,
+                 seed=LLM_STANDIN_SEED):
+        self.latency = latency
+        self.sigma = sigma
+        self.token_latency = token_latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.skip_rate = skip_rate
+        self.seed = seed
+        self.attempts = Counter()  # Request content hash -> times seen
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    def decide(self, text):
+        """SKIP, or a tweet-sized rewrite of the text"""
+        if unit(self.seed, 'skip', text) < self.skip_rate:
+            return "SKIP"
+        return "🌍 " + ' '.join(text.split())[:270]
+
+    def delay(self, key, attempt, completion_tokens):
+        """Seconds to wait before answering: log-normal around the median latency"""
+        z = NormalDist().inv_cdf(min(max(unit(self.seed, 'latency', key, attempt), 1e-6), 1 - 1e-6))
+        return self.latency * math.exp(self.sigma * z) + self.token_latency * completion_tokens
+
+    def respond(self, body):
+        """(status, response body, headers, delay) for a chat completion request body"""
+        messages = body.get('messages') or []
+        text = messages[-1].get('content', '') if messages else ''
+        key = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()
+        with self.lock:
+            attempt = self.attempts[key]
+            self.attempts[key] += 1
+            self.stats['requests'] += 1
+
+        roll = unit(self.seed, 'error', key, attempt)
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            error = {'message': 'Rate limit reached (stand-in)', 'type': 'requests', 'code': 'rate_limit_exceeded'}
+            return 429, {'error': error}, {'Retry-After': '1'}, 0.05
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats['errors'] += 1
+            error = {'message': 'The server had an error (stand-in)', 'type': 'server_error', 'code': None}
+            return 500, {'error': error}, {}, self.delay(key, attempt, 0)
+
+        if body.get('response_format'):
+            try:
+                posts = json.loads(text)
+            except ValueError:
+                error = {'message': 'Expected a JSON object of posts', 'type': 'invalid_request_error', 'code': None}
+                return 400, {'error': error}, {}, 0
+            content = json.dumps({'results': [{'id': post_id, 'output': self.decide(post)}
+                                              for post_id, post in posts.items()]}, ensure_ascii=False)
+            self.stats['batches'] += 1
+            self.stats['messages'] += len(posts)
+        else:
+            content = self.decide(text)
+            self.stats['messages'] += 1
+
+        completion_tokens = estimate_tokens(content)
+        finish_reason = 'stop'
+        max_tokens = body.get('max_tokens')
+        if max_tokens and completion_tokens > max_tokens:
+            content = content[:max_tokens * 4]
+            completion_tokens = max_tokens
+            finish_reason = 'length'
+            self.stats['truncated'] += 1
+        prompt_tokens = sum(estimate_tokens(message.get('content', '')) for message in messages)
+
+        response = {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'standin'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': finish_reason,
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+        return 200, response, {}, self.delay(key, attempt, completion_tokens)
+
+def create_app(standin):
+    app = Flask(__name__)
+
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        status, body, headers, delay = standin.respond(request.get_json(force=True))
+        time.sleep(delay)
+        return jsonify(body), status, headers
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        return jsonify(dict(standin.stats))
+
+    return app
+
+def main():
+    address = urlparse(LLM_STANDIN_URL)
+    parser = argparse.ArgumentParser(description="Serve a simulated OpenAI chat completions API")
+    parser.add_argument('--host', default=address.hostname or '127.0.0.1')
+    parser.add_argument('--port', type=int, default=address.port or 8765)
+    parser.add_argument('--latency', type=float, default=LLM_STANDIN_LATENCY, help="Median seconds per request")
+    parser.add_argument('--sigma', type=float, default=LLM_STANDIN_LATENCY_SIGMA, help="Log-normal latency spread")
+    parser.add_argument('--error-rate', type=float, default=LLM_STANDIN_ERROR_RATE, help="Share of 500 answers")
+    parser.add_argument('--rate-limit-rate', type=float, default=LLM_STANDIN_RATE_LIMIT_RATE, help="Share of 429 answers")
+    parser.add_argument('--skip-rate', type=float, default=LLM_STANDIN_SKIP_RATE, help="Share of messages answered SKIP")
+    parser.add_argument('--seed', type=int, default=LLM_STANDIN_SEED)
+    args = parser.parse_args()
+
+    standin = StandIn(latency=args.latency, sigma=args.sigma, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate, skip_rate=args.skip_rate, seed=args.seed)
+    print(f"[STANDIN] http://{args.host}:{args.port}/v1 (gecikme {args.latency}s, hata %{args.error_rate * 100:.0f}, "
+          f"429 %{args.rate_limit_rate * 100:.0f}, SKIP %{args.skip_rate * 100:.0f}, seed {args.seed})")
+    create_app(standin).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == "__main__":
+    main()
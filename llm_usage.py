@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Token accounting and daily budgets for GPT requests.
+
+Every GPT answer's token usage is recorded per message in the llm_usage
+table. Rows are buffered and written LLM_USAGE_FLUSH_SIZE at a time, or
+after LLM_USAGE_FLUSH_INTERVAL seconds. Today's totals per channel are kept
+in memory, so budget checks cost no query.
+
+Before a message is sent to GPT, its prompt tokens are estimated locally.
+Messages longer than LLM_MAX_INPUT_TOKENS are truncated. A message is
+deferred when it would take the day's total over LLM_DAILY_TOKEN_BUDGET
+times its priority's share (LLM_PRIORITY_BUDGET_SHARE), or its channel over
+its own budget. Low-priority channels have smaller shares, so they are
+throttled first as the day's spending grows. Deferred messages wait in the
+LLM retry queue until the budgets reset at midnight UTC.
+
+Usage:
+    python llm_usage.py --status
+"""
+
+import argparse
+import atexit
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from config import (CHANNELS, TRANSLATION_MODEL, LLM_USAGE_FLUSH_SIZE, LLM_USAGE_FLUSH_INTERVAL,
+                    LLM_DAILY_TOKEN_BUDGET, LLM_CHANNEL_TOKEN_BUDGET, LLM_PRIORITY_BUDGET_SHARE)
+
+def estimate_tokens(text):
+    """Rough token count of a text without calling a tokenizer.
+
+    About four characters per token for Latin script; Cyrillic, Arabic and
+    accented text split into shorter pieces, about two characters per token.
+    """
+    text = text or ""
+    other = sum(1 for char in text if ord(char) > 127)
+    return (len(text) - other) // 4 + other // 2 + 1
+
+def truncate_to_tokens(text, limit):
+    """Text cut at a word boundary so that its estimated tokens stay within limit"""
+    if estimate_tokens(text) <= limit:
+        return text
+    budget = (limit - 1) * 4  # In quarter tokens: 1 per ASCII character, 2 per other
+    end = 0
+    for end, char in enumerate(text):
+        budget -= 1 if ord(char) <= 127 else 2
+        if budget < 0:
+            break
+    cut = text[:end]
+    space = cut.rfind(' ')
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + '…'
+
+def utc_day(timestamp=None):
+    return datetime.fromtimestamp(timestamp or time.time(), timezone.utc).strftime('%Y-%m-%d')
+
+def next_reset():
+    """Epoch seconds of the next budget reset (midnight UTC)"""
+    tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day, tzinfo=timezone.utc).timestamp()
+
+class UsageLedger:
+    def __init__(self, db, flush_size=LLM_USAGE_FLUSH_SIZE, flush_interval=LLM_USAGE_FLUSH_INTERVAL):
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.flushed_at = time.monotonic()
+        self.day = None
+        self.spent = Counter()  # Today's tokens per channel, including unflushed rows
+        self.lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def _roll_day(self):
+        """Reset the in-memory totals when the UTC day changes (caller holds the lock)"""
+        day = utc_day()
+        if day != self.day:
+            self.day = day
+            self.spent = Counter(self.db.get_llm_usage_by_channel(day))
+            self.spent.update(Counter({row['channel_name']: row['total_tokens']
+                                       for row in self.buffer if row['day'] == day}))
+
+    def record(self, channel, message_id, usage, stage='translate', model=TRANSLATION_MODEL, accepted=None):
+        """Buffer the token usage of one message's GPT request"""
+        if usage is None:
+            return
+        prompt = getattr(usage, 'prompt_tokens', 0) or 0
+        completion = getattr(usage, 'completion_tokens', 0) or 0
+        now = time.time()
+        row = {
+            'created_at': now,
+            'day': utc_day(now),
+            'channel_name': channel,
+            'message_id': message_id,
+            'stage': stage,
+            'model': model,
+            'prompt_tokens': prompt,
+            'completion_tokens': completion,
+            'total_tokens': prompt + completion,
+            'accepted': None if accepted is None else int(accepted),
+        }
+        with self.lock:
+            self._roll_day()
+            self.spent[channel] += row['total_tokens']
+            self.buffer.append(row)
+            due = len(self.buffer) >= self.flush_size or time.monotonic() - self.flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            rows, self.buffer = self.buffer, []
+            self.flushed_at = time.monotonic()
+        if rows:
+            try:
+                self.db.add_llm_usage(rows)
+            except Exception as e:
+                print(f"❌ [USAGE] {len(rows)} kullanım kaydı yazılamadı:", e)
+                with self.lock:
+                    self.buffer[:0] = rows
+
+    def spent_today(self, channel=None):
+        with self.lock:
+            self._roll_day()
+            return self.spent[channel] if channel else sum(self.spent.values())
+
+    def allows(self, channel, tokens):
+        """True when a request of about `tokens` fits the daily and channel budgets"""
+        info = CHANNELS.get(channel, {})
+        priority = info.get('priority', 1)
+        share = LLM_PRIORITY_BUDGET_SHARE.get(priority, min(LLM_PRIORITY_BUDGET_SHARE.values()))
+        channel_budget = info.get('token_budget', LLM_CHANNEL_TOKEN_BUDGET)
+        with self.lock:
+            self._roll_day()
+            if LLM_DAILY_TOKEN_BUDGET and sum(self.spent.values()) + tokens > LLM_DAILY_TOKEN_BUDGET * share:
+                return False
+            if channel_budget and self.spent[channel] + tokens > channel_budget:
+                return False
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Show today's GPT token usage against the budgets")
+    parser.add_argument('--status', action='store_true', help="Print usage per channel")
+    args = parser.parse_args()
+
+    if not args.status:
+        parser.print_help()
+        return
+
+    from database import DatabaseManager
+    spent = DatabaseManager().get_llm_usage_by_channel(utc_day())
+    budget = f"/{LLM_DAILY_TOKEN_BUDGET}" if LLM_DAILY_TOKEN_BUDGET else ""
+    print(f"[USAGE] {utc_day()}: {sum(spent.values())}{budget} token")
+    for channel in sorted(set(spent) | set(CHANNELS)):
+        info = CHANNELS.get(channel, {})
+        limit = info.get('token_budget', LLM_CHANNEL_TOKEN_BUDGET)
+        print(f"  {channel:<24} öncelik={info.get('priority', '-')} {spent.get(channel, 0)}"
+              f"{f'/{limit}' if limit else ''}")
+
+if __name__ == "__main__":
+    main()
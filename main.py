@@ -1,13 +1,19 @@
 import os
+import asyncio
 import base64
 import time
 import traceback
 import tempfile
 from telethon.sync import TelegramClient
 from config import *
-from bot import process_channel
+from bot import media_store
 from keep_alive import keep_alive  # Assuming keep_alive.py exists; otherwise integrate
 from utils import get_sent_hashes
+from ingest import governor, process_channel, run_forever, run_events
+from backfill import backfill_worker, run_pending_backfills
+from media_fetch import media_fetch_worker, run_pending_media_fetches
+from llm_retry import llm_retry_worker, run_due_retries
+from media_store import eviction_worker
 
 # Force session loading from repository files
 def load_session_from_files():
@@ -77,7 +83,21 @@ print("✅ Telegram oturumu aktif.\n")
 
 def main():
     keep_alive()
+
+    # The sync client wraps an async one; drive it on its own event loop
+    if INGESTION_MODE == "events":
+        client.loop.run_until_complete(asyncio.gather(
+            run_events(client), backfill_worker(client), media_fetch_worker(client),
+            eviction_worker(media_store), llm_retry_worker(client)))
+        return
+    if INGESTION_MODE == "async":
+        client.loop.run_until_complete(asyncio.gather(
+            run_forever(client), backfill_worker(client), media_fetch_worker(client),
+            eviction_worker(media_store), llm_retry_worker(client)))
+        return
+
     print("🚀 Bot çalışmaya başladı. Kanallar taranıyor...\n")
+    governor.install(client)
     
     # Add a startup delay to prevent immediate processing
     print("[STARTUP] Waiting 5 seconds before first scan...")
@@ -87,7 +107,6 @@ def main():
         try:
             print("[INFO] Kanallar kontrol ediliyor...")
             sent_hashes = get_sent_hashes()
-            print(f"[DEBUG] Loaded {len(sent_hashes)} sent hashes")
             new_messages = 0
 
             with client:
@@ -98,8 +117,16 @@ def main():
                         print(f"[WAIT] Processed channel {channel}, waiting 5 seconds...")
                         time.sleep(5)
 
+                # Backfill and media fetch jobs queued through the API or the CLI, and messages parked
+                # after GPT failures, run between polling rounds
+                client.loop.run_until_complete(run_pending_backfills(client))
+                client.loop.run_until_complete(run_pending_media_fetches(client))
+                client.loop.run_until_complete(run_due_retries(client))
+
             if new_messages == 0:
                 print("[INFO] Yeni mesaj bulunamadı.")
+
+            media_store.evict()
         except Exception as e:
             print("❌ Genel hata:", e)
             traceback.print_exc()
@@ -107,8 +134,6 @@ def main():
             print("[ERROR] Waiting 60 seconds before retry...")
             time.sleep(60)
 
-        # In main loop, calculate sleep based on priorities
-        sleep_time = LOOP_INTERVAL if new_messages == 0 else LOOP_INTERVAL / 2  # Example adaptive
         print(f"[WAIT] {LOOP_INTERVAL / 60} dakika bekleniyor...\n")
         time.sleep(LOOP_INTERVAL)
 
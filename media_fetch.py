@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Download the media of rejected posts on demand.
+
+Rejected posts are stored without their photos and videos: posts.media_ref
+keeps the channel and Telegram message ids instead. Opening such a post in
+the dashboard queues a media_fetch_jobs row, and the bot worker fetches the
+messages again (Telegram file references expire, a freshly fetched message
+carries a valid one) and downloads their media. Files the fingerprint index
+already has on disk are linked instead of downloaded.
+
+Usage:
+    python media_fetch.py --post 1234
+    python media_fetch.py --status
+"""
+
+import argparse
+import asyncio
+import json
+import traceback
+from config import *
+from bot import db, media_store
+from ingest import governor, media_index, peers
+from media_index import media_key
+
+async def resolve_post_media(client, post):
+    """Download the media behind a post's media_ref; returns the file paths in message order"""
+    reference = json.loads(post['media_ref'])
+    entity = await peers.get_input_channel(client, reference['channel'])
+    messages = await governor.call('history', lambda: client.get_messages(entity, ids=reference['message_ids']))
+
+    paths = []
+    for message in messages:
+        media = message and (message.video or message.photo)
+        if not media:
+            continue  # Deleted since, or the media was removed
+        known = media_index.lookup(media)
+        if known is not None:
+            paths.append(known['path'])
+            continue
+        path = await governor.call('download', lambda: client.download_media(media, file="media/"))
+        if path:
+            path = await asyncio.to_thread(media_store.put, path)
+            media_index.set_path(media_key(media), path)
+            paths.append(path)
+    return paths
+
+async def run_media_fetch_job(client, job):
+    post = await asyncio.to_thread(db.get_post_media, job['post_id'])
+    if post is None or not post['media_ref']:
+        await asyncio.to_thread(db.update_media_fetch_job, job['id'], 'failed', 'Post has no media reference')
+        return
+
+    await asyncio.to_thread(db.update_media_fetch_job, job['id'], 'running')
+    paths = await resolve_post_media(client, post)
+    if not paths:
+        await asyncio.to_thread(db.update_media_fetch_job, job['id'], 'failed', 'Media no longer available')
+        print(f"❌ [MEDIA] Post {job['post_id']} medyası artık Telegram'da yok.")
+        return
+
+    await asyncio.to_thread(db.set_post_media, job['post_id'], paths[0],
+                            json.dumps(paths) if len(paths) > 1 else None)
+    await asyncio.to_thread(db.update_media_fetch_job, job['id'], 'done')
+    print(f"✅ [MEDIA] Post {job['post_id']} için {len(paths)} dosya indirildi.")
+
+async def run_pending_media_fetches(client):
+    """Run queued jobs and retry interrupted ones, oldest first"""
+    jobs = await asyncio.to_thread(db.get_media_fetch_jobs, ['running', 'queued'])
+    for job in jobs:
+        try:
+            await run_media_fetch_job(client, job)
+        except Exception as e:
+            print(f"❌ [MEDIA] İş #{job['id']} hata:", e)
+            traceback.print_exc()
+            await asyncio.to_thread(db.update_media_fetch_job, job['id'], 'failed', str(e))
+    return len(jobs)
+
+async def media_fetch_worker(client):
+    """Background task that picks up media fetches queued through the API"""
+    while True:
+        try:
+            await run_pending_media_fetches(client)
+        except Exception as e:
+            print("❌ [MEDIA] Worker hatası:", e)
+            traceback.print_exc()
+        await asyncio.sleep(MEDIA_FETCH_POLL_INTERVAL)
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the deferred media of rejected posts")
+    parser.add_argument('--post', type=int, help="Queue the media of this post id and run pending jobs")
+    parser.add_argument('--status', action='store_true', help="Show recent jobs and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        for job in db.get_media_fetch_jobs():
+            print(f"#{job['id']} post={job['post_id']:<8} {job['status']:<8} {job['error'] or ''}")
+        return
+
+    if args.post:
+        job_id = db.create_media_fetch_job(args.post)
+        print(f"[MEDIA] İş #{job_id} oluşturuldu.")
+
+    # Importing main connects the shared Telegram session
+    from main import client
+    governor.install(client)
+    client.loop.run_until_complete(run_pending_media_fetches(client))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Fingerprint index of media already seen in earlier posts.
+
+Every photo and video that reaches the media stage is recorded with its
+Telegram file id and access_hash. Photos also get a 64-bit dHash. A repost or
+forward of known media is linked to the file already on disk, so it is not
+downloaded again. A re-upload of the same image is caught when its dHash is
+within MEDIA_DHASH_DISTANCE bits of an earlier one. Either way the media is
+treated as a duplicate of the earlier post. Media first seen as a thumbnail
+preview has no path until the full file is downloaded. Entries live in the
+media_fingerprints table and are kept in memory after startup.
+"""
+
+import os
+import threading
+import numpy as np
+from config import MEDIA_DHASH_DISTANCE
+
+# Set bits per byte value, for Hamming distances over whole arrays of hashes
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def media_key(media):
+    """Stable key of a Telethon Photo/Document: its type and Telegram file id"""
+    return f"{type(media).__name__.lower()}:{media.id}"
+
+class MediaIndex:
+    def __init__(self, db, max_distance=MEDIA_DHASH_DISTANCE):
+        self.db = db
+        self.max_distance = max_distance
+        self.entries = {}  # media key -> fingerprint row
+        # dHashes of photos in a growable array, with the owning message ids alongside
+        self.hashes = np.zeros(1024, dtype=np.uint64)
+        self.hash_message_ids = []
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        for entry in self.db.get_media_fingerprints():
+            self._remember(entry)
+
+    def _remember(self, entry):
+        self.entries[entry['media_key']] = entry
+        if entry['dhash'] is None:
+            return
+        if len(self.hash_message_ids) == len(self.hashes):
+            self.hashes = np.concatenate([self.hashes, np.zeros_like(self.hashes)])
+        self.hashes[len(self.hash_message_ids)] = np.uint64(entry['dhash'] & 0xFFFFFFFFFFFFFFFF)
+        self.hash_message_ids.append(entry['message_id'])
+
+    def lookup(self, media):
+        """Fingerprint of already-downloaded media whose file is still on disk, or None"""
+        entry = self.entries.get(media_key(media))
+        if entry and entry['path'] and os.path.exists(entry['path']):
+            return entry
+        return None
+
+    def find_similar(self, dhash, exclude=None):
+        """Message id of the earlier post with the closest image within max_distance, or None"""
+        with self.lock:
+            count = len(self.hash_message_ids)
+            if not count:
+                return None
+            differing = self.hashes[:count] ^ np.uint64(dhash & 0xFFFFFFFFFFFFFFFF)
+            distances = _POPCOUNT[differing.view(np.uint8)].reshape(count, 8).sum(axis=1)
+            for index in np.argsort(distances, kind='stable'):
+                if distances[index] > self.max_distance:
+                    return None
+                if self.hash_message_ids[index] != exclude:
+                    return self.hash_message_ids[index]
+        return None
+
+    def add(self, key, access_hash, kind, path, dhash, message_id):
+        """Record media first seen in message_id"""
+        entry = {
+            'media_key': key,
+            'access_hash': access_hash,
+            'kind': kind,
+            'path': path,
+            # SQLite integers are signed 64-bit
+            'dhash': dhash - (1 << 64) if dhash is not None and dhash >= 1 << 63 else dhash,
+            'message_id': message_id,
+        }
+        with self.lock:
+            if key in self.entries:
+                return
+            self._remember(entry)
+        self.db.save_media_fingerprint(entry)
+
+    def set_path(self, key, path):
+        """Record where the full file of known media was downloaded"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            entry['path'] = path
+        self.db.set_media_fingerprint_path(key, path)
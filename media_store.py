@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Content-addressed media store with reference counts and eviction.
+
+Downloaded files are moved to MEDIA_STORE_DIR and named by the SHA-256 of
+their content, so a photo shared by several posts is kept once. The
+media_files table indexes every stored file by path, with its size and the
+number of posts whose media_path/media_paths reference it. serve_media
+looks files up there instead of checking the filesystem.
+
+New files get JPEG thumbnails at THUMBNAIL_WIDTHS, made with Pillow from the
+photo itself or, for videos, from the Telegram preview image. The dashboard
+requests those (/api/media/<path>?w=480) for list previews.
+
+evict() first releases the media of posts older than the retention for
+their status (MEDIA_RETENTION_DAYS). While the store is over
+MEDIA_STORE_BUDGET it then releases the media of the least valuable
+posts: shortest retention first, oldest first. Files that no post
+references are deleted. Released posts keep their media_ref, so the
+dashboard can still download the media again on demand.
+
+Usage:
+    python media_store.py --status
+    python media_store.py --evict
+    python media_store.py --migrate   # move files of existing posts into the store
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from PIL import Image
+from config import *
+
+def file_digest(path):
+    """SHA-256 of a file's content, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def thumbnail_path(path, width):
+    return f"{os.path.splitext(path)[0]}_w{width}.jpg"
+
+def make_thumbnails(path, source):
+    """Write JPEG thumbnails of an image at each THUMBNAIL_WIDTHS narrower than it.
+
+    source is the image itself or, for a video, its poster.
+    Returns ({width: thumbnail path}, total bytes written).
+    """
+    thumbnails = {}
+    written = 0
+    with Image.open(source) as image:
+        image.draft('RGB', (max(THUMBNAIL_WIDTHS), max(THUMBNAIL_WIDTHS) * 4))
+        image = image.convert('RGB')
+        widths = [width for width in THUMBNAIL_WIDTHS if width < image.width]
+        if not widths and source != path:
+            # A small video poster is still better than sending the video
+            widths = [image.width]
+        for width in sorted(widths, reverse=True):
+            height = max(round(image.height * width / image.width), 1)
+            image = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+            thumbnail = thumbnail_path(path, width)
+            image.save(thumbnail, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+            thumbnails[width] = thumbnail
+            written += os.path.getsize(thumbnail)
+    return thumbnails, written
+
+class MediaStore:
+    def __init__(self, db, root=MEDIA_STORE_DIR, budget=MEDIA_STORE_BUDGET):
+        self.db = db
+        self.root = root
+        self.budget = budget
+        # Serialises put() against file deletion in evict()
+        self.lock = threading.Lock()
+
+    def put(self, path, poster=None):
+        """Move a downloaded file into the store; returns its path in the store.
+
+        When the same content is already stored, the new copy is deleted and
+        the existing path is returned. New photos are thumbnailed from
+        themselves, new videos from the poster image when one is given.
+        """
+        if path is None or path.startswith(self.root):
+            return path
+        file_hash = file_digest(path)
+        stored = os.path.join(self.root, file_hash[:2], file_hash + os.path.splitext(path)[1].lower())
+        with self.lock:
+            stored = self.db.add_media_file(file_hash, stored, os.path.getsize(path), time.time())
+            if os.path.exists(stored):
+                os.remove(path)
+                return stored
+            os.makedirs(os.path.dirname(stored), exist_ok=True)
+            os.replace(path, stored)
+
+        source = poster if poster else stored
+        if source.lower().endswith(IMAGE_EXTENSIONS):
+            try:
+                thumbnails, size = make_thumbnails(stored, source)
+                self.db.set_media_thumbnails(file_hash, json.dumps(thumbnails), size)
+            except Exception as e:
+                print("[WARN] Küçük görsel oluşturulamadı:", e)
+        return stored
+
+    def delete_unreferenced(self, before):
+        """Delete stored files no post references, indexed before the given time; returns (files, bytes)"""
+        files = {entry['hash']: entry for entry in self.db.get_unreferenced_media_files(before)}
+        if not files:
+            return 0, 0
+        freed = 0
+        with self.lock:
+            deleted = self.db.delete_media_files(list(files), before)
+            for file_hash in deleted:
+                thumbnails = json.loads(files[file_hash]['thumbnails'] or '{}')
+                for path in [files[file_hash]['path']] + list(thumbnails.values()):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                freed += files[file_hash]['size']
+        return len(deleted), freed
+
+    def evict(self):
+        """Apply the retention policy and the size budget; returns what was released and deleted"""
+        orphans_before = time.time() - MEDIA_ORPHAN_GRACE
+        released = self.db.release_post_media(
+            self.db.get_expired_media_posts(MEDIA_RETENTION_DAYS, MEDIA_RETENTION_DEFAULT_DAYS)
+        )
+        deleted, freed = self.delete_unreferenced(orphans_before)
+
+        usage = self.db.get_media_store_usage(orphans_before)['size']
+        while usage > self.budget:
+            post_ids = self.db.get_media_posts_by_value(MEDIA_RETENTION_DAYS, MEDIA_RETENTION_DEFAULT_DAYS)
+            if not post_ids:
+                break
+            released += self.db.release_post_media(post_ids)
+            files, size = self.delete_unreferenced(orphans_before)
+            deleted += files
+            freed += size
+            # Released files still within the grace period drop out of the usage without being freed
+            usage = self.db.get_media_store_usage(orphans_before)['size']
+
+        if released or deleted:
+            print(f"[MEDIA] {released} postun medyası bırakıldı, {deleted} dosya silindi "
+                  f"({freed / 1048576:.1f} MB), depo {usage / 1048576:.1f}/{self.budget / 1048576:.0f} MB.")
+        return {'released': released, 'deleted': deleted, 'freed': freed, 'size': usage}
+
+    def migrate(self):
+        """Move the files of existing posts into the store and recount references"""
+        moved = {}
+        skipped = 0
+        for media_path, media_paths in self.db.get_post_media_files():
+            for path in [media_path] + (json.loads(media_paths) if media_paths else []):
+                if not path or path in moved or path.startswith(self.root):
+                    continue
+                if os.path.isfile(path):
+                    moved[path] = self.put(path)
+                else:
+                    skipped += 1
+        self.db.replace_media_paths(moved)
+        files = self.db.recount_media_refs()
+        print(f"[MEDIA] {len(moved)} dosya depoya taşındı, {skipped} eksik dosya atlandı, "
+              f"{files} dosyaya referans var.")
+
+async def eviction_worker(store):
+    """Background task that keeps the store within its retention policy and budget"""
+    while True:
+        try:
+            await asyncio.to_thread(store.evict)
+        except Exception as e:
+            print("❌ [MEDIA] Temizlik hatası:", e)
+            traceback.print_exc()
+        await asyncio.sleep(MEDIA_EVICT_INTERVAL)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the content-addressed media store")
+    parser.add_argument('--status', action='store_true', help="Show store usage")
+    parser.add_argument('--evict', action='store_true', help="Run one eviction pass")
+    parser.add_argument('--migrate', action='store_true', help="Move files of existing posts into the store")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    store = MediaStore(DatabaseManager())
+    if args.migrate:
+        store.migrate()
+    if args.evict:
+        store.evict()
+    if args.status or not (args.migrate or args.evict):
+        usage = store.db.get_media_store_usage()
+        print(f"[MEDIA] {usage['files']} dosya, {usage['size'] / 1048576:.1f}/"
+              f"{store.budget / 1048576:.0f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,10 @@ export interface Post {
   twitter_url?: string;
   telegram_url?: string;
   priority: number;
+  cluster_id?: number;
+  cluster_size?: number;
+  duplicate_of?: string;
+  media_ref?: string;  // Telegram reference; POST /api/posts/<id>/media downloads it when media_path is empty
 }
 
 export interface Analytics {
@@ -36,6 +40,16 @@ export interface Analytics {
     avg_bias: number;
     total_posts: number;
   };
+  llm_usage_daily?: Record<string, LlmUsage>;
+  llm_usage_by_channel?: Record<string, LlmUsage>;
+}
+
+export interface LlmUsage {
+  requests: number;
+  prompt_tokens: number;
+  completion_tokens: number;
+  total_tokens: number;
+  accepted: number;
 }
 
 export interface Stats {
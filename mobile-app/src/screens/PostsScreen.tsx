@@ -165,12 +165,16 @@ const PostsScreen: React.FC = () => {
     }
 
     const mediaUri = `${state.apiUrl}/api/media/${post.media_path}`;
+    // List previews use a thumbnail; the full file is only fetched for playback or saving
+    const previewUri = `${mediaUri}?w=480`;
 
     return (
       <View style={styles.mediaContainer}>
         {post.media_type === 'video' ? (
           <Video
             source={{ uri: mediaUri }}
+            poster={previewUri}
+            posterResizeMode="contain"
             style={styles.media}
             resizeMode="contain"
             controls
@@ -185,7 +189,7 @@ const PostsScreen: React.FC = () => {
         ) : post.media_type === 'photo' ? (
           <FastImage
             source={{ 
-              uri: mediaUri,
+              uri: previewUri,
               priority: FastImage.priority.normal,
             }}
             style={styles.media}
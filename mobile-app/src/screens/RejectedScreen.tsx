@@ -116,12 +116,14 @@ const RejectedScreen: React.FC = () => {
     if (!post.media_path) return null;
 
     const mediaUrl = `${state.apiUrl}/api/media/${post.media_path}`;
+    // List previews use a thumbnail; the full file is only fetched for playback or saving
+    const previewUrl = `${mediaUrl}?w=480`;
 
     if (post.media_type === 'photo') {
       return (
         <View style={styles.mediaContainer}>
           <FastImage
-            source={{ uri: mediaUrl }}
+            source={{ uri: previewUrl }}
             style={styles.mediaImage}
             resizeMode={FastImage.resizeMode.cover}
             onError={(error) => {
@@ -135,8 +137,10 @@ const RejectedScreen: React.FC = () => {
         <View style={styles.mediaContainer}>
           <Video
             source={{ uri: mediaUrl }}
+            poster={previewUrl}
             style={styles.mediaVideo}
             controls={true}
+            paused
             resizeMode="cover"
             onError={(error) => {
               console.log('Video load error:', error);
@@ -0,0 +1,158 @@
+"""
+MinHash/LSH index of recently screened messages across all channels.
+
+Each message is reduced to word shingles, and a MinHash signature of
+NEAR_DUPLICATE_PERMUTATIONS values estimates the Jaccard similarity between
+shingle sets. The signature is cut into NEAR_DUPLICATE_BANDS bands, and each
+band is hashed into a bucket. A lookup only compares signatures that share
+at least one bucket with the new message, so its cost depends on the number
+of close candidates and not on the size of the index.
+
+Signatures are persisted in the minhash_index table and reloaded on startup.
+Entries older than NEAR_DUPLICATE_WINDOW seconds are evicted.
+"""
+
+import re
+import threading
+import time
+import zlib
+from collections import deque
+import numpy as np
+from config import (NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_WINDOW, NEAR_DUPLICATE_SHINGLE,
+                    NEAR_DUPLICATE_PERMUTATIONS, NEAR_DUPLICATE_BANDS)
+
+def shingles(text, size=NEAR_DUPLICATE_SHINGLE):
+    """Set of hashed word n-grams; texts shorter than size form a single shingle"""
+    words = re.findall(r'\w+', (text or "").lower())
+    if not words:
+        return np.array([], dtype=np.uint64)
+    grams = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+    return np.array([zlib.crc32(gram.encode()) for gram in grams], dtype=np.uint64)
+
+class MinHashIndex:
+    def __init__(self, db, threshold=NEAR_DUPLICATE_THRESHOLD, window=NEAR_DUPLICATE_WINDOW,
+                 permutations=NEAR_DUPLICATE_PERMUTATIONS, bands=NEAR_DUPLICATE_BANDS):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.db = db
+        self.threshold = threshold
+        self.window = window
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+
+        # Fixed seed: persisted signatures stay comparable across restarts.
+        # Multiply-shift hashing of the 32-bit shingles: ((a * x + b) mod 2**64) >> 32
+        # with odd 64-bit a. uint64 arithmetic wraps, which provides the mod.
+        rng = np.random.default_rng(20240601)
+        self.a = (rng.integers(0, 1 << 63, permutations, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, permutations, dtype=np.uint64) << np.uint64(1)
+        self.band_weights = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        self.band_salts = rng.integers(0, 1 << 63, bands, dtype=np.uint64)
+
+        self.signatures = {}  # message_id -> signature
+        self.buckets = [{} for _ in range(bands)]  # band -> {bucket key: [message_id, ...]}
+        # Entries loaded at startup: sorted band keys and the loaded row each belongs to
+        self.loaded_keys = np.array([], dtype=np.uint64)
+        self.loaded_rows = np.array([], dtype=np.int32)
+        self.loaded_ids = []
+        self.entries = deque()  # (added_at, message_id), oldest first
+        self.lock = threading.Lock()
+        self.load()
+
+    def signature(self, text):
+        """MinHash signature (uint32 array), or None for texts without words"""
+        shingle_hashes = shingles(text)
+        if not len(shingle_hashes):
+            return None
+        hashed = (np.outer(shingle_hashes, self.a) + self.b) >> np.uint64(32)
+        return hashed.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signatures):
+        """One bucket key per band for each row of a (n x permutations) signature matrix"""
+        bands = signatures.astype(np.uint64).reshape(len(signatures), self.bands, self.rows)
+        # uint64 arithmetic wraps, which is what we want for hashing; the band
+        # number is mixed in so equal values in different bands never collide
+        return (bands * self.band_weights).sum(axis=2) ^ self.band_salts
+
+    def load(self):
+        """Rebuild the index from the persisted signatures of the last window.
+
+        Loaded entries go into one sorted array of band keys (searched with
+        np.searchsorted) instead of per-bucket lists, which keeps startup to a
+        few vectorized operations even with hundreds of thousands of rows.
+        """
+        cutoff = time.time() - self.window
+        self.db.prune_minhashes(cutoff)
+        rows = [row for row in self.db.get_minhashes(cutoff) if len(row[2]) == self.permutations * 4]
+        if not rows:
+            return
+
+        matrix = np.frombuffer(b''.join(row[2] for row in rows), dtype=np.uint32).reshape(len(rows), -1)
+        keys = self._band_keys(matrix).ravel()
+        order = np.argsort(keys, kind='stable')
+        self.loaded_keys = keys[order]
+        self.loaded_rows = (order // self.bands).astype(np.int32)
+        self.loaded_ids = [row[0] for row in rows]
+
+        self.signatures.update(zip(self.loaded_ids, matrix))
+        self.entries.extend((row[1], row[0]) for row in rows)
+        print(f"[DEDUP] {len(rows)} imza yüklendi.")
+
+    def _evict(self, now):
+        cutoff = now - self.window
+        while self.entries and self.entries[0][0] < cutoff:
+            _, message_id = self.entries.popleft()
+            signature = self.signatures.pop(message_id, None)
+            if signature is None:
+                continue
+            for band, key in enumerate(self._band_keys(signature[None, :])[0].tolist()):
+                bucket = self.buckets[band].get(key)
+                if bucket is not None:
+                    bucket.remove(message_id)
+                    if not bucket:
+                        del self.buckets[band][key]
+
+    def find(self, signature, exclude=None):
+        """Most similar indexed message at or above the threshold: (message_id, similarity) or None"""
+        keys = self._band_keys(signature[None, :])[0]
+        candidates = set()
+        for band, key in enumerate(keys.tolist()):
+            candidates.update(self.buckets[band].get(key, ()))
+
+        if self.loaded_ids:
+            starts = np.searchsorted(self.loaded_keys, keys, 'left')
+            ends = np.searchsorted(self.loaded_keys, keys, 'right')
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                candidates.update(self.loaded_ids[row] for row in self.loaded_rows[start:end].tolist())
+        candidates.discard(exclude)
+
+        best = None
+        for message_id in candidates:
+            if message_id not in self.signatures:
+                continue  # Loaded entry evicted since startup
+            similarity = float(np.mean(self.signatures[message_id] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (message_id, similarity)
+        return best
+
+    def check_and_add(self, message_id, channel, text):
+        """Return (message_id, similarity) of a near-duplicate, or index the text and return None"""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        now = time.time()
+        with self.lock:
+            self._evict(now)
+            match = self.find(signature, exclude=message_id)
+            if match is not None or message_id in self.signatures:
+                return match
+
+            self.signatures[message_id] = signature
+            self.entries.append((now, message_id))
+            for band, key in enumerate(self._band_keys(signature[None, :])[0].tolist()):
+                self.buckets[band].setdefault(key, []).append(message_id)
+
+        self.db.save_minhash(message_id, channel, now, signature.tobytes())
+        return None
@@ -0,0 +1,108 @@
+"""
+Persistent cache of resolved Telegram peers.
+
+Username resolution and entity fetches are among the most flood-wait-prone
+Telegram calls. PeerCache keeps channel InputPeers (by username) and sender
+display names (by sender id) in memory and in the peer_cache table with a TTL,
+so after warm() steady-state polling makes no resolve calls at all.
+"""
+
+import threading
+import time
+from telethon import utils as telethon_utils
+from telethon.tl.types import InputPeerChannel, InputPeerChat, InputPeerUser
+from config import PEER_CACHE_TTL
+
+class PeerCache:
+    def __init__(self, db, governor=None, ttl=PEER_CACHE_TTL):
+        self.db = db
+        self.governor = governor
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.resolves = 0
+        self.load()
+
+    def load(self):
+        """Load every non-expired entry from the database"""
+        for peer in self.db.get_cached_peers(min_updated_at=time.time() - self.ttl):
+            self.entries[(peer['kind'], peer['key'])] = peer
+
+    def _get(self, kind, key):
+        peer = self.entries.get((kind, key))
+        if peer and time.time() - peer['updated_at'] < self.ttl:
+            return peer
+        return None
+
+    def _put(self, kind, key, peer_id, access_hash, peer_type, name):
+        peer = {
+            'kind': kind,
+            'key': key,
+            'peer_id': peer_id,
+            'access_hash': access_hash,
+            'peer_type': peer_type,
+            'name': name,
+            'updated_at': time.time(),
+        }
+        with self.lock:
+            self.entries[(kind, key)] = peer
+        self.db.save_cached_peer(peer)
+        return peer
+
+    @staticmethod
+    def _input_peer(peer):
+        if peer['peer_type'] == 'channel':
+            return InputPeerChannel(peer['peer_id'], peer['access_hash'])
+        if peer['peer_type'] == 'user':
+            return InputPeerUser(peer['peer_id'], peer['access_hash'])
+        return InputPeerChat(peer['peer_id'])
+
+    async def get_input_channel(self, client, username):
+        """InputPeer for a channel username, resolving it only on a cache miss"""
+        key = username.lower()
+        peer = self._get('channel', key)
+        if peer is None:
+            self.resolves += 1
+            if self.governor is not None:
+                entity = await self.governor.call('resolve', lambda: client.get_input_entity(username))
+            else:
+                entity = await client.get_input_entity(username)
+            if isinstance(entity, InputPeerChannel):
+                peer = self._put('channel', key, entity.channel_id, entity.access_hash, 'channel', username)
+            elif isinstance(entity, InputPeerUser):
+                peer = self._put('channel', key, entity.user_id, entity.access_hash, 'user', username)
+            else:
+                peer = self._put('channel', key, telethon_utils.get_peer_id(entity, add_mark=False),
+                                 None, 'chat', username)
+        return self._input_peer(peer)
+
+    def sender_name(self, message):
+        """Display name of a message's sender, cached by sender id.
+
+        Falls back to the sender entity Telegram delivered with the message;
+        never makes a request. Returns None when the sender is unknown.
+        """
+        sender_id = message.sender_id
+        if sender_id is None:
+            return None
+
+        peer = self._get('sender', str(sender_id))
+        if peer is not None:
+            return peer['name']
+
+        sender = message.sender
+        if sender is None:
+            return None
+        name = getattr(sender, 'first_name', '') or getattr(sender, 'title', '')
+        self._put('sender', str(sender_id), sender_id, getattr(sender, 'access_hash', None),
+                  type(sender).__name__.lower(), name)
+        return name
+
+    async def warm(self, client, channels):
+        """Resolve every configured channel up front (cache misses only)"""
+        for channel in channels:
+            try:
+                await self.get_input_channel(client, channel)
+            except Exception as e:
+                print(f"[WARN] Kanal çözümlenemedi ({channel}):", e)
+        print(f"[PEERS] {len(channels)} kanal hazır, {self.resolves} çözümleme yapıldı.")
@@ -0,0 +1,185 @@
+"""
+Staged processing pipeline.
+
+Stages are connected by bounded asyncio queues. Each stage has its own worker
+count and runs its function as an asyncio task ('async'), in a thread pool
+('thread') or in a process pool ('process'). A stage that falls behind fills
+its inbox, which blocks the upstream put() and so pushes back all the way to
+the producer. A stage with batch_size > 1 hands its function lists of items,
+collected for at most batch_wait seconds.
+"""
+
+import asyncio
+import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+class Stage:
+    """One processing step with its own worker pool.
+
+    func takes an item and returns the item for the next stage, or None to
+    drop it. Items for which when(item) is false skip the stage untouched.
+    Process stages need a picklable module-level func and picklable items.
+    Batch stages (batch_size > 1) call func with a list of items and expect a
+    list of results in the same order.
+    """
+
+    KINDS = ('async', 'thread', 'process')
+
+    def __init__(self, name, func, workers=1, kind='thread', when=None, batch_size=1, batch_wait=0.0):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.kind = kind
+        self.when = when
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.executor = None
+        self.stats = {'processed': 0, 'dropped': 0, 'failed': 0, 'skipped': 0}
+
+    def start(self):
+        if self.kind == 'thread':
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        elif self.kind == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, item):
+        if self.kind == 'async':
+            return await self.func(item)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.func, item)
+
+class Pipeline:
+    """Chain of stages connected by bounded queues"""
+
+    def __init__(self, stages, queue_size=100, on_error=None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.on_error = on_error
+        self.queues = []
+        self.tasks = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        self.queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        for index, stage in enumerate(self.stages):
+            stage.start()
+            for _ in range(stage.workers):
+                self.tasks.append(asyncio.create_task(self._worker(index)))
+
+    async def put(self, item):
+        """Feed an item into the first stage; waits while the pipeline is saturated"""
+        await self.queues[0].put(item)
+
+    async def join(self):
+        """Wait until every item fed so far has left the last stage"""
+        # Items are forwarded before task_done(), so draining in order is enough
+        for queue in self.queues:
+            await queue.join()
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        for stage in self.stages:
+            stage.shutdown()
+
+    def stats(self):
+        return {stage.name: dict(stage.stats, queued=queue.qsize())
+                for stage, queue in zip(self.stages, self.queues)}
+
+    async def _collect(self, stage, inbox, outbox, first):
+        """Items for one batch, starting with first; items skipping the stage are forwarded at once"""
+        batch = []
+        item = first
+        deadline = asyncio.get_running_loop().time() + stage.batch_wait
+        while True:
+            if stage.when is not None and not stage.when(item):
+                stage.stats['skipped'] += 1
+                if outbox is not None:
+                    await outbox.put(item)
+                inbox.task_done()
+            else:
+                batch.append(item)
+            if len(batch) >= stage.batch_size:
+                return batch
+            remaining = deadline - asyncio.get_running_loop().time()
+            try:
+                item = inbox.get_nowait() if remaining <= 0 else \
+                    await asyncio.wait_for(inbox.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                return batch
+
+    async def _batch_worker(self, index):
+        stage = self.stages[index]
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        while True:
+            batch = await self._collect(stage, inbox, outbox, await inbox.get())
+            if not batch:
+                continue
+            try:
+                results = await stage.run(batch)
+                for result in results:
+                    stage.stats['processed' if result is not None else 'dropped'] += 1
+                    if result is not None and outbox is not None:
+                        await outbox.put(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stage.stats['failed'] += len(batch)
+                for item in batch:
+                    if self.on_error:
+                        self.on_error(stage, item, e)
+                    else:
+                        print(f"❌ Pipeline hatası ({stage.name}):", e)
+                        traceback.print_exc()
+            finally:
+                for _ in batch:
+                    inbox.task_done()
+
+    async def _worker(self, index):
+        stage = self.stages[index]
+        if stage.batch_size > 1:
+            return await self._batch_worker(index)
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        while True:
+            item = await inbox.get()
+            try:
+                if stage.when is not None and not stage.when(item):
+                    stage.stats['skipped'] += 1
+                    result = item
+                else:
+                    result = await stage.run(item)
+                    stage.stats['processed' if result is not None else 'dropped'] += 1
+
+                if result is not None and outbox is not None:
+                    # Blocks while the next stage is full: this is the backpressure
+                    await outbox.put(result)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                stage.stats['failed'] += 1
+                if self.on_error:
+                    self.on_error(stage, item, e)
+                else:
+                    print(f"❌ Pipeline hatası ({stage.name}):", e)
+                    traceback.print_exc()
+            finally:
+                inbox.task_done()
@@ -0,0 +1,74 @@
+"""
+FloodWait-aware rate governor for Telethon requests.
+
+Every Telegram request made by the ingestion code goes through
+RateGovernor.call() with a request kind ('history', 'download', 'resolve').
+Each kind has its own token bucket, so one kind of request cannot crowd out
+the others. When Telegram answers with FLOOD_WAIT, that kind is blocked for
+exactly the number of seconds the server asked for and the request is retried.
+Other request kinds, and the rest of the pipeline, keep running while the
+blocked caller waits without holding the event loop.
+"""
+
+import asyncio
+import time
+from telethon.errors import FloodWaitError
+from config import TELEGRAM_RATE_LIMITS, FLOOD_WAIT_MAX_RETRIES
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RateGovernor:
+    def __init__(self, limits=None, max_retries=FLOOD_WAIT_MAX_RETRIES):
+        limits = limits or TELEGRAM_RATE_LIMITS
+        self.buckets = {kind: TokenBucket(rate, burst) for kind, (rate, burst) in limits.items()}
+        self.max_retries = max_retries
+        self.blocked_until = {}
+        self.stats = {kind: {'calls': 0, 'flood_waits': 0, 'waited': 0.0} for kind in limits}
+
+    def install(self, client):
+        """Make Telethon raise every FloodWaitError instead of sleeping inside the call"""
+        client.flood_sleep_threshold = 0
+
+    async def call(self, kind, request):
+        """Run request() (a zero-argument callable returning an awaitable) under the governor"""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_if_blocked(kind)
+            await self.buckets[kind].acquire()
+            self.stats[kind]['calls'] += 1
+            try:
+                return await request()
+            except FloodWaitError as e:
+                self.stats[kind]['flood_waits'] += 1
+                # +1s because the server rounds the wait down
+                until = time.monotonic() + e.seconds + 1
+                self.blocked_until[kind] = max(self.blocked_until.get(kind, 0), until)
+                print(f"[FLOOD] '{kind}' istekleri için {e.seconds}s bekleme (deneme {attempt + 1}/{self.max_retries + 1})")
+                if attempt == self.max_retries:
+                    raise
+
+    async def _wait_if_blocked(self, kind):
+        while True:
+            remaining = self.blocked_until.get(kind, 0) - time.monotonic()
+            if remaining <= 0:
+                return
+            self.stats[kind]['waited'] += remaining
+            await asyncio.sleep(remaining)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Recompute quality_score and bias_score for posts already in the database.
+
+Run this after retuning the weights in scoring.py. Posts are read in id order
+in chunks of RESCORE_CHUNK_SIZE. Each chunk is scored with score_batch and
+written back together with the job's progress in a single transaction, so an
+interrupted job resumes from the last committed chunk. Only rows whose score
+actually changed are rewritten.
+
+Usage:
+    python rescore.py               # start a new rescore (or resume an unfinished one)
+    python rescore.py --workers 8 --chunk-size 10000
+    python rescore.py --status
+"""
+
+import argparse
+import time
+import traceback
+import numpy as np
+from config import RESCORE_CHUNK_SIZE, SCORING_WORKERS
+from database import DatabaseManager
+from scoring import score_batch
+
+db = DatabaseManager()
+
+def run_rescore_job(job, workers=SCORING_WORKERS, chunk_size=RESCORE_CHUNK_SIZE):
+    """Score posts after the job's last_post_id until the table is exhausted"""
+    last_post_id = job['last_post_id'] or 0
+    processed = job['processed'] or 0
+    changed = job['changed'] or 0
+    started = time.monotonic()
+    done_at_start = processed
+
+    db.update_rescore_job(job['id'], status='running')
+    print(f"[RESCORE] #{job['id']} başlıyor (son id={last_post_id}, {workers} işlem)")
+
+    while True:
+        rows = db.get_posts_for_rescore(last_post_id, chunk_size)
+        if not rows:
+            break
+
+        ids = np.array([row[0] for row in rows])
+        old_quality = np.array([row[2] or 0 for row in rows], dtype=np.float64)
+        old_bias = np.array([row[3] or 0 for row in rows], dtype=np.float64)
+        quality, bias = score_batch([row[1] for row in rows], workers=workers)
+
+        dirty = ~(np.isclose(quality, old_quality) & np.isclose(bias, old_bias))
+        scores = list(zip(quality[dirty].tolist(), bias[dirty].tolist(), ids[dirty].tolist()))
+
+        last_post_id = int(ids[-1])
+        processed += len(rows)
+        changed += len(scores)
+        db.save_rescore_chunk(job['id'], scores, last_post_id, processed, changed)
+
+        rate = (processed - done_at_start) / max(time.monotonic() - started, 1e-6)
+        print(f"[RESCORE] #{job['id']}: son id {last_post_id}, {processed} işlendi, "
+              f"{changed} değişti ({rate:.0f} post/s)")
+
+    db.update_rescore_job(job['id'], status='done')
+    print(f"✅ [RESCORE] #{job['id']} tamamlandı: {processed} işlendi, {changed} değişti.")
+
+def print_status():
+    for job in db.get_rescore_jobs():
+        print(f"#{job['id']} {job['status']:<8} son id={job['last_post_id']} "
+              f"işlendi={job['processed']} değişti={job['changed']} {job['error'] or ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute quality/bias scores of stored posts")
+    parser.add_argument('--workers', type=int, default=SCORING_WORKERS, help="Processes for feature extraction")
+    parser.add_argument('--chunk-size', type=int, default=RESCORE_CHUNK_SIZE, help="Posts per transaction")
+    parser.add_argument('--status', action='store_true', help="Show job progress and exit")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return
+
+    # An unfinished job is resumed instead of starting over from the first post
+    jobs = db.get_rescore_jobs(['running', 'queued'])
+    if jobs:
+        job = jobs[0]
+        print(f"[RESCORE] Yarım kalan iş #{job['id']} devam ediyor.")
+    else:
+        job_id = db.create_rescore_job()
+        job = db.get_rescore_jobs(['queued'])[-1]
+        print(f"[RESCORE] İş #{job_id} oluşturuldu.")
+
+    try:
+        run_rescore_job(job, workers=args.workers, chunk_size=args.chunk_size)
+    except Exception as e:
+        print(f"❌ [RESCORE] #{job['id']} hata:", e)
+        traceback.print_exc()
+        # Left as 'running' with its progress so the next run resumes it
+        db.update_rescore_job(job['id'], error=str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Adaptive per-channel polling scheduler.
+
+Each channel gets its own poll interval from its CHANNELS priority and its
+observed message arrival rate and acceptance rate. Busy channels are polled
+often enough to pick up about POLL_TARGET_BATCH new messages per poll, while
+quiet or low-yield channels back off exponentially up to MAX_POLL_INTERVAL.
+State is persisted in the channels table so restarts keep what was learned.
+"""
+
+import time
+from config import *
+
+# Weight of the newest observation in the moving averages
+EWMA_ALPHA = 0.3
+
+class ChannelScheduler:
+    def __init__(self, db, channels=None):
+        self.db = db
+        self.channels = channels if channels is not None else CHANNELS
+        self.state = {}
+        self.load()
+
+    def load(self):
+        """Restore learned rates and intervals; every channel is due right away"""
+        stored = self.db.get_channel_stats()
+        now = time.monotonic()
+        for channel, info in self.channels.items():
+            row = stored.get(channel, {})
+            # Rows written before the first scheduled poll (e.g. by the cursor) carry no rates yet
+            learned = row.get('poll_interval') is not None
+            self.state[channel] = {
+                'priority': info.get('priority', 1),
+                'interval': row.get('poll_interval') or LOOP_INTERVAL,
+                # None until measured; a stored 0.0 is a real observation
+                'message_rate': row.get('message_rate') if learned else None,  # messages per hour
+                'success_rate': row.get('success_rate') if learned else None,
+                'last_poll': None,
+                'next_due': now,
+            }
+
+    def due_channels(self):
+        """Channels whose next poll time has passed"""
+        now = time.monotonic()
+        return {channel: self.channels[channel]
+                for channel, state in self.state.items() if state['next_due'] <= now}
+
+    def seconds_until_next(self):
+        if not self.state:
+            return LOOP_INTERVAL
+        return max(0.0, min(state['next_due'] for state in self.state.values()) - time.monotonic())
+
+    def record(self, channel, fetched, posted):
+        """Fold one poll's outcome into the channel's rates and schedule its next poll"""
+        state = self.state[channel]
+        now = time.monotonic()
+
+        # The first poll after a start has no reference point for the arrival rate
+        if state['last_poll'] is not None:
+            elapsed_hours = max(now - state['last_poll'], 1.0) / 3600
+            state['message_rate'] = self._ewma(state['message_rate'], fetched / elapsed_hours)
+        if fetched:
+            state['success_rate'] = self._ewma(state['success_rate'], posted / fetched)
+
+        state['interval'] = self.next_interval(state, fetched)
+        state['last_poll'] = now
+        state['next_due'] = now + state['interval']
+
+        self.db.record_channel_poll(
+            channel, state['priority'], posted,
+            state['message_rate'], state['success_rate'], state['interval']
+        )
+        print(f"[SCHEDULER] {channel}: {fetched} yeni, {posted} gönderi, "
+              f"{state['message_rate'] or 0:.1f} msg/saat, sonraki tarama {state['interval']:.0f}s sonra")
+
+    def next_interval(self, state, fetched):
+        # Priority 1 channels may be polled at the floor, lower priorities proportionally slower
+        floor = MIN_POLL_INTERVAL * state['priority']
+        low_yield = (state['success_rate'] is not None and state['success_rate'] < LOW_YIELD_RATE
+                     and bool(state['message_rate']))
+
+        if not fetched or low_yield:
+            interval = state['interval'] * POLL_BACKOFF
+        elif state['message_rate']:
+            interval = POLL_TARGET_BATCH / state['message_rate'] * 3600
+        else:
+            interval = state['interval']
+
+        return min(max(interval, floor), MAX_POLL_INTERVAL)
+
+    @staticmethod
+    def _ewma(previous, value):
+        if previous is None:
+            return value
+        return EWMA_ALPHA * value + (1 - EWMA_ALPHA) * previous
@@ -0,0 +1,163 @@
+"""
+Content quality and bias scoring.
+
+calculate_content_quality / calculate_bias_score score one message while it is
+being screened. score_batch scores thousands of texts at once: the keyword
+matcher turns each text into a row of term counts, and the weights are then
+applied to the whole feature matrix with NumPy. Both paths use the same
+weight tables, so retuning a weight here changes live scoring and rescoring
+(rescore.py) alike.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config import BIAS_KEYWORDS, BLOCKED_KEYWORDS, BLOCKED_EMOJIS
+from keyword_matcher import KeywordMatcher
+
+# Scoring term lists (matched as whole words)
+BREAKING_TERMS = ['breaking', 'urgent', 'just in', 'developing', 'latest', 'update']
+OFFICIAL_TERMS = ['confirmed', 'official', 'statement', 'announces', 'declares', 'reports']
+GEO_TERMS = ['government', 'military', 'president', 'minister', 'embassy', 'border', 'sanctions',
+             'diplomatic', 'treaty', 'alliance', 'conflict', 'peace', 'war', 'crisis', 'summit']
+COUNTRY_TERMS = ['russia', 'ukraine', 'israel', 'palestine', 'china', 'taiwan', 'iran', 'syria',
+                 'turkey', 'germany', 'france', 'uk', 'usa', 'nato', 'eu', 'un']
+PROMO_TERMS = ['subscribe', 'follow', 'join', 'channel', 'link', 'click', 'download']
+BIAS_TERMS = [
+    'puppet government', 'puppet regime', 'puppet state',
+    'evil empire', 'axis of evil', 'terrorist state', 'rogue state',
+    'nazi', 'fascist', 'terrorist regime', 'dictator regime'
+]
+
+# Every term list compiled once; one pass returns all category hit counts
+keyword_matcher = KeywordMatcher({
+    'breaking': (BREAKING_TERMS, 'word'),
+    'official': (OFFICIAL_TERMS, 'word'),
+    'geo': (GEO_TERMS, 'word'),
+    'country': (COUNTRY_TERMS, 'word'),
+    'promo': (PROMO_TERMS, 'word'),
+    'bias': (BIAS_TERMS + BIAS_KEYWORDS, 'word'),
+    # Blocked keywords keep matching inflected forms ("reklamı", "sponsorship")
+    'blocked': (BLOCKED_KEYWORDS, 'prefix'),
+    'blocked_emoji': (BLOCKED_EMOJIS, 'substring'),
+})
+
+# Quality: (category, score per distinct term, cap on the category's contribution)
+QUALITY_BASE = 0.5
+QUALITY_TERM_WEIGHTS = [
+    ('breaking', 0.15, 0.3),   # Breaking news indicators
+    ('official', 0.1, 0.2),    # Official source indicators
+    ('geo', 0.15, 0.4),        # Geopolitical relevance (higher weight)
+    ('country', 0.1, 0.3),     # Country/region mentions
+    ('promo', -0.2, -0.4),     # Promotional content
+]
+# Length factor (optimal around 100-200 chars for Twitter): (min, max, bonus), first match wins
+QUALITY_LENGTH_BANDS = [(80, 250, 0.3), (50, 300, 0.2), (301, None, -0.1)]
+PUNCTUATION_LIMIT = 3          # More '!', '?' and '...' than this is a spam indicator
+PUNCTUATION_PENALTY = -0.2
+CAPITALIZATION_BONUS = 0.1     # Starts with proper capitalization
+
+# Bias: score per distinct biased term, capped at 1
+BIAS_WEIGHT = 0.25
+
+FEATURES = [name for name, _, _ in QUALITY_TERM_WEIGHTS] + ['bias', 'length', 'punctuation', 'capitalized']
+
+def extract_features(texts):
+    """Feature matrix (len(texts) x len(FEATURES)) of term counts and text statistics"""
+    features = np.zeros((len(texts), len(FEATURES)), dtype=np.int32)
+    for row, text in enumerate(texts):
+        text = text or ""
+        hits = keyword_matcher.counts(text)
+        features[row] = [hits[name] for name in FEATURES[:-3]] + [
+            len(text),
+            text.count('!') + text.count('?') + text.count('...'),
+            any(char.isupper() for char in text[:10]),
+        ]
+    return features
+
+def _term_score(weight, cap, count):
+    """Contribution of one term category, capped in the weight's direction"""
+    return max(count * weight, cap) if weight < 0 else min(count * weight, cap)
+
+def _length_score(length):
+    for low, high, bonus in QUALITY_LENGTH_BANDS:
+        if length >= low and (high is None or length <= high):
+            return bonus
+    return 0
+
+def calculate_content_quality(text, sender_name="", channel="", hits=None):
+    """Calculate content quality score based on various factors.
+
+    hits are keyword_matcher.counts(text); pass them in when already computed.
+    """
+    if hits is None:
+        hits = keyword_matcher.counts(text)
+    score = QUALITY_BASE + _length_score(len(text))
+
+    for name, weight, cap in QUALITY_TERM_WEIGHTS:
+        score += _term_score(weight, cap, hits[name])
+
+    punctuation_count = text.count('!') + text.count('?') + text.count('...')
+    if punctuation_count > PUNCTUATION_LIMIT:
+        score += PUNCTUATION_PENALTY
+
+    if any(char.isupper() for char in text[:10]):
+        score += CAPITALIZATION_BONUS
+
+    return min(max(score, 0), 1)  # Clamp between 0 and 1
+
+def calculate_bias_score(text, hits=None):
+    """Calculate bias score (0 = neutral, 1 = highly biased)"""
+    if hits is None:
+        hits = keyword_matcher.counts(text)
+    return min(hits['bias'] * BIAS_WEIGHT, 1)  # Max bias score of 1
+
+def score_features(features):
+    """Vectorized quality and bias scores for a feature matrix from extract_features"""
+    features = np.asarray(features, dtype=np.float64)
+    column = {name: features[:, index] for index, name in enumerate(FEATURES)}
+    quality = np.full(len(features), QUALITY_BASE)
+
+    length = column['length']
+    bonus = np.zeros(len(features))
+    unmatched = np.ones(len(features), dtype=bool)
+    for low, high, value in QUALITY_LENGTH_BANDS:
+        band = unmatched & (length >= low)
+        if high is not None:
+            band &= length <= high
+        bonus[band] = value
+        unmatched &= ~band
+    quality += bonus
+
+    for name, weight, cap in QUALITY_TERM_WEIGHTS:
+        contribution = column[name] * weight
+        quality += np.maximum(contribution, cap) if weight < 0 else np.minimum(contribution, cap)
+
+    quality += np.where(column['punctuation'] > PUNCTUATION_LIMIT, PUNCTUATION_PENALTY, 0)
+    quality += column['capitalized'] * CAPITALIZATION_BONUS
+
+    bias = np.minimum(column['bias'] * BIAS_WEIGHT, 1)
+    return np.clip(quality, 0, 1), bias
+
+_pool = None
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None or _pool._max_workers != workers:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+def score_batch(texts, workers=1, chunk_size=2000):
+    """Score many texts at once; returns (quality, bias) NumPy arrays.
+
+    With workers > 1 the feature extraction (the regex pass, which is the only
+    per-text Python work) is spread over a process pool in chunks of chunk_size.
+    """
+    texts = list(texts)
+    if workers > 1 and len(texts) > chunk_size:
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        features = np.concatenate(list(_get_pool(workers).map(extract_features, chunks)))
+    else:
+        features = extract_features(texts)
+    return score_features(features)
@@ -0,0 +1,140 @@
+"""
+Incremental story clustering of translated posts.
+
+Each accepted post is turned into a TF-IDF vector over its translated text
+and compared with the clusters active in the last CLUSTER_WINDOW seconds. It
+joins the most similar cluster at or above CLUSTER_THRESHOLD cosine
+similarity, or starts a new cluster. The new cluster's id is the post's own
+id. An inverted index maps each term to the clusters that contain it, so a
+post is only compared with clusters that share a term with it. Expired
+clusters are dropped, which keeps the cost of a post tied to the window and
+not to the size of the posts table.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from config import CLUSTER_THRESHOLD, CLUSTER_WINDOW
+
+STOPWORDS = {
+    'the', 'and', 'for', 'are', 'was', 'were', 'has', 'have', 'had', 'with', 'from', 'that',
+    'this', 'its', 'his', 'her', 'their', 'they', 'will', 'been', 'after', 'about', 'into',
+    'over', 'than', 'not', 'but', 'who', 'said', 'says', 'also', 'more', 'post', 'new',
+}
+
+# Words are cut to this many characters, a crude stemmer that is good enough
+# for headlines ("israel"/"israeli", "missile"/"missiles", "egypt"/"egyptian")
+STEM_LENGTH = 5
+
+# A post is only compared with clusters sharing one of its rarest terms
+CANDIDATE_TERMS = 8
+
+def terms(text):
+    """Stemmed content words of a text"""
+    return [word[:STEM_LENGTH] for word in re.findall(r'\w+', (text or "").lower())
+            if len(word) > 2 and word not in STOPWORDS and not word.isdigit()]
+
+class StoryCluster:
+    def __init__(self, cluster_id, last_seen):
+        self.cluster_id = cluster_id
+        self.term_counts = Counter()  # Summed term frequencies of all members
+        self.term_documents = Counter()  # Members containing each term
+        self.size = 0
+        self.last_seen = last_seen
+        self.norm = 0  # Centroid norm under the IDF weights at the last update
+
+class StoryClusterer:
+    def __init__(self, db, threshold=CLUSTER_THRESHOLD, window=CLUSTER_WINDOW):
+        self.db = db
+        self.threshold = threshold
+        self.window = window
+        self.clusters = {}
+        self.term_clusters = defaultdict(set)  # term -> ids of active clusters containing it
+        # Document frequencies over the posts in the window, for IDF weights
+        self.document_frequency = Counter()
+        self.documents = 0
+        self.expired_at = 0
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Rebuild the active clusters from the posts clustered within the window"""
+        posts = self.db.get_clustered_posts(time.time() - self.window)
+        for post_id, cluster_id, text, created in posts:
+            self._add(cluster_id, Counter(terms(text)), created)
+        if posts:
+            print(f"[CLUSTER] {len(self.clusters)} aktif hikâye yüklendi ({len(posts)} post).")
+
+    def _idf(self, term):
+        return math.log((1 + self.documents) / (1 + self.document_frequency[term])) + 1
+
+    def _similarity(self, vector, norm, cluster):
+        """Cosine similarity between a weighted post vector and a cluster's centroid"""
+        if not cluster.norm:
+            return 0
+        dot = sum(weight * cluster.term_counts[term] * self._idf(term)
+                  for term, weight in vector.items() if term in cluster.term_counts)
+        return dot / (norm * cluster.norm)
+
+    def _add(self, cluster_id, counts, now):
+        cluster = self.clusters.get(cluster_id)
+        if cluster is None:
+            cluster = self.clusters[cluster_id] = StoryCluster(cluster_id, now)
+        cluster.term_counts.update(counts)
+        cluster.term_documents.update(counts.keys())
+        cluster.size += 1
+        cluster.last_seen = max(cluster.last_seen, now)
+        for term in counts:
+            self.term_clusters[term].add(cluster_id)
+        self.document_frequency.update(counts.keys())
+        self.documents += 1
+        cluster.norm = math.sqrt(sum((count * self._idf(term)) ** 2
+                                     for term, count in cluster.term_counts.items()))
+
+    def _expire(self, now):
+        if now - self.expired_at < 60:
+            return
+        self.expired_at = now
+        cutoff = now - self.window
+        for cluster_id in [cid for cid, cluster in self.clusters.items() if cluster.last_seen < cutoff]:
+            cluster = self.clusters.pop(cluster_id)
+            for term in cluster.term_counts:
+                members = self.term_clusters.get(term)
+                if members is not None:
+                    members.discard(cluster_id)
+                    if not members:
+                        del self.term_clusters[term]
+            # The cluster's members leave the IDF statistics with it
+            self.documents -= cluster.size
+            for term, documents in cluster.term_documents.items():
+                self.document_frequency[term] -= documents
+                if self.document_frequency[term] <= 0:
+                    del self.document_frequency[term]
+
+    def assign(self, post_id, text):
+        """Cluster id for a new post: an active cluster's id or post_id for a new story"""
+        counts = Counter(terms(text))
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            if not counts:
+                self._add(post_id, counts, now)
+                return post_id
+
+            vector = {term: (1 + math.log(count)) * self._idf(term) for term, count in counts.items()}
+            norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+
+            candidates = set()
+            for term in sorted(vector, key=vector.get, reverse=True)[:CANDIDATE_TERMS]:
+                candidates.update(self.term_clusters.get(term, ()))
+
+            best_id, best_similarity = post_id, 0
+            for cluster_id in candidates:
+                similarity = self._similarity(vector, norm, self.clusters[cluster_id])
+                if similarity >= self.threshold and similarity > best_similarity:
+                    best_id, best_similarity = cluster_id, similarity
+
+            self._add(best_id, counts, now)
+            return best_id
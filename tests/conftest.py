@@ -0,0 +1,31 @@
+import os
+import shutil
+import sys
+import tempfile
+import pytest
+
+# config.py refuses to import without the Telegram/OpenAI settings; tests never use them, and GPT
+# requests that are not faked go to the local stand-in rather than the paid API
+for name, value in {'API_ID': '1', 'API_HASH': 'test', 'OPENAI_API_KEY': 'test', 'BOT_TOKEN': 'test',
+                    'CHAT_ID': '1', 'JWT_SECRET_KEY': 'test-secret-key-of-at-least-32-bytes',
+                    'LLM_BACKEND': 'standin'}.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# bot.py opens osint_bot.db, media/ and the CSV log relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix='osint_bot_tests_'))
+
+@pytest.fixture(scope='session')
+def empty_database(tmp_path_factory):
+    """A freshly initialized database file, created once (seeding users hashes passwords, which is slow)"""
+    from database import DatabaseManager
+    return DatabaseManager(str(tmp_path_factory.mktemp('db') / 'template.db')).db_path
+
+@pytest.fixture
+def db(empty_database, tmp_path):
+    """DatabaseManager on a copy of the empty database"""
+    from database import DatabaseManager
+    path = tmp_path / 'test.db'
+    shutil.copyfile(empty_database, path)
+    return DatabaseManager(str(path))
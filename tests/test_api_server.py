@@ -0,0 +1,89 @@
+import io
+import pytest
+from PIL import Image
+import api_server
+from flask_jwt_extended import create_access_token
+from media_store import MediaStore
+
+@pytest.fixture
+def client(monkeypatch, db):
+    monkeypatch.setattr(api_server, 'db', db)
+    monkeypatch.setattr(api_server.limiter, 'enabled', False)
+    with api_server.app.app_context():
+        token = create_access_token(identity='admin')
+    client = api_server.app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    return client
+
+@pytest.mark.parametrize('body, error', [
+    ({'channel': 'conflict_tr'}, 'required'),
+    ({'channel': 'elsewhere', 'from_message_id': 10}, 'Unknown channel'),
+    ({'channel': 'conflict_tr', 'from_message_id': 'abc'}, 'integer'),
+    ({'channel': 'conflict_tr', 'since': 'yesterday'}, 'ISO 8601'),
+])
+def test_invalid_backfill_requests_are_rejected(client, db, body, error):
+    response = client.post('/api/backfill', json=body)
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+    assert db.get_backfill_jobs() == []
+
+def test_backfill_is_queued(client, db):
+    response = client.post('/api/backfill', json={'channel': 'conflict_tr', 'from_message_id': '120'})
+    assert response.status_code == 202
+    job = db.get_backfill_jobs()[0]
+    assert (job['id'], job['start_message_id'], job['status']) == (response.get_json()['job_id'], 120, 'queued')
+    jobs = client.get('/api/backfill').get_json()['jobs']
+    assert [job['channel_name'] for job in jobs] == ['conflict_tr']
+
+def test_media_fetch_is_queued_once_per_post(client, db):
+    post_id = db.add_post({'message_id': 'conflict_tr_5', 'channel_name': 'conflict_tr', 'original_text': 'rejected',
+                           'media_type': 'photo', 'media_ref': '{"channel": "conflict_tr", "message_ids": [5]}'})
+    first = client.post(f'/api/posts/{post_id}/media')
+    assert first.status_code == 202
+    assert client.post(f'/api/posts/{post_id}/media').get_json()['job_id'] == first.get_json()['job_id']
+    assert [job['post_id'] for job in client.get('/api/media-jobs').get_json()['jobs']] == [post_id]
+
+def test_media_fetch_needs_a_reference(client, db):
+    post_id = db.add_post({'message_id': 'conflict_tr_6', 'channel_name': 'conflict_tr', 'original_text': 'text only'})
+    assert client.post(f'/api/posts/{post_id}/media').status_code == 400
+    assert client.post('/api/posts/999/media').status_code == 404
+
+@pytest.fixture
+def store(db, tmp_path, monkeypatch):
+    # The store and send_file both resolve relative paths, like the server does from the repository root
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api_server.app, 'root_path', str(tmp_path))
+    return MediaStore(db)
+
+def image(path, size, color='red'):
+    Image.new('RGB', size, color).save(path)
+    return str(path)
+
+def test_stored_media_is_served_with_range_and_a_strong_etag(client, store, tmp_path):
+    path = store.put(image(tmp_path / 'photo.png', (1200, 800)))
+    entry = store.db.get_media_file(path)
+    response = client.get(f'/api/{path}')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{entry["hash"]}"'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    partial = client.get(f'/api/{path}', headers={'Range': 'bytes=0-7'})
+    assert partial.status_code == 206
+    assert partial.data == response.data[:8]
+    assert client.get(f'/api/{path}', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_a_width_picks_the_smallest_thumbnail_wide_enough(client, store, tmp_path):
+    path = store.put(image(tmp_path / 'photo.png', (1200, 800)))
+    response = client.get(f'/api/{path}?w=400')
+    assert response.headers['ETag'].endswith('-w480"')
+    assert Image.open(io.BytesIO(response.data)).size == (480, 320)
+    # Wider than every thumbnail: the original photo
+    assert client.get(f'/api/{path}?w=2000').data == client.get(f'/api/{path}').data
+
+def test_videos_asked_for_a_width_get_their_poster(client, store, tmp_path):
+    clip = tmp_path / 'clip.mp4'
+    clip.write_bytes(b'video')
+    path = store.put(str(clip), image(tmp_path / 'poster.jpg', (320, 180)))
+    response = client.get(f'/api/{path}?w=2000')
+    assert response.headers['ETag'].endswith('-w160"')
+    assert Image.open(io.BytesIO(response.data)).format == 'JPEG'
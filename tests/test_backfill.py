@@ -0,0 +1,125 @@
+import asyncio
+from collections import defaultdict
+import pytest
+from telethon.tl.types import InputPeerChannel
+import backfill
+import ingest
+from peer_cache import PeerCache
+
+CHANNELS = {'channel_0': {'priority': 1, 'allowed_senders': []}}
+
+class Message:
+    def __init__(self, message_id, grouped_id=None):
+        self.id = message_id
+        self.text = f"message {message_id}"
+        self.grouped_id = grouped_id
+
+class FakeHistoryClient:
+    """Serves pages the way iter_messages does with offset_id and reverse=True"""
+
+    def __init__(self, ids, albums=None):
+        albums = albums or {}
+        self.messages = [Message(message_id, albums.get(message_id)) for message_id in ids]
+        self.offsets = []
+
+    async def get_input_entity(self, username):
+        return InputPeerChannel(1000, 1)
+
+    async def iter_messages(self, channel, limit=None, reverse=False, offset_id=0, offset_date=None):
+        assert reverse
+        self.offsets.append(offset_id)
+        for message in [message for message in self.messages if message.id > offset_id][:limit]:
+            yield message
+
+class FakePipeline:
+    """Records the fed message ids and reports the ones in `fail` as failed"""
+    fail = set()
+    fed = []
+    albums = []
+
+    def __init__(self, client, sent_hashes):
+        self.failed = defaultdict(set)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    @staticmethod
+    def make_job(channel, info, message, album=None, **kwargs):
+        return channel, message.id, album
+
+    async def put(self, job):
+        channel, message_id, album = job
+        self.fed.append(message_id)
+        if album:
+            self.albums.append([member.id for member in album])
+        if message_id in self.fail:
+            self.failed[channel].add(message_id)
+
+    async def join(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch, db):
+    monkeypatch.setattr(backfill, 'db', db)
+    monkeypatch.setattr(backfill, 'peers', PeerCache(db))
+    monkeypatch.setattr(backfill, 'CHANNELS', CHANNELS)
+    monkeypatch.setattr(backfill, 'IngestPipeline', FakePipeline)
+    monkeypatch.setattr(backfill, 'BACKFILL_PAGE_SIZE', 5)
+    monkeypatch.setattr(ingest, 'BACKFILL_PAGE_SIZE', 5)
+    monkeypatch.setattr(backfill, 'BACKFILL_PAGE_DELAY', 0)
+    monkeypatch.setattr(backfill, 'get_sent_hashes', set)
+    FakePipeline.fail = set()
+    FakePipeline.fed = []
+    FakePipeline.albums = []
+
+def test_job_pages_through_history_and_skips_stored_messages(db):
+    db.add_post({'message_id': 'channel_0_4', 'channel_name': 'channel_0', 'original_text': 'stored'})
+    job_id = db.create_backfill_job('channel_0', start_message_id=2)
+    client = FakeHistoryClient(range(1, 15))
+
+    assert asyncio.run(backfill.run_pending_backfills(client)) == 1
+
+    job = db.get_backfill_jobs()[0]
+    assert job['id'] == job_id
+    assert FakePipeline.fed == [3] + list(range(5, 15))
+    assert client.offsets == [2, 7, 12]
+    assert (job['status'], job['last_message_id'], job['processed'], job['skipped']) == ('done', 14, 11, 1)
+
+def test_resume_point_stays_below_failed_messages(db):
+    FakePipeline.fail = {6, 9}
+    db.create_backfill_job('channel_0', start_message_id=0)
+    client = FakeHistoryClient(range(1, 13))
+    asyncio.run(backfill.run_pending_backfills(client))
+
+    job = db.get_backfill_jobs()[0]
+    assert (job['status'], job['last_message_id'], job['failed']) == ('failed', 5, 2)
+    # Failed jobs are left alone by the worker until --resume queues them again
+    assert asyncio.run(backfill.run_pending_backfills(client)) == 0
+
+    FakePipeline.fail = set()
+    FakePipeline.fed = []
+    FakePipeline.albums = []
+    db.update_backfill_job(job['id'], status='queued', error=None)
+    asyncio.run(backfill.run_pending_backfills(client))
+    job = db.get_backfill_jobs()[0]
+    assert FakePipeline.fed == list(range(6, 13))
+    assert (job['status'], job['last_message_id'], job['failed']) == ('done', 12, 0)
+
+def test_unknown_channel_fails_the_job(db):
+    db.create_backfill_job('elsewhere', start_message_id=1)
+    asyncio.run(backfill.run_pending_backfills(FakeHistoryClient([])))
+    job = db.get_backfill_jobs()[0]
+    assert (job['status'], job['error']) == ('failed', 'Unknown channel')
+
+def test_album_split_across_pages_is_published_once(db):
+    db.create_backfill_job('channel_0', start_message_id=0)
+    # A full page ends in the middle of the 4..6 album
+    client = FakeHistoryClient(range(1, 9), albums={4: 77, 5: 77, 6: 77})
+    asyncio.run(backfill.run_pending_backfills(client))
+    assert FakePipeline.albums == [[4, 5, 6]]
+    assert FakePipeline.fed == [1, 2, 3, 4, 7, 8]
+    assert client.offsets == [0, 5]
+    assert db.get_backfill_jobs()[0]['last_message_id'] == 8
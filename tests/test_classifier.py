@@ -0,0 +1,53 @@
+import os
+import time
+import numpy as np
+import pytest
+import bot
+from classifier import PreClassifier
+
+GEOPOLITICAL = ["the minister announced new sanctions on the border", "military talks between the two governments",
+                "the president met the foreign minister at the summit", "troops moved to the border after the strike"]
+OTHER = ["win a free phone today click the link", "best pizza recipe with extra cheese",
+         "football match tonight with free tickets", "discount on shoes click the link today"]
+
+def trained(threshold=0.9):
+    texts = GEOPOLITICAL * 5 + OTHER * 5
+    labels = ['geopolitical'] * 20 + ['non_geopolitical'] * 20
+    model = PreClassifier.train(texts, labels, n_features=2 ** 12)
+    model.threshold = threshold
+    return model
+
+def test_the_model_separates_the_training_classes():
+    model = trained()
+    probabilities = model.predict_proba(["sanctions announced by the minister", "free pizza click the link"])
+    assert probabilities[0] > 0.9 > 0.1 > probabilities[1]
+    assert model.is_irrelevant("free pizza click the link")
+    assert not model.is_irrelevant("sanctions announced by the minister")
+
+def test_a_saved_model_loads_with_the_same_predictions(tmp_path):
+    model = trained()
+    path = str(tmp_path / 'model.npz')
+    model.save(path)
+    loaded = PreClassifier.load(path)
+    texts = GEOPOLITICAL + OTHER
+    np.testing.assert_allclose(loaded.predict_proba(texts), model.predict_proba(texts), rtol=1e-6)
+    assert PreClassifier.load(str(tmp_path / 'missing.npz')) is None
+
+def candidate(text):
+    return {'message_id': 'channel_0_1', 'channel': 'channel_0', 'cleaned': text}
+
+def test_translate_candidate_skips_gpt_for_local_rejections(tmp_path, monkeypatch):
+    path = str(tmp_path / 'model.npz')
+    monkeypatch.setattr(bot, 'PRECLASSIFIER_MODEL_FILE', path)
+    monkeypatch.setattr(bot, 'PRECLASSIFIER_ENABLED', True)
+    monkeypatch.setattr(bot, 'translate_batch', lambda texts: [(f"translated {text}", None) for text in texts])
+
+    # No model trained yet: every candidate goes to GPT
+    assert bot.translate_candidate(candidate("free pizza click the link"))[0] == "translated free pizza click the link"
+
+    trained().save(path)
+    os.utime(path, (time.time() + 1, time.time() + 1))
+    spam = candidate("free pizza click the link")
+    assert bot.translate_candidate(spam) == ("SKIP", None)
+    assert spam['prefiltered']
+    assert bot.translate_candidate(candidate("sanctions at the border"))[0] == "translated sanctions at the border"
@@ -0,0 +1,28 @@
+import pytest
+from PIL import Image
+from benchmark_color_filter import generate_images, legacy_is_image_red_or_black_heavy
+from utils import is_image_red_or_black_heavy, red_or_black_heavy_batch
+
+@pytest.fixture(scope='module')
+def images(tmp_path_factory):
+    return generate_images(str(tmp_path_factory.mktemp('images')), count=24)
+
+def test_same_decisions_as_the_getpixel_loop(images):
+    legacy = [legacy_is_image_red_or_black_heavy(path) for path in images]
+    assert [is_image_red_or_black_heavy(path) for path in images] == legacy
+    # The generated set has both outcomes, so the comparison means something
+    assert any(legacy) and not all(legacy)
+
+def test_batch_keeps_the_input_order(images):
+    expected = [is_image_red_or_black_heavy(path) for path in images]
+    assert red_or_black_heavy_batch(images, workers=2) == expected
+    assert red_or_black_heavy_batch([]) == []
+
+def test_png_and_unreadable_files(tmp_path):
+    red = tmp_path / 'red.png'
+    Image.new('RGB', (300, 200), (220, 10, 10)).save(red)
+    assert is_image_red_or_black_heavy(str(red))
+
+    broken = tmp_path / 'broken.jpg'
+    broken.write_bytes(b'not an image')
+    assert not is_image_red_or_black_heavy(str(broken))
@@ -0,0 +1,428 @@
+import asyncio
+import time
+from collections import defaultdict
+import pytest
+from telethon import utils as telethon_utils
+from telethon.tl.types import InputPeerChannel
+import ingest
+from media_index import MediaIndex
+from peer_cache import PeerCache
+
+CHANNELS = {f'channel_{i}': {'priority': 1, 'allowed_senders': []} for i in range(6)}
+
+@pytest.fixture(autouse=True)
+def channels(monkeypatch, db):
+    monkeypatch.setattr(ingest, 'CHANNELS', CHANNELS)
+    monkeypatch.setattr(ingest, 'db', db)
+    monkeypatch.setattr(ingest, 'peers', PeerCache(db))
+    monkeypatch.setattr(ingest, 'media_index', MediaIndex(db))
+    monkeypatch.setattr(ingest, 'media_store', InPlaceStore())
+
+class InPlaceStore:
+    """Leaves downloaded files where they are; the store itself is covered in test_media_store"""
+
+    def put(self, path, poster=None):
+        return path
+
+def input_channel(channel):
+    return InputPeerChannel(1000 + int(channel.rsplit('_', 1)[1]), 1)
+
+class ResolvingClient:
+    """Resolves channel_N usernames to fixed InputPeerChannels"""
+    resolves = 0
+
+    async def get_input_entity(self, username):
+        self.resolves += 1
+        return input_channel(username)
+
+class Media(str):
+    """A photo or video named like its file; the name doubles as the Telegram file id"""
+
+    @property
+    def id(self):
+        return str(self)
+
+class Message:
+    def __init__(self, message_id, text=None, video=None, photo=None, grouped_id=None):
+        self.id = message_id
+        self.text = f"message {message_id}" if text is None else text
+        self.sender_id = 42
+        self.sender = type('User', (), {'first_name': 'Reporter'})()
+        self.video = video and Media(video)
+        self.photo = photo and Media(photo)
+        self.grouped_id = grouped_id
+
+class FakeHistoryClient(ResolvingClient):
+    """Serves a channel history the way iter_messages does for limit and offset_id/reverse"""
+
+    def __init__(self, ids):
+        self.messages = [Message(message_id) for message_id in ids]
+        self.requests = []
+
+    async def iter_messages(self, channel, limit=None, offset_id=0, reverse=False):
+        self.requests.append({'limit': limit, 'offset_id': offset_id, 'reverse': reverse})
+        if reverse:
+            messages = [message for message in self.messages if message.id > offset_id]
+        else:
+            messages = [message for message in self.messages[::-1] if not offset_id or message.id < offset_id]
+        for message in messages[:limit]:
+            yield message
+
+class FakePipeline:
+    """Stands in for IngestPipeline: records jobs and fails or posts the given message ids"""
+
+    def __init__(self, client=None, sent_hashes=None, fail=(), post=()):
+        self.sent_hashes = sent_hashes if sent_hashes is not None else set()
+        self.fail = set(fail)
+        self.post = set(post)
+        self.jobs = []
+        self.failed = defaultdict(set)
+        self.posted = 0
+        self.posted_by_channel = defaultdict(int)
+
+    async def put(self, job):
+        self.jobs.append((job['channel'], job['telegram_id']))
+        if job['telegram_id'] in self.fail:
+            self.failed[job['channel']].add(job['telegram_id'])
+        elif job['telegram_id'] in self.post:
+            self.posted += 1
+            self.posted_by_channel[job['channel']] += 1
+
+    async def join(self):
+        pass
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+def test_channels_are_fetched_concurrently_up_to_the_limit(monkeypatch):
+    running = []
+    peak = []
+
+    async def fake_fetch(client, channel, cursor):
+        running.append(channel)
+        peak.append(len(running))
+        await asyncio.sleep(0.05)
+        running.remove(channel)
+        return []
+
+    monkeypatch.setattr(ingest, 'fetch_new_messages', fake_fetch)
+    started = time.monotonic()
+    asyncio.run(ingest.run_cycle(None, set(), FakePipeline(), max_concurrency=3))
+    elapsed = time.monotonic() - started
+
+    assert max(peak) == 3
+    # Two rounds of three channels, not six channels one after another
+    assert elapsed < 0.05 * 4
+
+def test_a_slow_or_failing_channel_does_not_hold_up_the_others(monkeypatch):
+    monkeypatch.setattr(ingest, 'CHANNEL_TIMEOUT', 0.05)
+
+    async def fake_fetch(client, channel, cursor):
+        if channel == 'channel_0':
+            await asyncio.sleep(10)
+        if channel == 'channel_1':
+            raise RuntimeError('boom')
+        return [Message(1)]
+
+    monkeypatch.setattr(ingest, 'fetch_new_messages', fake_fetch)
+    started = time.monotonic()
+    assert asyncio.run(ingest.run_cycle(None, set(), FakePipeline(post={1}))) == len(CHANNELS) - 2
+    assert time.monotonic() - started < 1
+
+class FakeScheduler:
+    def __init__(self):
+        self.polls = []
+
+    def record(self, channel, fetched, posted):
+        self.polls.append((channel, fetched, posted))
+
+def run_channel(client, pipeline, scheduler=None):
+    """One cycle over channel_0 only"""
+    channels = {'channel_0': CHANNELS['channel_0']}
+    return asyncio.run(ingest.run_cycle(client, set(), pipeline, channels=channels, scheduler=scheduler))
+
+def test_first_poll_reads_the_newest_messages_and_sets_the_cursor(db):
+    pipeline = FakePipeline()
+    run_channel(FakeHistoryClient(range(1, 21)), pipeline)
+    newest = list(range(21 - ingest.MESSAGE_LIMIT, 21))
+    assert [message_id for _, message_id in pipeline.jobs] == newest
+    assert db.get_channel_cursor('channel_0') == 20
+
+def test_delta_above_the_cursor_is_read_oldest_first(db):
+    db.update_channel_cursor('channel_0', 3)
+    db.add_post({'message_id': 'channel_0_5', 'channel_name': 'channel_0', 'original_text': 'stored'})
+    client = FakeHistoryClient(range(1, 8))
+    pipeline = FakePipeline()
+    run_channel(client, pipeline)
+    assert client.requests == [{'limit': ingest.BACKFILL_PAGE_SIZE, 'offset_id': 3, 'reverse': True}]
+    # Already stored messages are skipped by the bulk lookup but still move the cursor
+    assert [message_id for _, message_id in pipeline.jobs] == [4, 6, 7]
+    assert db.get_channel_cursor('channel_0') == 7
+
+    run_channel(client, FakePipeline())
+    assert client.requests[-1] == {'limit': ingest.BACKFILL_PAGE_SIZE, 'offset_id': 7, 'reverse': True}
+    # The channel is resolved once and then served from the peer cache
+    assert client.resolves == 1
+
+def test_a_long_delta_is_read_one_page_per_request(db, monkeypatch):
+    monkeypatch.setattr(ingest, 'BACKFILL_PAGE_SIZE', 4)
+    db.update_channel_cursor('channel_0', 2)
+    client = FakeHistoryClient(range(1, 13))
+    pipeline = FakePipeline()
+    run_channel(client, pipeline)
+    assert [request['offset_id'] for request in client.requests] == [2, 6, 10]
+    assert [message_id for _, message_id in pipeline.jobs] == list(range(3, 13))
+
+def test_the_whole_backlog_is_fed_and_the_cursor_stays_below_failures(db):
+    db.update_channel_cursor('channel_0', 6)
+    pipeline = FakePipeline(fail={9, 12}, post={7, 8})
+    scheduler = FakeScheduler()
+    assert run_channel(FakeHistoryClient(range(1, 15)), pipeline, scheduler) == 2
+    assert scheduler.polls == [('channel_0', 8, 2)]
+    assert [message_id for _, message_id in pipeline.jobs] == list(range(7, 15))
+    assert db.get_channel_cursor('channel_0') == 8
+    # The cursor never moves backwards
+    db.update_channel_cursor('channel_0', 2)
+    assert db.get_channel_cursor('channel_0') == 8
+
+class FakeMediaClient(ResolvingClient):
+    async def download_media(self, media, file=None, thumb=None):
+        return f"{file}{media}.mp4"
+
+def test_ingest_pipeline_runs_the_stages_in_order(monkeypatch):
+    messages = [Message(1, 'first', video='clip'), Message(2, 'spam'), Message(3, 'rejected')]
+    ids = {message.text: message.id for message in messages}
+    calls = []
+    media = []
+
+    def fake_screen(channel, info, message, sender_name, sent_hashes, min_age, check_db):
+        calls.append(('screen', message.id))
+        if message.text == 'spam':
+            return None
+        return {'message_id': f"{channel}_{message.id}", 'cleaned': message.text, 'content_hash': f"hash{message.id}"}
+
+    def fake_translate(candidates):
+        calls.extend(('translate', ids[candidate['cleaned']]) for candidate in candidates)
+        return [(candidate['cleaned'].upper(), None) for candidate in candidates]
+
+    def fake_store(channel, info, candidate, translated, media_type, media_path, is_video, media_items,
+                   media_ref):
+        calls.append(('store', ids[candidate['cleaned']]))
+        media.append((media_type, media_path, is_video))
+        return translated != 'REJECTED'
+
+    monkeypatch.setattr(ingest, 'screen_message', fake_screen)
+    monkeypatch.setattr(ingest, 'translate_candidates', fake_translate)
+    monkeypatch.setattr(ingest, 'store_candidate', fake_store)
+
+    async def run():
+        async with ingest.IngestPipeline(FakeMediaClient(), set()) as pipeline:
+            for message in messages:
+                await pipeline.put(ingest.IngestPipeline.make_job('channel_0', CHANNELS['channel_0'], message))
+            await pipeline.join()
+        return pipeline
+
+    pipeline = asyncio.run(run())
+    assert pipeline.posted == 1
+    assert pipeline.sent_hashes == {'hash1', 'hash3'}
+    assert [step for step, message_id in calls if message_id == 1] == ['screen', 'translate', 'store']
+    assert [step for step, message_id in calls if message_id == 2] == ['screen']
+    assert [step for step, message_id in calls if message_id == 3] == ['screen', 'translate', 'store']
+    assert sorted(media, key=str) == [('video', 'media/clip.mp4', True), (None, None, False)]
+
+def test_albums_are_grouped_under_their_captioned_member():
+    messages = [Message(1), Message(2, '', grouped_id=9), Message(3, 'caption', grouped_id=9),
+                Message(4, grouped_id=5), Message(5)]
+    entries = ingest.group_albums(messages)
+    assert [(message.id, album and [member.id for member in album]) for message, album in entries] == \
+        [(1, None), (3, [2, 3]), (4, [4]), (5, None)]
+
+class AlbumMediaClient(ResolvingClient):
+    async def download_media(self, media, file=None, thumb=None):
+        if media == 'missing':
+            raise OSError(media)
+        return f"{file}{media}"
+
+def test_album_members_are_downloaded_into_one_job():
+    pipeline = ingest.IngestPipeline(AlbumMediaClient(), set())
+    album = [Message(1, '', photo='a.jpg', grouped_id=9), Message(2, 'caption', video='b.mp4', grouped_id=9),
+             Message(3, '', photo='missing', grouped_id=9)]
+    job = asyncio.run(pipeline.fetch_media(ingest.IngestPipeline.make_job('channel_0', {}, album[1], album)))
+    # The video has no thumbnail to filter on, so it is only fetched by the download stage
+    assert job['media_items'] == [('media/a.jpg', False), (None, True)]
+    job['translated'] = "accepted"
+    job = asyncio.run(pipeline.download_full(job))
+    assert job['media_items'] == [('media/a.jpg', False), ('media/b.mp4', True)]
+    assert (job['media_type'], job['media_path'], job['is_video']) == ('album', 'media/a.jpg', False)
+
+def test_known_media_is_linked_instead_of_downloaded(tmp_path):
+    class CountingClient(ResolvingClient):
+        downloads = 0
+
+        async def download_media(self, media, file=None, thumb=None):
+            self.downloads += 1
+            path = tmp_path / media
+            path.write_bytes(b'jpeg')
+            return str(path)
+
+    client = CountingClient()
+    pipeline = ingest.IngestPipeline(client, set())
+    first = asyncio.run(pipeline.fetch_media(ingest.IngestPipeline.make_job('channel_0', {}, Message(1, photo='a.jpg'))))
+    ingest.media_index.add(first['media_refs'][0]['key'], None, 'photo', first['media_path'], None, 'channel_0_1')
+
+    forward = asyncio.run(pipeline.fetch_media(ingest.IngestPipeline.make_job('channel_1', {}, Message(7, photo='a.jpg'))))
+    assert client.downloads == 1
+    assert forward['media_path'] == first['media_path']
+    assert forward['media_refs'][0]['duplicate_of'] == 'channel_0_1'
+
+class FakeEventClient(ResolvingClient):
+    """Records the event handlers and replays events, then disconnects once"""
+
+    def __init__(self, events):
+        self.events = events
+        self.handlers = {}
+        self.connects = 0
+        self.sessions = 0
+
+    def on(self, builder):
+        def register(handler):
+            self.handlers[type(builder).__name__] = handler
+            return handler
+        return register
+
+    async def run_until_disconnected(self):
+        self.sessions += 1
+        if self.sessions > 1:
+            raise asyncio.CancelledError
+        for event in self.events:
+            await self.handlers[type(event).__name__.replace('Fake', '')](event)
+
+    async def connect(self):
+        self.connects += 1
+
+class FakeNewMessage:
+    def __init__(self, channel, message_id, grouped_id=None):
+        self.chat_id = telethon_utils.get_peer_id(input_channel(channel))
+        self.message = Message(message_id, grouped_id=grouped_id)
+
+class FakeAlbum(FakeNewMessage):
+    def __init__(self, channel, message_ids):
+        super().__init__(channel, message_ids[0])
+        self.messages = [Message(message_id, '' if message_id != message_ids[-1] else 'caption', grouped_id=1)
+                         for message_id in message_ids]
+
+class FakeIngestPipeline(FakePipeline):
+    make_job = staticmethod(ingest.IngestPipeline.make_job)
+    instances = []
+
+    def __init__(self, client, sent_hashes):
+        super().__init__(client, sent_hashes)
+        self.instances.append(self)
+
+def test_events_are_queued_and_swept_after_reconnect(monkeypatch):
+    sweeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sweep(client, pipeline):
+        sweeps.append(client.connects)
+
+    async def short_sleep(seconds):
+        await real_sleep(0)
+
+    monkeypatch.setattr(ingest, 'IngestPipeline', FakeIngestPipeline)
+    monkeypatch.setattr(ingest, 'catch_up_sweep', fake_sweep)
+    monkeypatch.setattr(ingest, 'get_sent_hashes', set)
+    monkeypatch.setattr(ingest, 'EVENT_SWEEP_INTERVAL', 3600)
+    monkeypatch.setattr(ingest.asyncio, 'sleep', short_sleep)
+    client = FakeEventClient([FakeNewMessage('channel_2', 7), FakeNewMessage('channel_99', 8),
+                              FakeNewMessage('channel_3', 10, grouped_id=1), FakeAlbum('channel_3', [10, 11])])
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(ingest.run_events(client))
+
+    # Album members arrive as NewMessage events too, but are queued once through the Album event
+    assert FakeIngestPipeline.instances[-1].jobs == [('channel_2', 7), ('channel_3', 11)]
+    # Once at startup and once after reconnecting
+    assert sweeps == [0, 1]
+
+class FakeSyncClient(ResolvingClient):
+    """telethon.sync style client: async calls driven on its own loop"""
+
+    def __init__(self, messages):
+        self.loop = asyncio.new_event_loop()
+        self.messages = messages
+        self.entities = []
+
+    async def iter_messages(self, entity, limit=None):
+        self.entities.append(entity)
+        for message in self.messages[::-1][:limit]:
+            yield message
+
+@pytest.fixture
+def sync_stages(monkeypatch):
+    """Screens every message, translates via `translations` and records the stored posts"""
+    stored = []
+    translations = {}
+    monkeypatch.setattr(ingest, 'MESSAGE_LIMIT', 4)
+    monkeypatch.setattr(ingest.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(ingest, 'screen_message', lambda channel, info, message, sender_name, sent_hashes: (
+        {'id': message.id, 'sender': sender_name}))
+    monkeypatch.setattr(ingest, 'translate_candidate', lambda candidate: (translations.get(candidate['id'], "SKIP"), None))
+
+    def store(channel, info, candidate, translated, media_type, media_path, is_video, media_ref=None):
+        stored.append((candidate['id'], translated, media_type, media_path, media_ref))
+        return translated != "SKIP"
+
+    monkeypatch.setattr(ingest, 'store_candidate', store)
+    return stored, translations
+
+def test_sync_mode_resolves_through_the_cache_and_stops_at_the_first_post(sync_stages):
+    stored, translations = sync_stages
+    translations[5] = "accepted"
+
+    anonymous = Message(6)
+    anonymous.sender_id = None
+    client = FakeSyncClient([Message(3), Message(4), Message(5), anonymous])
+    try:
+        assert ingest.process_channel(client, 'channel_0', CHANNELS['channel_0'], set())
+        assert ingest.process_channel(client, 'channel_0', CHANNELS['channel_0'], set())
+    finally:
+        client.loop.close()
+    assert client.entities == [input_channel('channel_0')] * 2
+    assert client.resolves == 1
+    assert [post[:2] for post in stored] == [(5, "accepted")] * 2
+
+def test_sync_mode_filters_photos_before_gpt_and_defers_rejected_media(sync_stages, tmp_path, monkeypatch):
+    stored, translations = sync_stages
+    monkeypatch.setattr(ingest, 'is_image_red_or_black_heavy', lambda path, threshold: path.endswith('red.jpg'))
+    downloads = []
+
+    class DownloadingClient(FakeSyncClient):
+        async def download_media(self, media, file=None, thumb=None):
+            downloads.append(str(media))
+            path = tmp_path / str(media)
+            path.write_bytes(b'jpeg')
+            return str(path)
+
+    translations[2] = "accepted"
+    client = DownloadingClient([Message(1, video='clip.mp4'), Message(2, photo='ok.jpg'), Message(3, photo='red.jpg')])
+    try:
+        assert ingest.process_channel(client, 'channel_0', CHANNELS['channel_0'], set())
+    finally:
+        client.loop.close()
+    # Newest first: the red photo never reaches GPT, the rejected video is not downloaded
+    assert [post[0] for post in stored] == [2]
+    assert stored[0][2:] == ('photo', str(tmp_path / 'ok.jpg'), '{"channel": "channel_0", "message_ids": [2]}')
+    assert downloads == ['red.jpg', 'ok.jpg']
+    assert not (tmp_path / 'red.jpg').exists()
+
+    client = DownloadingClient([Message(1, video='clip.mp4')])
+    try:
+        assert not ingest.process_channel(client, 'channel_0', CHANNELS['channel_0'], set())
+    finally:
+        client.loop.close()
+    assert stored[-1] == (1, "SKIP", 'video', None, '{"channel": "channel_0", "message_ids": [1]}')
+    assert downloads == ['red.jpg', 'ok.jpg']
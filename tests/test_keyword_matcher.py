@@ -0,0 +1,79 @@
+import random
+import re
+import pytest
+from keyword_matcher import KeywordMatcher
+import scoring
+from config import BIAS_KEYWORDS, BLOCKED_EMOJIS, BLOCKED_KEYWORDS
+
+def per_term_match(categories, text):
+    """One scan per term, as the matcher replaced, with the same anchoring per mode"""
+    text = text.lower()
+    hits = {}
+    for name, (terms, mode) in categories.items():
+        found = set()
+        for term in terms:
+            term = term.lower()
+            before = r'(?<!\w)' if mode != 'substring' and re.match(r'\w', term) else ''
+            after = r'(?!\w)' if mode == 'word' and re.search(r'\w$', term) else ''
+            if re.search(before + re.escape(term) + after, text):
+                found.add(term)
+        hits[name] = found
+    return hits
+
+def test_word_mode_needs_whole_words():
+    matcher = KeywordMatcher({'country': (['un', 'uk', 'eu'], 'word')})
+    assert matcher.match("Until the UN meets in Brussels")['country'] == {'un'}
+    assert matcher.match("ukraine, europe")['country'] == set()
+
+def test_prefix_mode_allows_suffixes_only():
+    matcher = KeywordMatcher({'promo': (['reklam'], 'prefix')})
+    assert matcher.match("Reklamı kaçırmayın")['promo'] == {'reklam'}
+    assert matcher.match("bir antireklam")['promo'] == set()
+
+def test_substring_mode_matches_anywhere():
+    matcher = KeywordMatcher({'emoji': (['🔥', 'xx'], 'substring')})
+    assert matcher.match("a🔥b and abxxc")['emoji'] == {'🔥', 'xx'}
+
+def test_overlapping_terms_are_each_found():
+    categories = {
+        'bias': (['puppet government', 'government'], 'word'),
+        'geo': (['government', 'war', 'wars'], 'word'),
+        'prefix': (['war', 'warship'], 'prefix'),
+        'sub': (['ab', 'abc', 'b'], 'substring'),
+    }
+    text = "The puppet government sent warships to the wars. abc"
+    assert KeywordMatcher(categories).match(text) == per_term_match(categories, text)
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        KeywordMatcher({'x': (['a'], 'fuzzy')})
+
+def test_random_texts_agree_with_per_term_scans():
+    rng = random.Random(7)
+    alphabet = ['war', 'wars', 'un', 'until', 'ab', 'abc', 'gov', 'government', ' ', ' ', '-', 'ş', '🔥', 'x']
+    pool = ['war', 'wars', 'un', 'abc', 'ab', 'gov', 'government', 'şx', '🔥', 'x war', 'un ab']
+    for _ in range(200):
+        categories = {f"c{index}": (rng.sample(pool, rng.randint(1, 5)), mode)
+                      for index, mode in enumerate(rng.choices(('word', 'prefix', 'substring'), k=3))}
+        text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert KeywordMatcher(categories).match(text) == per_term_match(categories, text), (categories, text)
+
+def test_scoring_lists_agree_with_per_term_scans():
+    categories = {
+        'breaking': (scoring.BREAKING_TERMS, 'word'),
+        'official': (scoring.OFFICIAL_TERMS, 'word'),
+        'geo': (scoring.GEO_TERMS, 'word'),
+        'country': (scoring.COUNTRY_TERMS, 'word'),
+        'promo': (scoring.PROMO_TERMS, 'word'),
+        'bias': (scoring.BIAS_TERMS + BIAS_KEYWORDS, 'word'),
+        'blocked': (BLOCKED_KEYWORDS, 'prefix'),
+        'blocked_emoji': (BLOCKED_EMOJIS, 'substring'),
+    }
+    texts = [
+        "BREAKING: Official statement confirmed by the government of Ukraine on the border crisis",
+        "Subscribe to our channel! The puppet regime and NATO/EU talks at the UN summit until Sunday",
+        "Warships, wars and peace-talks: the president declares a ceasefire in Syria",
+        "",
+    ]
+    for text in texts + [' '.join(BLOCKED_KEYWORDS + BLOCKED_EMOJIS)]:
+        assert scoring.keyword_matcher.match(text) == per_term_match(categories, text), text
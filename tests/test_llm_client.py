@@ -0,0 +1,153 @@
+import openai
+try:
+    import httpx
+except ImportError:  # openai releases built on the httpx2 fork
+    import httpx2 as httpx
+import pytest
+from types import SimpleNamespace
+import llm_client
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailable, retry_after
+
+REQUEST = httpx.Request('POST', 'http://llm.test/v1/chat/completions')
+
+def server_error():
+    return openai.InternalServerError('boom', response=httpx.Response(503, request=REQUEST), body=None)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_client.time, 'monotonic', clock.monotonic)
+    return clock
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(threshold=3, cooldown=30)
+    for _ in range(2):
+        assert breaker.allow() == (True, False)
+        breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.allow() == (False, False)
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(threshold=2, cooldown=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 29
+    assert breaker.allow() == (False, False)
+    clock.now += 1
+    assert breaker.state == 'half_open'
+    assert breaker.allow() == (True, True)
+    assert breaker.allow() == (False, False)
+
+def test_trial_success_closes_the_circuit(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow() == (True, True)
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow() == (True, False)
+
+def test_trial_failure_reopens_for_a_full_cooldown(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure(trial=True)
+    assert breaker.state == 'open'
+    clock.now += 29
+    assert breaker.state == 'open'
+    clock.now += 1
+    assert breaker.allow() == (True, True)
+
+def test_other_failures_keep_the_trial_slot(clock):
+    breaker = CircuitBreaker(threshold=1, cooldown=30)
+    breaker.record_failure()
+    clock.now += 30
+    breaker.allow()
+    breaker.record_failure()  # A request let through before the circuit opened
+    assert breaker.allow() == (False, False)
+
+def test_retry_after_header():
+    error = openai.RateLimitError('slow down', response=httpx.Response(
+        429, headers={'retry-after': '2.5'}, request=REQUEST), body=None)
+    assert retry_after(error) == 2.5
+    assert retry_after(server_error()) is None
+
+class FakeCompletions:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def create(self, **request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else 'ok'
+        if outcome != 'ok':
+            raise outcome()
+        return SimpleNamespace(choices=[], usage=None)
+
+def make_client(outcomes, monkeypatch, max_retries=3, threshold=2):
+    monkeypatch.setattr(llm_client, 'LLM_BACKOFF_BASE', 0)
+    client = LLMClient(max_retries=max_retries, breaker=CircuitBreaker(threshold=threshold, cooldown=60))
+    completions = FakeCompletions(outcomes)
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return client, completions
+
+def test_retries_transient_errors(monkeypatch):
+    client, completions = make_client([server_error, server_error], monkeypatch)
+    assert client.complete(model='m', messages=[]) is not None
+    assert completions.calls == 3
+    assert client.stats['retries'] == 2
+    assert client.breaker.state == 'closed'
+
+def test_exhausted_retries_open_the_circuit(monkeypatch):
+    client, completions = make_client([server_error] * 10, monkeypatch, max_retries=1, threshold=2)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            client.complete(model='m', messages=[])
+    assert client.breaker.state == 'open'
+    calls = completions.calls
+    with pytest.raises(LLMUnavailable):
+        client.complete(model='m', messages=[])
+    assert completions.calls == calls
+    assert client.stats['rejected_open'] == 1
+
+def test_bad_requests_are_raised_without_retrying(monkeypatch):
+    bad_request = lambda: openai.BadRequestError('too long', response=httpx.Response(400, request=REQUEST), body=None)
+    client, completions = make_client([bad_request], monkeypatch)
+    with pytest.raises(openai.BadRequestError):
+        client.complete(model='m', messages=[])
+    assert completions.calls == 1
+
+def test_failed_trial_gives_up_without_retrying(monkeypatch):
+    client, completions = make_client([server_error] * 10, monkeypatch, max_retries=3, threshold=1)
+    client.breaker.opened_at = llm_client.time.monotonic() - 60
+    with pytest.raises(LLMUnavailable):
+        client.complete(model='m', messages=[])
+    assert completions.calls == 1
+    assert client.breaker.state == 'open'
+
+def test_only_the_trial_request_stops_early(monkeypatch):
+    def outage_with_trial_elsewhere():
+        # While this request waits to retry, the circuit opens, cools down and another request takes the trial
+        client.breaker.opened_at = llm_client.time.monotonic() - 60
+        client.breaker.trial = True
+        return server_error()
+
+    client, completions = make_client([outage_with_trial_elsewhere], monkeypatch, max_retries=3)
+    assert client.complete(model='m', messages=[]) is not None
+    assert completions.calls == 2
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import pytest
+import bot
+import llm_retry
+
+@pytest.fixture
+def queue(db, monkeypatch):
+    """Parks through bot.store_candidate and records what the retries store"""
+    stored = []
+    answers = {}
+    monkeypatch.setattr(bot, 'db', db)
+    monkeypatch.setattr(llm_retry, 'db', db)
+    monkeypatch.setattr(llm_retry, 'translate_candidates',
+                        lambda candidates: [(answers.get(candidate['message_id']), None) for candidate in candidates])
+
+    def store(channel, info, candidate, translated, media_type, media_path, is_video, media_items, media_ref):
+        stored.append((candidate['message_id'], translated, media_ref))
+
+    monkeypatch.setattr(llm_retry, 'store_candidate', store)
+    return db, answers, stored
+
+def park(message_id, media_ref=None):
+    candidate = {'message_id': message_id, 'cleaned': "haber", 'content_hash': f"hash_{message_id}"}
+    assert bot.store_candidate('channel_0', {}, candidate, None, 'photo', media_ref=media_ref) is False
+
+def make_due(db):
+    for job in db.get_llm_retries(['queued']):
+        db.update_llm_retry(job['id'], 'queued', next_attempt_at=0, error=job['error'])
+
+def test_unreachable_gpt_parks_the_message_once(queue):
+    db, _, _ = queue
+    park('channel_0_1')
+    park('channel_0_1')
+    jobs = db.get_llm_retries()
+    assert [(job['message_id'], job['status'], job['attempts']) for job in jobs] == [('channel_0_1', 'queued', 0)]
+    assert json.loads(jobs[0]['candidate'])['cleaned'] == "haber"
+    assert db.get_posts() == []
+
+def test_retries_back_off_then_store_the_answer(queue):
+    db, answers, stored = queue
+    park('channel_0_1')
+    make_due(db)
+    assert asyncio.run(llm_retry.run_due_retries(None)) == 1
+    job = db.get_llm_retries()[0]
+    assert (job['status'], job['attempts']) == ('queued', 1)
+    # Not due again until its delay has passed
+    assert asyncio.run(llm_retry.run_due_retries(None)) == 0
+
+    make_due(db)
+    answers['channel_0_1'] = "SKIP"
+    assert asyncio.run(llm_retry.run_due_retries(None)) == 1
+    assert stored == [('channel_0_1', "SKIP", None)]
+    assert db.get_llm_retries()[0]['status'] == 'done'
+
+def test_messages_out_of_attempts_fail_until_requeued(queue, monkeypatch):
+    db, _, _ = queue
+    monkeypatch.setattr(llm_retry, 'LLM_RETRY_MAX_ATTEMPTS', 1)
+    park('channel_0_1')
+    make_due(db)
+    asyncio.run(llm_retry.run_due_retries(None))
+    assert db.get_llm_retry_counts() == {'failed': 1}
+
+    assert db.requeue_failed_llm_retries(0) == 1
+    job = db.get_llm_retries()[0]
+    assert (job['status'], job['attempts']) == ('queued', 0)
+
+def test_nothing_is_retried_while_the_circuit_is_open(queue, monkeypatch):
+    db, answers, stored = queue
+    monkeypatch.setattr(llm_retry.llm, 'available', lambda: False)
+    park('channel_0_1')
+    make_due(db)
+    answers['channel_0_1'] = "accepted"
+    assert asyncio.run(llm_retry.run_due_retries(None)) == 0
+    assert stored == []
+
+def test_next_delay_doubles_up_to_the_cap():
+    delays = [llm_retry.next_delay(attempts) for attempts in range(1, 30)]
+    assert delays[0] == llm_retry.LLM_RETRY_DELAY
+    assert delays[1] == 2 * llm_retry.LLM_RETRY_DELAY
+    assert max(delays) == llm_retry.LLM_RETRY_DELAY_MAX
+
+def test_messages_over_budget_wait_for_the_reset_without_using_attempts(queue, monkeypatch):
+    db, _, stored = queue
+
+    def over_budget(candidates):
+        for candidate in candidates:
+            candidate['throttled'] = True
+        return [(None, None)] * len(candidates)
+
+    candidate = {'message_id': 'channel_0_1', 'cleaned': "haber", 'content_hash': "hash", 'throttled': True}
+    bot.store_candidate('channel_0', {}, candidate, None)
+    job = db.get_llm_retries()[0]
+    assert job['next_attempt_at'] == llm_retry.next_reset()
+
+    make_due(db)
+    monkeypatch.setattr(llm_retry, 'translate_candidates', over_budget)
+    asyncio.run(llm_retry.run_due_retries(None))
+    job = db.get_llm_retries()[0]
+    assert (job['status'], job['attempts'], job['error']) == ('queued', 0, 'Token budget')
+    assert job['next_attempt_at'] == llm_retry.next_reset() and stored == []
@@ -0,0 +1,57 @@
+import json
+import pytest
+import llm_client
+from llm_standin import StandIn, create_app
+
+def single(text, max_tokens=300):
+    return {'model': 'gpt-4o', 'max_tokens': max_tokens,
+            'messages': [{'role': 'system', 'content': 'prompt'}, {'role': 'user', 'content': text}]}
+
+def batch(posts):
+    return dict(single(json.dumps(posts), max_tokens=1000), response_format={'type': 'json_schema'})
+
+def outcomes(standin, bodies):
+    return [(status, body.get('choices', [{}])[0].get('message', {}).get('content'), delay)
+            for status, body, _, delay in map(standin.respond, bodies)]
+
+def test_the_same_seed_answers_the_same_however_requests_interleave():
+    bodies = [single(f"message {number} about the border talks") for number in range(40)]
+    first = outcomes(StandIn(seed=7), bodies)
+    reordered = outcomes(StandIn(seed=7), bodies[::-1])[::-1]
+    assert first == reordered
+    assert outcomes(StandIn(seed=8), bodies) != first
+    decisions = [content for status, content, _ in first if status == 200]
+    assert "SKIP" in decisions and any(content.startswith("🌍") for content in decisions)
+
+def test_a_retried_request_gets_a_fresh_error_roll():
+    standin = StandIn(error_rate=0.5, rate_limit_rate=0)
+    statuses = [standin.respond(single("the same message"))[0] for _ in range(20)]
+    assert set(statuses) == {200, 500}
+
+def test_rate_limits_carry_retry_after():
+    status, body, headers, _ = StandIn(rate_limit_rate=1).respond(single("text"))
+    assert (status, headers['Retry-After'], body['error']['code']) == (429, '1', 'rate_limit_exceeded')
+
+def test_batches_get_one_result_per_post():
+    status, body, _, _ = StandIn(error_rate=0, rate_limit_rate=0).respond(batch({'1': "first post", '2': "second"}))
+    results = json.loads(body['choices'][0]['message']['content'])['results']
+    assert status == 200 and [result['id'] for result in results] == ['1', '2']
+    assert body['usage']['total_tokens'] == body['usage']['prompt_tokens'] + body['usage']['completion_tokens']
+
+def test_answers_over_max_tokens_are_truncated():
+    standin = StandIn(error_rate=0, rate_limit_rate=0, skip_rate=0)
+    _, body, _, _ = standin.respond(single("word " * 200, max_tokens=10))
+    assert body['choices'][0]['finish_reason'] == 'length'
+    assert body['usage']['completion_tokens'] == 10
+    assert standin.stats['truncated'] == 1
+
+def test_the_app_serves_the_openai_route():
+    client = create_app(StandIn(latency=0, sigma=0, token_latency=0, error_rate=0, rate_limit_rate=0)).test_client()
+    response = client.post('/v1/chat/completions', json=single("text"))
+    assert response.status_code == 200 and response.get_json()['object'] == 'chat.completion'
+    assert client.get('/stats').get_json()['requests'] == 1
+
+def test_unknown_backends_are_rejected():
+    assert llm_client.LLMClient().backend == 'standin'
+    with pytest.raises(ValueError):
+        llm_client.LLMClient(backend='elsewhere')
@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+import pytest
+import llm_usage
+from llm_usage import UsageLedger, estimate_tokens, truncate_to_tokens, utc_day
+
+CHANNELS = {
+    'front': {'priority': 1},
+    'digest': {'priority': 3},
+    'capped': {'priority': 1, 'token_budget': 500},
+}
+SHARES = {1: 1.0, 2: 0.8, 3: 0.5}
+
+def usage(prompt, completion=0):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+@pytest.fixture
+def ledger(db, monkeypatch):
+    monkeypatch.setattr(llm_usage, 'CHANNELS', CHANNELS)
+    monkeypatch.setattr(llm_usage, 'LLM_PRIORITY_BUDGET_SHARE', SHARES)
+    monkeypatch.setattr(llm_usage, 'LLM_DAILY_TOKEN_BUDGET', 10_000)
+    monkeypatch.setattr(llm_usage, 'LLM_CHANNEL_TOKEN_BUDGET', 0)
+    return UsageLedger(db, flush_size=3, flush_interval=3600)
+
+def test_estimate_counts_non_ascii_as_shorter_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("a" * 400) == 101
+    assert estimate_tokens("ж" * 400) == 201
+
+def test_truncate_stays_within_the_limit():
+    text = ' '.join(['переговоры'] * 200)
+    cut = truncate_to_tokens(text, 100)
+    assert estimate_tokens(cut) <= 100
+    assert cut.endswith('…') and text.startswith(cut[:-1])
+    assert truncate_to_tokens("short text", 100) == "short text"
+
+def test_low_priority_channels_are_throttled_first(ledger):
+    ledger.record('front', 'front_1', usage(4_900))
+    assert ledger.allows('digest', 100)
+    assert not ledger.allows('digest', 101)
+    assert ledger.allows('front', 5_100)
+    assert not ledger.allows('front', 5_101)
+
+def test_channel_budget(ledger):
+    ledger.record('capped', 'capped_1', usage(300, 100))
+    assert ledger.allows('capped', 100)
+    assert not ledger.allows('capped', 101)
+    assert ledger.allows('front', 101)
+
+def test_no_budget_means_no_limit(ledger, monkeypatch):
+    monkeypatch.setattr(llm_usage, 'LLM_DAILY_TOKEN_BUDGET', 0)
+    ledger.record('digest', 'digest_1', usage(1_000_000))
+    assert ledger.allows('digest', 1_000_000)
+
+def test_rows_are_written_in_batches(ledger, db):
+    ledger.record('front', 'front_1', usage(10, 5))
+    ledger.record('front', 'front_2', usage(10, 5))
+    assert db.get_llm_usage_by_channel(utc_day()) == {}
+    ledger.record('digest', 'digest_1', usage(7))
+    assert db.get_llm_usage_by_channel(utc_day()) == {'front': 30, 'digest': 7}
+
+def test_spending_survives_a_restart(ledger, db):
+    ledger.record('front', 'front_1', usage(4_000, 1_000))
+    ledger.flush()
+    restarted = UsageLedger(db)
+    assert restarted.spent_today() == 5_000
+    assert not restarted.allows('digest', 1)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import pytest
+from telethon.tl.types import InputPeerChannel
+import media_fetch
+from media_index import MediaIndex, media_key
+from media_store import MediaStore
+from peer_cache import PeerCache
+
+class Media(str):
+    @property
+    def id(self):
+        return str(self)
+
+class Message:
+    def __init__(self, photo=None, video=None):
+        self.photo = photo and Media(photo)
+        self.video = video and Media(video)
+
+class FetchClient:
+    def __init__(self, folder, messages):
+        self.folder = folder
+        self.messages = messages
+        self.downloads = []
+
+    async def get_input_entity(self, username):
+        return InputPeerChannel(1000, 1)
+
+    async def get_messages(self, entity, ids):
+        return [self.messages.get(message_id) for message_id in ids]
+
+    async def download_media(self, media, file=None):
+        self.downloads.append(str(media))
+        path = self.folder / str(media)
+        path.write_bytes(b'data')
+        return str(path)
+
+@pytest.fixture
+def fetch_db(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(media_fetch, 'db', db)
+    monkeypatch.setattr(media_fetch, 'peers', PeerCache(db))
+    monkeypatch.setattr(media_fetch, 'media_index', MediaIndex(db))
+    monkeypatch.setattr(media_fetch, 'media_store', MediaStore(db, root=f"{tmp_path}/store/"))
+    return db
+
+def rejected_post(db, message_ids):
+    return db.add_post({'message_id': f'channel_0_{message_ids[0]}', 'channel_name': 'channel_0',
+                        'original_text': 'rejected', 'status': 'rejected', 'media_type': 'album',
+                        'media_ref': json.dumps({'channel': 'channel_0', 'message_ids': message_ids})})
+
+def test_a_queued_job_downloads_the_album_and_links_known_files(fetch_db, tmp_path):
+    known = tmp_path / 'known.jpg'
+    known.write_bytes(b'data')
+    media_fetch.media_index.add(media_key(Media('known.jpg')), None, 'photo', str(known), None, 'channel_1_1')
+
+    post_id = rejected_post(fetch_db, [4, 5, 6])
+    fetch_db.create_media_fetch_job(post_id)
+    # Message 6 was deleted since
+    client = FetchClient(tmp_path, {4: Message(photo='known.jpg'), 5: Message(video='clip.mp4')})
+    assert asyncio.run(media_fetch.run_pending_media_fetches(client)) == 1
+
+    assert client.downloads == ['clip.mp4']
+    post = fetch_db.get_post_media(post_id)
+    assert post['media_path'] == str(known)
+    known_path, clip_path = json.loads(post['media_paths'])
+    assert known_path == str(known)
+    # The download is moved into the store and referenced by the post
+    assert clip_path.startswith(media_fetch.media_store.root) and clip_path.endswith('.mp4')
+    assert os.path.exists(clip_path) and not (tmp_path / 'clip.mp4').exists()
+    assert fetch_db.get_media_fetch_jobs()[0]['status'] == 'done'
+
+def test_media_gone_from_telegram_fails_the_job(fetch_db, tmp_path):
+    post_id = rejected_post(fetch_db, [7])
+    fetch_db.create_media_fetch_job(post_id)
+    asyncio.run(media_fetch.run_pending_media_fetches(FetchClient(tmp_path, {})))
+    job = fetch_db.get_media_fetch_jobs()[0]
+    assert (job['status'], job['error']) == ('failed', 'Media no longer available')
+    assert fetch_db.get_post_media(post_id)['media_path'] is None
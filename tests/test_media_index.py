@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from PIL import Image
+import ingest
+from media_index import MediaIndex, media_key
+from utils import image_dhash
+
+class Photo:
+    def __init__(self, media_id):
+        self.id = media_id
+        self.access_hash = media_id * 10
+
+def gradient(path, flip=False, noise=0):
+    """A horizontal gradient photo; flipped ones hash very differently"""
+    row = np.linspace(0, 255, 320)
+    pixels = np.tile(row[::-1] if flip else row, (240, 1))
+    pixels = np.clip(pixels + np.random.default_rng(noise).normal(0, noise, pixels.shape), 0, 255)
+    Image.fromarray(pixels.astype(np.uint8)).convert('RGB').save(path, quality=90)
+    return str(path)
+
+def test_recompressed_images_are_within_the_distance(tmp_path):
+    original = image_dhash(gradient(tmp_path / 'a.jpg'))
+    noisy = image_dhash(gradient(tmp_path / 'b.jpg', noise=4))
+    flipped = image_dhash(gradient(tmp_path / 'c.jpg', flip=True))
+    assert bin(original ^ noisy).count('1') <= 6
+    assert bin(original ^ flipped).count('1') > 30
+
+def test_similar_hashes_point_at_the_earlier_post(db, tmp_path):
+    index = MediaIndex(db, max_distance=6)
+    path = gradient(tmp_path / 'a.jpg')
+    dhash = image_dhash(path)
+    index.add('photo:1', 10, 'photo', path, dhash, 'channel_1')
+
+    assert index.find_similar(dhash ^ 0b111) == 'channel_1'
+    assert index.find_similar(dhash ^ 0b1111111) is None
+    assert index.find_similar(dhash, exclude='channel_1') is None
+
+def test_the_index_is_restored_and_lookups_need_the_file(db, tmp_path):
+    path = gradient(tmp_path / 'a.jpg')
+    # A dHash with the top bit set is stored as a signed SQLite integer
+    MediaIndex(db).add(media_key(Photo(1)), 10, 'photo', path, (1 << 63) | 5, 'channel_1')
+
+    restored = MediaIndex(db)
+    assert restored.lookup(Photo(1))['message_id'] == 'channel_1'
+    assert restored.find_similar((1 << 63) | 5) == 'channel_1'
+    (tmp_path / 'a.jpg').unlink()
+    assert restored.lookup(Photo(1)) is None
+
+@pytest.fixture
+def fingerprint(db, monkeypatch):
+    monkeypatch.setattr(ingest, 'db', db)
+    monkeypatch.setattr(ingest, 'media_index', MediaIndex(db, max_distance=6))
+    return ingest.IngestPipeline(None, set()).fingerprint
+
+def photo_job(message_id, text, path):
+    return {'candidate': {'message_id': message_id, 'cleaned': text}, 'media_items': [(path, False)],
+            'media_refs': [{'key': f'photo:{message_id}', 'access_hash': 1, 'duplicate_of': None, 'preview': False}]}
+
+def test_a_repost_with_new_text_is_kept_and_flagged(db, fingerprint, tmp_path):
+    first = photo_job('channel_1', "Strike on the port", gradient(tmp_path / 'a.jpg'))
+    assert fingerprint(first)['candidate'].get('duplicate_of') is None
+    db.add_post({'message_id': 'channel_1', 'channel_name': 'channel', 'original_text': "Strike on the port"})
+
+    repost = fingerprint(photo_job('channel_2', "Second strike reported", gradient(tmp_path / 'b.jpg', noise=4)))
+    assert repost['candidate']['duplicate_of'] == 'channel_1'
+
+def test_a_repost_with_the_same_text_is_dropped(db, fingerprint, tmp_path):
+    fingerprint(photo_job('channel_1', "Strike on the port", gradient(tmp_path / 'a.jpg')))
+    db.add_post({'message_id': 'channel_1', 'channel_name': 'channel', 'original_text': "Strike on the port"})
+    assert fingerprint(photo_job('channel_2', "Strike on the port", gradient(tmp_path / 'b.jpg', noise=4))) is None
+
+def test_duplicate_of_is_stored_and_listed(db):
+    db.add_post({'message_id': 'channel_2', 'channel_name': 'channel', 'original_text': "repost",
+                 'duplicate_of': 'channel_1'})
+    assert db.get_posts()[0]['duplicate_of'] == 'channel_1'
+    assert db.get_posts(group_clusters=True)[0]['duplicate_of'] == 'channel_1'
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import pytest
+from telethon.tl.types import Document, Photo, PhotoSize, PhotoSizeProgressive, PhotoStrippedSize
+import ingest
+from media_index import MediaIndex
+from media_store import MediaStore
+
+def photo(media_id=1, sizes=None):
+    sizes = sizes if sizes is not None else [
+        PhotoStrippedSize('i', b'...'), PhotoSize('s', 90, 68, 1500), PhotoSize('m', 320, 240, 12000),
+        PhotoSizeProgressive('y', 1280, 960, [20000, 90000, 150000])]
+    return Photo(media_id, 7, b'', None, sizes, 2)
+
+def video(size, media_id=2):
+    return Document(media_id, 8, b'', None, 'video/mp4', size, 2, [], thumbs=[PhotoSize('m', 320, 180, 9000)])
+
+class Message:
+    def __init__(self, message_id, photo=None, video=None):
+        self.id = message_id
+        self.text = "caption"
+        self.photo = photo
+        self.video = video
+
+class DownloadClient:
+    def __init__(self, folder):
+        self.folder = folder
+        self.downloads = []
+
+    async def download_media(self, media, file=None, thumb=None):
+        self.downloads.append((media.id, thumb.type if thumb else None))
+        path = self.folder / f"{media.id}_{thumb.type if thumb else 'full'}"
+        path.write_bytes(b'data')
+        return str(path)
+
+@pytest.fixture
+def pipeline(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'media_index', MediaIndex(db))
+    monkeypatch.setattr(ingest, 'media_store', MediaStore(db, root=f"{tmp_path}/store/"))
+    return ingest.IngestPipeline(DownloadClient(tmp_path), set())
+
+def fetch(pipeline, message):
+    return asyncio.run(pipeline.fetch_media(ingest.IngestPipeline.make_job('channel_0', {}, message)))
+
+def test_the_smallest_thumbnail_big_enough_for_the_filters():
+    assert ingest.preview_thumb(photo()).type == 'm'
+    assert ingest.preview_thumb(photo(sizes=[PhotoSize('s', 90, 60, 1500)])) is None
+    assert ingest.media_size(photo()) == 150000
+    assert ingest.media_size(video(5000)) == 5000
+
+def test_filters_run_on_the_preview_and_the_full_file_replaces_it(pipeline, tmp_path):
+    job = fetch(pipeline, Message(1, photo=photo()))
+    preview = job['media_path']
+    assert pipeline.client.downloads == [(1, 'm')]
+    assert job['media_refs'][0]['preview']
+
+    job['candidate'] = {'message_id': 'channel_0_1', 'cleaned': "caption"}
+    job = pipeline.fingerprint(job)
+    job['translated'] = "accepted"
+    job = asyncio.run(pipeline.download_full(job))
+    assert pipeline.client.downloads == [(1, 'm'), (1, None)]
+    # The full file is moved into the store
+    assert job['media_path'].startswith(ingest.media_store.root) and os.path.exists(job['media_path'])
+    assert not (tmp_path / '1_full').exists()
+    assert not (tmp_path / '1_m').exists() and preview != job['media_path']
+    # Reposts of the same photo are now linked to the full file
+    assert ingest.media_index.lookup(photo())['path'] == job['media_path']
+
+def test_previews_of_dropped_posts_are_deleted(pipeline, tmp_path):
+    job = fetch(pipeline, Message(1, photo=photo()))
+    ingest.discard_previews(job)
+    assert not (tmp_path / '1_m').exists()
+
+def test_files_over_the_upload_cap_are_sent_as_text(pipeline, tmp_path):
+    job = fetch(pipeline, Message(3, video=video(ingest.MEDIA_SIZE_CAPS['video'] + 1)))
+    assert pipeline.client.downloads == [(2, 'm')]
+    job['translated'] = "accepted"
+    job = asyncio.run(pipeline.download_full(job))
+    assert (job['media_type'], job['media_items'], job['media_path']) == ('video', [], None)
+    assert pipeline.client.downloads == [(2, 'm')]
+    assert not (tmp_path / '2_m').exists()
+
+def test_rejected_posts_drop_their_previews_without_downloading(pipeline, tmp_path):
+    job = fetch(pipeline, Message(1, photo=photo()))
+    job['translated'] = "SKIP"
+    job = asyncio.run(pipeline.download_full(job))
+    assert pipeline.client.downloads == [(1, 'm')]
+    assert not (tmp_path / '1_m').exists()
+    assert ingest.media_reference('channel_0', [ref['telegram_id'] for ref in job['media_refs']]) == \
+        '{"channel": "channel_0", "message_ids": [1]}'
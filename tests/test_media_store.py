@@ -0,0 +1,98 @@
+import json
+import os
+import sqlite3
+import time
+import pytest
+from PIL import Image
+import media_store
+from media_store import MediaStore
+
+@pytest.fixture
+def store(db, tmp_path):
+    return MediaStore(db, root=f"{tmp_path}/store/", budget=10 ** 6)
+
+def download(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def add_post(db, number, status='pending', media_path=None, media_paths=None, days_old=0):
+    post_id = db.add_post({'message_id': f'channel_0_{number}', 'channel_name': 'channel_0',
+                           'original_text': f'post {number}', 'status': status, 'media_path': media_path,
+                           'media_paths': media_paths and json.dumps(media_paths)})
+    with sqlite3.connect(db.db_path) as conn:
+        conn.execute("UPDATE posts SET created_at = datetime('now', ?) WHERE id = ?", (f'-{days_old} days', post_id))
+    return post_id
+
+def test_identical_downloads_are_stored_once(store, tmp_path):
+    first = store.put(download(tmp_path, 'a.JPG', b'photo'))
+    second = store.put(download(tmp_path, 'b.jpg', b'photo'))
+    assert first == second and first.startswith(store.root) and first.endswith('.jpg')
+    assert not (tmp_path / 'a.JPG').exists() and not (tmp_path / 'b.jpg').exists()
+    assert store.put(first) == first
+    assert store.db.get_media_store_usage(time.time() + 1) == {'files': 1, 'size': 5}
+
+def test_posts_count_references_to_their_files(store, db, tmp_path):
+    photo = store.put(download(tmp_path, 'a.jpg', b'photo'))
+    clip = store.put(download(tmp_path, 'b.mp4', b'video'))
+    first = add_post(db, 1, media_path=photo)
+    add_post(db, 2, media_path=photo, media_paths=[photo, clip])
+    assert db.get_media_file(photo)['refcount'] == 2
+    assert db.get_media_file(clip)['refcount'] == 1
+
+    db.set_post_media(first, None, None)
+    assert db.get_media_file(photo)['refcount'] == 1
+
+def test_expired_posts_release_their_media(store, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, 'MEDIA_ORPHAN_GRACE', -1)
+    shared = store.put(download(tmp_path, 'a.jpg', b'photo'))
+    expired = add_post(db, 1, status='rejected', media_path=shared, days_old=2)
+    kept = add_post(db, 2, status='pending', media_path=shared, days_old=2)
+
+    result = store.evict()
+    assert (result['released'], result['deleted']) == (1, 0)
+    assert db.get_post_media(expired)['media_path'] is None
+    assert db.get_post_media(kept)['media_path'] == shared and os.path.exists(shared)
+
+    db.set_post_media(kept, None, None)
+    assert store.evict()['deleted'] == 1
+    assert not os.path.exists(shared)
+
+def test_over_budget_the_least_valuable_posts_go_first(store, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, 'MEDIA_ORPHAN_GRACE', -1)
+    monkeypatch.setattr(db, 'get_media_posts_by_value',
+                        lambda retention, default, limit=1: type(db).get_media_posts_by_value(
+                            db, retention, default, limit=1))
+    store.budget = 10
+    posted = add_post(db, 1, status='posted', media_path=store.put(download(tmp_path, 'a.jpg', b'photo')))
+    rejected = add_post(db, 2, status='rejected', media_path=store.put(download(tmp_path, 'b.jpg', b'other')))
+    pending = add_post(db, 3, status='pending', media_path=store.put(download(tmp_path, 'c.jpg', b'third')))
+
+    result = store.evict()
+    assert result == {'released': 1, 'deleted': 1, 'freed': 5, 'size': 10}
+    assert [db.get_post_media(post_id)['media_path'] is None for post_id in (posted, rejected, pending)] == \
+        [False, True, False]
+
+def test_released_files_in_the_grace_period_leave_the_usage(store, db, tmp_path):
+    store.budget = 10
+    for number, content in enumerate([b'photo', b'other', b'third']):
+        add_post(db, number, status='rejected', media_path=store.put(download(tmp_path, f'{number}.jpg', content)))
+
+    result = store.evict()
+    # Nothing is deleted yet, but the released files no longer count against the budget
+    assert (result['released'], result['deleted'], result['size']) == (3, 0, 0)
+    assert len(db.get_unreferenced_media_files(time.time() + 1)) == 3
+
+def test_photos_get_thumbnails_that_are_deleted_with_them(store, db, tmp_path, monkeypatch):
+    monkeypatch.setattr(media_store, 'MEDIA_ORPHAN_GRACE', -1)
+    source = tmp_path / 'photo.png'
+    Image.new('RGB', (600, 400)).save(source)
+    size = source.stat().st_size
+    path = store.put(str(source))
+
+    thumbnails = db.get_media_file(path)['thumbnails']
+    assert sorted(thumbnails) == [160, 480]
+    assert db.get_media_file(path)['size'] == size + sum(os.path.getsize(p) for p in thumbnails.values())
+
+    store.evict()
+    assert not any(os.path.exists(p) for p in [path] + list(thumbnails.values()))
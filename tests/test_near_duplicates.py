@@ -0,0 +1,68 @@
+import random
+import numpy as np
+from near_duplicates import MinHashIndex, shingles
+
+VOCABULARY = ['missile', 'strike', 'border', 'ceasefire', 'minister', 'talks', 'sanctions', 'troops', 'drone',
+              'embassy', 'election', 'protest', 'navy', 'summit', 'oil', 'grain', 'port', 'airspace', 'refugees',
+              'parliament', 'army', 'convoy', 'attack', 'agreement', 'statement', 'officials', 'region', 'city',
+              'north', 'south', 'night', 'morning', 'reported', 'killed', 'wounded', 'opened', 'closed', 'fire']
+
+def news(rng, words=40):
+    return [rng.choice(VOCABULARY) + str(rng.randint(0, 50)) for _ in range(words)]
+
+def repost(rng, words, edits=2):
+    """The same post with a few words replaced, as channels rewrite each other's posts"""
+    words = list(words)
+    for index in rng.sample(range(len(words)), edits):
+        words[index] = 'edited' + str(rng.randint(0, 1000))
+    return ' '.join(words)
+
+def test_shingles_ignore_case_and_punctuation():
+    assert set(shingles("Missile strike, near the BORDER!").tolist()) == \
+        set(shingles("missile strike near the border").tolist())
+    assert len(shingles("...")) == 0
+
+def test_signature_estimates_jaccard(db):
+    index = MinHashIndex(db, permutations=256, bands=16)
+    rng = random.Random(1)
+    for overlap in (20, 50, 80):
+        words = news(rng, 100)
+        first, second = ' '.join(words[:60]), ' '.join(words[60 - overlap:])
+        a, b = set(shingles(first).tolist()), set(shingles(second).tolist())
+        estimate = float(np.mean(index.signature(first) == index.signature(second)))
+        assert abs(estimate - len(a & b) / len(a | b)) < 0.1
+
+def test_finds_known_near_duplicates(db):
+    index = MinHashIndex(db)
+    rng = random.Random(2)
+    originals = [news(rng) for _ in range(100)]
+    for number, words in enumerate(originals):
+        assert index.check_and_add(f"a_{number}", 'a', ' '.join(words)) is None
+
+    found = 0
+    for number, words in enumerate(originals):
+        match = index.check_and_add(f"b_{number}", 'b', repost(rng, words))
+        found += match is not None and match[0] == f"a_{number}"
+    assert found >= 97
+
+def test_unrelated_posts_are_not_flagged(db):
+    index = MinHashIndex(db)
+    rng = random.Random(3)
+    flagged = sum(index.check_and_add(f"c_{number}", 'c', ' '.join(news(rng))) is not None for number in range(200))
+    assert flagged == 0
+
+def test_signatures_survive_a_restart(db):
+    rng = random.Random(4)
+    words = news(rng)
+    MinHashIndex(db).check_and_add('a_1', 'a', ' '.join(words))
+
+    reloaded = MinHashIndex(db)
+    assert reloaded.check_and_add('b_1', 'b', repost(rng, words))[0] == 'a_1'
+
+def test_entries_leave_the_window(db):
+    index = MinHashIndex(db, window=0)
+    rng = random.Random(5)
+    words = news(rng)
+    index.check_and_add('a_1', 'a', ' '.join(words))
+    assert index.check_and_add('b_1', 'b', ' '.join(words)) is None
+    assert 'a_1' not in index.signatures
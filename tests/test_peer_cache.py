@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from telethon.tl.types import InputPeerChannel, InputPeerUser
+import peer_cache
+from peer_cache import PeerCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(peer_cache.time, 'time', clock.time)
+    return clock
+
+class Client:
+    def __init__(self):
+        self.resolved = []
+
+    async def get_input_entity(self, username):
+        self.resolved.append(username)
+        if username == 'broken':
+            raise ValueError('No user has "broken" as username')
+        if username == 'somebody':
+            return InputPeerUser(7, 70)
+        return InputPeerChannel(5, 50)
+
+class Message:
+    def __init__(self, sender_id, sender=None):
+        self.sender_id = sender_id
+        self.sender = sender
+
+def test_channels_resolve_once_per_ttl(db, clock):
+    peers = PeerCache(db, ttl=100)
+    client = Client()
+    assert asyncio.run(peers.get_input_channel(client, 'News')) == InputPeerChannel(5, 50)
+    assert asyncio.run(peers.get_input_channel(client, 'news')) == InputPeerChannel(5, 50)
+    assert client.resolved == ['News']
+
+    clock.now += 101
+    asyncio.run(peers.get_input_channel(client, 'news'))
+    assert client.resolved == ['News', 'news']
+    assert peers.resolves == 2
+
+def test_entries_survive_a_restart_until_they_expire(db, clock):
+    client = Client()
+    asyncio.run(PeerCache(db, ttl=100).get_input_channel(client, 'somebody'))
+
+    clock.now += 50
+    restored = PeerCache(db, ttl=100)
+    assert asyncio.run(restored.get_input_channel(client, 'somebody')) == InputPeerUser(7, 70)
+    assert restored.resolves == 0
+
+    clock.now += 60
+    assert PeerCache(db, ttl=100).entries == {}
+
+def test_sender_names_come_from_the_message_then_the_cache(db, clock):
+    peers = PeerCache(db)
+    sender = type('Channel', (), {'title': 'Breaking', 'access_hash': 9})()
+    assert peers.sender_name(Message(3, sender)) == 'Breaking'
+    # Later messages may arrive without the sender entity
+    assert peers.sender_name(Message(3)) == 'Breaking'
+    assert PeerCache(db).sender_name(Message(3)) == 'Breaking'
+    assert peers.sender_name(Message(4)) is None
+    assert peers.sender_name(Message(None, sender)) is None
+
+def test_warm_skips_channels_that_fail_to_resolve(db, clock):
+    peers = PeerCache(db)
+    client = Client()
+    asyncio.run(peers.warm(client, ['news', 'broken']))
+    asyncio.run(peers.warm(client, ['news', 'broken']))
+    assert client.resolved == ['news', 'broken', 'broken']
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from pipeline import Pipeline, Stage
+
+def square(item):
+    return item * item
+
+def run(stages, items, **kwargs):
+    """Feed items through a pipeline and return what the last stage saw"""
+    seen = []
+
+    async def collect(item):
+        seen.append(item)
+        return item
+
+    async def main():
+        async with Pipeline(stages + [Stage('collect', collect, kind='async')], **kwargs) as pipeline:
+            for item in items:
+                await pipeline.put(item)
+            await pipeline.join()
+            return pipeline.stats()
+
+    return seen, asyncio.run(main())
+
+def test_items_pass_the_stages_in_order():
+    async def add_one(item):
+        return item + 1
+
+    seen, stats = run([Stage('add', add_one, kind='async'), Stage('double', lambda item: item * 2, kind='thread')], range(5))
+    assert sorted(seen) == [2, 4, 6, 8, 10]
+    assert stats['add']['processed'] == stats['double']['processed'] == 5
+
+def test_process_stage_runs_in_a_pool():
+    seen, stats = run([Stage('square', square, workers=2, kind='process')], range(6))
+    assert sorted(seen) == [0, 1, 4, 9, 16, 25]
+
+def test_none_drops_and_when_skips():
+    seen, stats = run([
+        Stage('odd', lambda item: item if item % 2 else None),
+        Stage('big', lambda item: item * 100, when=lambda item: item > 4),
+    ], range(10))
+    assert sorted(seen) == [1, 3, 500, 700, 900]
+    assert stats['odd']['dropped'] == 5
+    assert stats['big']['skipped'] == 2
+
+def test_a_failing_item_is_reported_and_the_rest_continue():
+    errors = []
+
+    def fragile(item):
+        if item == 3:
+            raise ValueError(item)
+        return item
+
+    seen, stats = run([Stage('fragile', fragile)], range(5),
+                      on_error=lambda stage, item, error: errors.append((stage.name, item)))
+    assert sorted(seen) == [0, 1, 2, 4]
+    assert errors == [('fragile', 3)]
+    assert stats['fragile']['failed'] == 1
+
+def test_a_full_queue_blocks_the_producer():
+    release = asyncio.Event()
+    processed = []
+
+    async def slow(item):
+        await release.wait()
+        processed.append(item)
+        return item
+
+    async def main():
+        produced = 0
+        async with Pipeline([Stage('slow', slow, kind='async')], queue_size=2) as pipeline:
+            async def produce():
+                nonlocal produced
+                for item in range(10):
+                    await pipeline.put(item)
+                    produced += 1
+
+            producer = asyncio.create_task(produce())
+            await asyncio.sleep(0.05)
+            # One item with the worker and two queued; the fourth put is waiting
+            blocked_at = produced
+            release.set()
+            await producer
+            await pipeline.join()
+        return blocked_at
+
+    assert asyncio.run(main()) == 3
+    assert processed == list(range(10))
+
+def test_unknown_stage_kind():
+    with pytest.raises(ValueError):
+        Stage('bad', square, kind='fiber')
+
+def test_batch_stages_get_lists_and_skipped_items_pass_through():
+    batches = []
+
+    def double_all(items):
+        batches.append(list(items))
+        return [item * 2 if item != 4 else None for item in items]
+
+    seen, stats = run([Stage('double', double_all, batch_size=3, batch_wait=0.05, when=lambda item: item != 5)],
+                      range(8))
+    assert sorted(seen) == [0, 2, 4, 5, 6, 12, 14]
+    assert all(len(batch) <= 3 for batch in batches)
+    assert sorted(item for batch in batches for item in batch) == [0, 1, 2, 3, 4, 6, 7]
+    assert (stats['double']['processed'], stats['double']['dropped'], stats['double']['skipped']) == (6, 1, 1)
+
+def test_a_failing_batch_reports_each_item():
+    errors = []
+
+    def fragile(items):
+        raise ValueError(items)
+
+    seen, stats = run([Stage('fragile', fragile, batch_size=4, batch_wait=0.05)], range(3),
+                      on_error=lambda stage, item, error: errors.append(item))
+    assert seen == [] and sorted(errors) == [0, 1, 2]
+    assert stats['fragile']['failed'] == 3
@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from telethon.errors import FloodWaitError
+import rate_governor
+from rate_governor import RateGovernor, TokenBucket
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Virtual time: asyncio.sleep advances time.monotonic() instead of waiting"""
+    now = [1000.0]
+    sleeps = []
+
+    async def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    monkeypatch.setattr(rate_governor.time, 'monotonic', lambda: now[0])
+    monkeypatch.setattr(rate_governor.asyncio, 'sleep', sleep)
+    return sleeps
+
+def flaky(waits, result='ok'):
+    """A request that answers FLOOD_WAIT once per entry in `waits`, then succeeds"""
+    calls = []
+
+    async def request():
+        calls.append(1)
+        if len(calls) <= len(waits):
+            raise FloodWaitError(request=None, capture=waits[len(calls) - 1])
+        return result
+    return request, calls
+
+def test_the_bucket_allows_a_burst_then_meters_the_rate(clock):
+    bucket = TokenBucket(rate=2.0, capacity=3)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(take(5))
+    assert clock == [0.5, 0.5]
+
+def test_a_flood_wait_blocks_the_kind_and_retries(clock):
+    governor = RateGovernor({'history': (100.0, 10), 'download': (100.0, 10)}, max_retries=3)
+    request, calls = flaky([7])
+    assert asyncio.run(governor.call('history', request)) == 'ok'
+    assert len(calls) == 2
+    # The server asked for 7s; one extra second covers its rounding
+    assert clock == [8]
+    assert governor.stats['history'] == {'calls': 2, 'flood_waits': 1, 'waited': 8}
+    assert governor.stats['download']['flood_waits'] == 0
+
+def test_other_kinds_are_not_blocked(clock):
+    governor = RateGovernor({'history': (100.0, 10), 'download': (100.0, 10)}, max_retries=0)
+    request, _ = flaky([30])
+    with pytest.raises(FloodWaitError):
+        asyncio.run(governor.call('history', request))
+
+    download, _ = flaky([])
+    assert asyncio.run(governor.call('download', download)) == 'ok'
+    assert clock == []
+
+def test_the_last_flood_wait_is_raised_after_max_retries(clock):
+    governor = RateGovernor({'history': (100.0, 10)}, max_retries=2)
+    request, calls = flaky([1, 1, 1, 1])
+    with pytest.raises(FloodWaitError):
+        asyncio.run(governor.call('history', request))
+    assert len(calls) == 3
+
+def test_install_makes_telethon_raise_every_flood_wait():
+    class Client:
+        flood_sleep_threshold = 60
+
+    client = Client()
+    RateGovernor({'history': (1.0, 1)}).install(client)
+    assert client.flood_sleep_threshold == 0
@@ -0,0 +1,51 @@
+import pytest
+import rescore
+import scoring
+
+@pytest.fixture
+def posts(db, monkeypatch):
+    monkeypatch.setattr(rescore, 'db', db)
+    texts = ["BREAKING: official statement by the government", "Subscribe and follow the channel link",
+             "The puppet regime responds", "quiet day", "Minister visits the border"]
+    for index, text in enumerate(texts):
+        db.add_post({'message_id': f'channel_{index}', 'channel_name': 'channel', 'original_text': text,
+                     'quality_score': 0.5, 'bias_score': 0})
+    return texts
+
+def stored_scores(db):
+    return {row[0]: (row[2], row[3]) for row in db.get_posts_for_rescore(0, 100)}
+
+def test_rescore_rewrites_changed_scores_and_finishes(db, posts):
+    db.create_rescore_job()
+    rescore.run_rescore_job(db.get_rescore_jobs(['queued'])[0], workers=1, chunk_size=2)
+
+    quality, bias = scoring.score_batch(posts)
+    assert [score for score, _ in stored_scores(db).values()] == pytest.approx(quality.tolist())
+    assert [score for _, score in stored_scores(db).values()] == pytest.approx(bias.tolist())
+    job = db.get_rescore_jobs()[0]
+    assert job['status'] == 'done'
+    assert job['processed'] == len(posts)
+    # 'quiet day' keeps its stored 0.5 quality and 0 bias, so it is not rewritten
+    assert job['changed'] == len(posts) - 1
+
+def test_an_interrupted_job_resumes_after_its_last_chunk(db, posts, monkeypatch):
+    db.create_rescore_job()
+    calls = []
+    score_batch = scoring.score_batch
+
+    def failing_batch(texts, workers=1):
+        calls.append(list(texts))
+        if len(calls) == 2:
+            raise RuntimeError("worker crashed")
+        return score_batch(texts, workers=workers)
+
+    monkeypatch.setattr(rescore, 'score_batch', failing_batch)
+    with pytest.raises(RuntimeError):
+        rescore.run_rescore_job(db.get_rescore_jobs(['queued'])[0], workers=1, chunk_size=2)
+    job = db.get_rescore_jobs(['running'])[0]
+    assert (job['processed'], job['last_post_id']) == (2, 2)
+
+    rescore.run_rescore_job(job, workers=1, chunk_size=2)
+    # The committed first chunk is not scored again
+    assert calls[2:] == [posts[2:4], posts[4:]]
+    assert db.get_rescore_jobs()[0]['processed'] == len(posts)
@@ -0,0 +1,82 @@
+import pytest
+import scheduler
+from config import LOOP_INTERVAL, MAX_POLL_INTERVAL, MIN_POLL_INTERVAL, POLL_BACKOFF, POLL_TARGET_BATCH
+from scheduler import EWMA_ALPHA, ChannelScheduler
+
+CHANNELS = {'busy': {'priority': 1}, 'quiet': {'priority': 2}}
+
+class Clock:
+    def __init__(self):
+        self.now = 5000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock.monotonic)
+    return clock
+
+def test_every_channel_is_due_at_start(db, clock):
+    assert set(ChannelScheduler(db, CHANNELS).due_channels()) == set(CHANNELS)
+
+def test_empty_polls_back_off_up_to_the_cap(db, clock):
+    channels = ChannelScheduler(db, CHANNELS)
+    intervals = []
+    for _ in range(12):
+        channels.record('quiet', 0, 0)
+        intervals.append(channels.state['quiet']['interval'])
+        clock.now += intervals[-1]
+    assert intervals[0] == pytest.approx(LOOP_INTERVAL * POLL_BACKOFF)
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == MAX_POLL_INTERVAL
+
+def test_busy_channel_is_polled_per_target_batch(db, clock):
+    channels = ChannelScheduler(db, CHANNELS)
+    channels.record('busy', 0, 0)
+    for _ in range(20):
+        clock.now += 600
+        channels.record('busy', 20, 10)  # 120 messages an hour, half of them posted
+    rate = channels.state['busy']['message_rate']
+    assert rate == pytest.approx(120, rel=0.01)
+    assert channels.state['busy']['interval'] == pytest.approx(max(POLL_TARGET_BATCH / rate * 3600, MIN_POLL_INTERVAL))
+    assert channels.state['busy']['success_rate'] == pytest.approx(0.5)
+
+def test_priority_scales_the_floor(db, clock):
+    channels = ChannelScheduler(db, CHANNELS)
+    channels.record('quiet', 0, 0)
+    clock.now += 1
+    channels.record('quiet', 1000, 1000)
+    assert channels.state['quiet']['interval'] == MIN_POLL_INTERVAL * 2
+
+def test_ewma_weights_the_newest_value():
+    assert ChannelScheduler._ewma(None, 7.0) == 7.0
+    assert ChannelScheduler._ewma(10.0, 20.0) == pytest.approx(EWMA_ALPHA * 20 + (1 - EWMA_ALPHA) * 10)
+
+def test_a_measured_zero_rate_is_averaged_not_replaced(db, clock):
+    channels = ChannelScheduler(db, CHANNELS)
+    channels.record('quiet', 0, 0)
+    clock.now += 3600
+    channels.record('quiet', 0, 0)
+    assert channels.state['quiet']['message_rate'] == 0.0
+    clock.now += 3600
+    channels.record('quiet', 10, 1)
+    assert channels.state['quiet']['message_rate'] == pytest.approx(EWMA_ALPHA * 10)
+    assert channels.state['quiet']['success_rate'] == pytest.approx(0.1)
+
+def test_a_cursor_row_does_not_count_as_measured_rates(db, clock):
+    db.update_channel_cursor('busy', 42)
+    channels = ChannelScheduler(db, CHANNELS)
+    assert channels.state['busy']['message_rate'] is None
+    assert channels.state['busy']['success_rate'] is None
+    channels.record('busy', 4, 0)
+    assert channels.state['busy']['success_rate'] == 0.0
+    assert ChannelScheduler(db, CHANNELS).state['busy']['success_rate'] == 0.0
+
+def test_learned_state_survives_a_restart(db, clock):
+    channels = ChannelScheduler(db, CHANNELS)
+    channels.record('quiet', 0, 0)
+    restored = ChannelScheduler(db, CHANNELS)
+    assert restored.state['quiet']['interval'] == channels.state['quiet']['interval']
+    assert 'quiet' in restored.due_channels()
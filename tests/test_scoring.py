@@ -0,0 +1,41 @@
+import random
+import numpy as np
+import scoring
+
+TEXTS = [
+    "BREAKING: Official statement confirmed by the government of Ukraine on the border crisis",
+    "Subscribe to our channel! Follow the link and click download!!! Join now???",
+    "The puppet regime and the terrorist state: NATO and EU ministers meet at the UN summit",
+    "short",
+    "",
+    "x" * 400,
+    "lowercase start, then war and peace talks in Syria and Iran " * 3,
+]
+
+def random_texts(count, seed=7):
+    rng = random.Random(seed)
+    words = (scoring.BREAKING_TERMS + scoring.GEO_TERMS + scoring.COUNTRY_TERMS + scoring.PROMO_TERMS +
+             scoring.BIAS_TERMS + ['the', 'And', 'news', '!', '?', '...', 'Reports'])
+    return [' '.join(rng.choice(words) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+def scalar_scores(texts):
+    return ([scoring.calculate_content_quality(text) for text in texts],
+            [scoring.calculate_bias_score(text) for text in texts])
+
+def test_batch_scores_match_the_per_message_functions():
+    texts = TEXTS + random_texts(300)
+    quality, bias = scoring.score_batch(texts)
+    expected_quality, expected_bias = scalar_scores(texts)
+    np.testing.assert_allclose(quality, expected_quality)
+    np.testing.assert_allclose(bias, expected_bias)
+
+def test_the_process_pool_gives_the_same_scores():
+    texts = random_texts(50, seed=11)
+    single = scoring.score_batch(texts)
+    pooled = scoring.score_batch(texts, workers=2, chunk_size=20)
+    np.testing.assert_allclose(pooled[0], single[0])
+    np.testing.assert_allclose(pooled[1], single[1])
+
+def test_empty_batch():
+    quality, bias = scoring.score_batch([])
+    assert quality.shape == bias.shape == (0,)
@@ -0,0 +1,64 @@
+import pytest
+import story_clusters
+from story_clusters import StoryClusterer, terms
+
+STORY_A = [
+    "🇮🇱 Israeli air strikes hit targets in southern Lebanon overnight, officials say",
+    "🇱🇧 Lebanon reports Israeli strikes on southern villages overnight",
+    "Israel confirms overnight air strikes against targets in south Lebanon",
+]
+STORY_B = [
+    "🇺🇦 Ukraine and Russia agree to a grain export corridor through the Black Sea",
+    "Russia and Ukraine sign Black Sea grain corridor deal in Istanbul",
+]
+
+class Clock:
+    def __init__(self):
+        self.now = 1_800_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(story_clusters.time, 'time', clock.time)
+    return clock
+
+def test_terms_are_stemmed_content_words():
+    assert terms("The Israeli missiles and 2 Egyptian officials") == ['israe', 'missi', 'egypt', 'offic']
+
+def test_reports_of_one_event_share_a_cluster(db, clock):
+    clusterer = StoryClusterer(db)
+    ids = [clusterer.assign(post_id, text) for post_id, text in enumerate(STORY_A + STORY_B, start=1)]
+    assert ids == [1, 1, 1, 4, 4]
+
+def test_unrelated_posts_start_their_own_stories(db, clock):
+    clusterer = StoryClusterer(db)
+    texts = [STORY_A[0], STORY_B[0], "Brazil elects a new president after a close runoff vote",
+             "Japan and South Korea hold a summit on trade"]
+    assert [clusterer.assign(post_id, text) for post_id, text in enumerate(texts, start=1)] == [1, 2, 3, 4]
+
+def test_posts_without_terms_get_their_own_cluster(db, clock):
+    clusterer = StoryClusterer(db)
+    assert clusterer.assign(1, "🔥🔥 !!") == 1
+    assert clusterer.assign(2, "🔥🔥 !!") == 2
+
+def test_stories_close_after_the_window(db, clock):
+    clusterer = StoryClusterer(db, window=3600)
+    clusterer.assign(1, STORY_A[0])
+    clock.now += 3601
+    assert clusterer.assign(2, STORY_A[1]) == 2
+    # The expired cluster left the index and the IDF statistics
+    assert 1 not in clusterer.clusters
+    assert all(1 not in members for members in clusterer.term_clusters.values())
+    assert clusterer.documents == 1
+    assert set(clusterer.document_frequency) == set(terms(STORY_A[1]))
+
+def test_a_story_stays_open_while_it_gets_posts(db, clock):
+    clusterer = StoryClusterer(db, window=3600)
+    clusterer.assign(1, STORY_A[0])
+    clock.now += 3000
+    assert clusterer.assign(2, STORY_A[1]) == 1
+    clock.now += 3000
+    assert clusterer.assign(3, STORY_A[2]) == 1
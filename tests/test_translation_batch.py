@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+import pytest
+import bot
+from llm_client import LLMClient
+from translation_cache import TranslationCache
+
+class FakeCompletions:
+    """Answers batch requests with `batch_answer(posts)` and single requests by upper-casing the text"""
+
+    def __init__(self, batch_answer, finish_reason='stop'):
+        self.batch_answer = batch_answer
+        self.finish_reason = finish_reason
+        self.requests = []
+
+    async def create(self, messages, response_format=None, **kwargs):
+        text = messages[-1]['content']
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=40, total_tokens=140)
+        if response_format is None:
+            self.requests.append(text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text.upper()),
+                                                            finish_reason='stop')], usage=usage)
+        posts = json.loads(text)
+        self.requests.append(sorted(posts.values()))
+        content = self.batch_answer(posts)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content),
+                                                        finish_reason=self.finish_reason)], usage=usage)
+
+@pytest.fixture
+def completions(db, monkeypatch):
+    def install(batch_answer, finish_reason='stop'):
+        fake = FakeCompletions(batch_answer, finish_reason)
+        llm = LLMClient(max_retries=0)
+        llm.client = SimpleNamespace(chat=SimpleNamespace(completions=fake))
+        monkeypatch.setattr(bot, 'llm', llm)
+        return fake
+
+    monkeypatch.setattr(bot, 'translation_cache', TranslationCache(db))
+    return install
+
+def answer_all(posts):
+    return json.dumps({'results': [{'id': key, 'output': text.upper()} for key, text in posts.items()]})
+
+def test_batches_respect_the_size_and_token_budget(monkeypatch):
+    monkeypatch.setattr(bot, 'TRANSLATION_BATCH_MAX', 3)
+    monkeypatch.setattr(bot, 'TRANSLATION_BATCH_TOKENS', 100)
+    texts = list(enumerate(["short"] * 4 + ["x" * 400, "short"]))
+    assert [[index for index, _ in batch] for batch in bot.plan_batches(texts)] == [[0, 1, 2], [3], [4], [5]]
+
+def test_one_request_translates_a_batch_and_shares_its_usage(completions):
+    fake = completions(answer_all)
+    results = bot.translate_batch(["kısa", "biraz daha uzun metin"])
+    assert [output for output, _ in results] == ["KISA", "BIRAZ DAHA UZUN METIN"]
+    assert fake.requests == [["biraz daha uzun metin", "kısa"]]
+    assert sum(usage.total_tokens for _, usage in results) == 140
+    assert results[0][1].total_tokens < results[1][1].total_tokens
+    # Both answers are cached for reposts
+    assert bot.translate_batch(["Kısa "]) == [("KISA", None)]
+
+def test_messages_missing_from_the_answer_are_translated_alone(completions):
+    fake = completions(lambda posts: json.dumps({'results': [{'id': '1', 'output': "FIRST"},
+                                                             {'id': '9', 'output': "UNKNOWN"}]}))
+    results = bot.translate_batch(["first", "second"])
+    assert [output for output, _ in results] == ["FIRST", "SECOND"]
+    assert fake.requests == [["first", "second"], "second"]
+
+@pytest.mark.parametrize('finish_reason, content', [('length', '{"results": [{"id": "1"'), ('stop', 'not json')])
+def test_truncated_or_malformed_answers_fall_back_to_single_requests(completions, finish_reason, content):
+    fake = completions(lambda posts: content, finish_reason)
+    results = bot.translate_batch(["first", "second"])
+    assert [output for output, _ in results] == ["FIRST", "SECOND"]
+    assert fake.requests[1:] == ["first", "second"]
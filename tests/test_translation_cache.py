@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+import pytest
+import bot
+import translation_cache
+from llm_client import LLMClient
+from translation_cache import TranslationCache, cache_key
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(translation_cache.time, 'time', lambda: now[0])
+    return now
+
+def test_reposts_differing_in_case_spacing_and_unicode_share_a_key():
+    assert cache_key("Tahran'da  PATLAMA\u200b\n", 'v1', 'gpt-4o') == cache_key("tahran'da patlama", 'v1', 'gpt-4o')
+    assert cache_key("\ufb01rst", 'v1', 'gpt-4o') == cache_key("first", 'v1', 'gpt-4o')
+    assert cache_key("text", 'v1', 'gpt-4o') != cache_key("text", 'v2', 'gpt-4o')
+    assert cache_key("text", 'v1', 'gpt-4o') != cache_key("text", 'v1', 'gpt-4o-mini')
+
+def test_entries_outlive_the_process_in_sqlite(db, clock):
+    TranslationCache(db).put("text", 'v1', 'gpt-4o', "SKIP")
+    cache = TranslationCache(db)
+    assert cache.get("TEXT", 'v1', 'gpt-4o') == "SKIP"
+    assert cache.get("text", 'v1', 'gpt-4o') == "SKIP"
+    assert cache.get("other", 'v1', 'gpt-4o') is None
+    assert cache.stats() == {'memory_hits': 1, 'db_hits': 1, 'misses': 1, 'hit_rate': 2 / 3}
+    assert db.get_translation_cache_stats() == {'rows': 1, 'hits': 1}
+
+def test_the_memory_lru_drops_the_least_recently_used(db, clock):
+    cache = TranslationCache(db, size=2)
+    cache.put("a", 'v1', 'm', "A")
+    cache.put("b", 'v1', 'm', "B")
+    cache.get("a", 'v1', 'm')
+    cache.put("c", 'v1', 'm', "C")
+    assert list(cache.memory) == [cache_key(text, 'v1', 'm') for text in ("a", "c")]
+    # "b" is still in SQLite
+    assert cache.get("b", 'v1', 'm') == "B"
+    assert cache.counters['db_hits'] == 1
+
+def test_entries_expire_after_the_ttl(db, clock):
+    cache = TranslationCache(db, ttl=60)
+    cache.put("text", 'v1', 'm', "TEXT")
+    clock[0] += 61
+    assert cache.get("text", 'v1', 'm') is None
+    assert cache.memory == {}
+
+def test_pruning_removes_expired_then_least_recently_used_rows(db, monkeypatch, clock):
+    monkeypatch.setattr(translation_cache, 'TRANSLATION_CACHE_PRUNE_EVERY', 4)
+    cache = TranslationCache(db, ttl=60, max_rows=2)
+    cache.put("old", 'v1', 'm', "OLD")
+    clock[0] += 61
+    for text in ("a", "b", "c"):
+        clock[0] += 1
+        cache.put(text, 'v1', 'm', text.upper())
+    assert db.get_translation_cache_stats()['rows'] == 2
+    assert [cache.get(text, 'v1', 'm') for text in ("b", "c")] == ["B", "C"]
+
+def test_only_successful_gpt_answers_are_cached(db, monkeypatch):
+    answers = ["", "🌍 Translated"]
+
+    async def create(**kwargs):
+        output = answers.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=output))], usage='usage')
+
+    monkeypatch.setattr(bot, 'translation_cache', TranslationCache(db))
+    llm = LLMClient(max_retries=0)
+    llm.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(bot, 'llm', llm)
+    assert bot.translate_if_geopolitical("haber") == ("", 'usage')
+    assert bot.translate_if_geopolitical("haber") == ("🌍 Translated", 'usage')
+    assert bot.translate_if_geopolitical("Haber ") == ("🌍 Translated", None)
+    assert answers == []
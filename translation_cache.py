@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Two-level cache of GPT translations.
+
+Entries are keyed by a hash of the normalized input text, the prompt
+version and the model, so a repost that differs only in case, spacing or
+Unicode form reuses the earlier answer. "SKIP" answers are cached too. An
+in-memory LRU of TRANSLATION_CACHE_SIZE entries sits in front of the
+translation_cache table, which keeps entries for TRANSLATION_CACHE_TTL
+seconds and at most TRANSLATION_CACHE_MAX_ROWS rows (least recently used
+rows are evicted first). Failed calls are never cached.
+
+Usage:
+    python translation_cache.py --status
+    python translation_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from config import (TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_MAX_ROWS,
+                    TRANSLATION_CACHE_PRUNE_EVERY)
+
+# Zero-width characters that Telegram clients leave in copied text
+_INVISIBLE = dict.fromkeys(map(ord, '\u200b\u200c\u200d\u2060\ufeff'))
+
+def normalize(text):
+    """Unicode NFKC, case-folded, without invisible characters and with collapsed whitespace"""
+    text = unicodedata.normalize('NFKC', text or "").translate(_INVISIBLE).casefold()
+    return re.sub(r'\s+', ' ', text).strip()
+
+def cache_key(text, prompt_version, model):
+    return hashlib.sha256(f"{model}\0{prompt_version}\0{normalize(text)}".encode()).hexdigest()
+
+class TranslationCache:
+    def __init__(self, db, size=TRANSLATION_CACHE_SIZE, ttl=TRANSLATION_CACHE_TTL,
+                 max_rows=TRANSLATION_CACHE_MAX_ROWS):
+        self.db = db
+        self.size = size
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self.memory = OrderedDict()  # key -> (output, created_at), most recently used last
+        self.counters = {'memory_hits': 0, 'db_hits': 0, 'misses': 0}
+        self.stores = 0
+        self.lock = threading.Lock()
+
+    def _remember(self, key, output, created_at):
+        self.memory[key] = (output, created_at)
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def get(self, text, prompt_version, model):
+        """Cached output for the text, or None"""
+        key = cache_key(text, prompt_version, model)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return entry[0]
+
+        row = self.db.get_cached_translation(key, now - self.ttl)
+        with self.lock:
+            if row is None:
+                self.memory.pop(key, None)
+                self.counters['misses'] += 1
+                return None
+            self._remember(key, row['output'], row['created_at'])
+            self.counters['db_hits'] += 1
+        return row['output']
+
+    def put(self, text, prompt_version, model, output):
+        key = cache_key(text, prompt_version, model)
+        now = time.time()
+        with self.lock:
+            self._remember(key, output, now)
+            self.stores += 1
+            prune = self.stores % TRANSLATION_CACHE_PRUNE_EVERY == 0
+        self.db.save_cached_translation(key, output, prompt_version, model, now)
+        if prune:
+            self.db.prune_translation_cache(now - self.ttl, self.max_rows)
+
+    def stats(self):
+        """Hit/miss counters since startup, with the overall hit rate"""
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = sum(stats.values())
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the translation cache")
+    parser.add_argument('--status', action='store_true', help="Show cached entries and hits")
+    parser.add_argument('--clear', action='store_true', help="Delete every cached translation")
+    args = parser.parse_args()
+
+    from database import DatabaseManager
+    db = DatabaseManager()
+    if args.clear:
+        print(f"[CACHE] {db.prune_translation_cache(float('inf'), 0)} kayıt silindi.")
+    status = db.get_translation_cache_stats()
+    print(f"[CACHE] {status['rows']} çeviri önbellekte, toplam {status['hits']} isabet.")
+
+if __name__ == "__main__":
+    main()
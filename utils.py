@@ -1,10 +1,11 @@
 import hashlib
-import csv
+import json
 import os
 from datetime import datetime
 import requests
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
-# Removed numpy dependency - using PIL only for image processing
+import numpy as np
 import re
 
 def get_sent_hashes(file_path="sent_hashes.txt"):
@@ -36,26 +37,6 @@ def is_similar_content(text, sent_hashes):
     similarity_hash = get_content_similarity_hash(text)
     return similarity_hash in sent_hashes
 
-def log_gpt_interaction(csv_file, stage, date, channel, text, sent, usage):
-    try:
-        file_exists = os.path.isfile(csv_file)
-        with open(csv_file, mode='a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            if not file_exists:
-                writer.writerow([
-                    "Tarih", "Aşama", "Kanal", "Özet",
-                    "Telegram’a Gönderildi mi?", "Prompt Tokens", "Completion Tokens", "Toplam Tokens"
-                ])
-            writer.writerow([
-                date, stage, channel, text[:100],
-                "Evet" if sent else "Hayır",
-                getattr(usage, 'prompt_tokens', '-') if usage else '-',
-                getattr(usage, 'completion_tokens', '-') if usage else '-',
-                getattr(usage, 'total_tokens', '-') if usage else '-'
-            ])
-    except Exception as e:
-        print("[LOG ERROR] CSV yazma hatası:", e)
-
 def send_to_telegram(bot_token, chat_id, text, media_path=None, is_video=False):
     try:
         if media_path:
@@ -76,35 +57,78 @@ def send_to_telegram(bot_token, chat_id, text, media_path=None, is_video=False):
     except Exception as e:
         print("❌ Telegram API hatası:", e)
 
+def send_media_group_to_telegram(bot_token, chat_id, text, media_items):
+    """Send an album as one sendMediaGroup call; media_items is a list of (path, is_video)"""
+    files = {}
+    try:
+        media = []
+        # Bot API albums hold at most 10 items
+        for index, (media_path, is_video) in enumerate(media_items[:10]):
+            name = f"file{index}"
+            files[name] = open(media_path, 'rb')
+            item = {"type": "video" if is_video else "photo", "media": f"attach://{name}"}
+            if index == 0:
+                item["caption"] = text
+            media.append(item)
+
+        url = f"https://api.telegram.org/bot{bot_token}/sendMediaGroup"
+        data = {"chat_id": chat_id, "media": json.dumps(media)}
+        response = requests.post(url, data=data, files=files)
+
+        if response.status_code == 200:
+            print(f"✅ Albüm gönderildi ({len(media)} medya).")
+        else:
+            print("❌ Gönderim hatası:", response.text)
+    except Exception as e:
+        print("❌ Telegram API hatası:", e)
+    finally:
+        for media_file in files.values():
+            media_file.close()
+
+def red_black_ratio(image_path):
+    """Share of pixels that are strongly red or near black, measured on a 100x100 thumbnail"""
+    image = Image.open(image_path)
+    # Let the JPEG decoder downscale while decoding instead of decoding full size
+    image.draft('RGB', (200, 200))
+    pixels = np.asarray(image.convert('RGB').resize((100, 100)), dtype=np.uint8)
+    r, g, b = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+
+    red = (r > 150) & (g < 80) & (b < 80)
+    black = (r < 50) & (g < 50) & (b < 50)
+    return float(np.count_nonzero(red | black)) / red.size
+
 def is_image_red_or_black_heavy(image_path, threshold=0.7):
     try:
-        image = Image.open(image_path).convert('RGB')
-        image = image.resize((100, 100))
-        
-        # Count pixels using PIL without numpy
-        total_pixels = image.width * image.height
-        red_pixels = 0
-        black_pixels = 0
-        
-        # Iterate through pixels
-        for x in range(image.width):
-            for y in range(image.height):
-                r, g, b = image.getpixel((x, y))
-                
-                # Check for red pixels (high red, low green/blue)
-                if r > 150 and g < 80 and b < 80:
-                    red_pixels += 1
-                
-                # Check for black pixels (all values low)
-                elif r < 50 and g < 50 and b < 50:
-                    black_pixels += 1
-        
-        ratio = (red_pixels + black_pixels) / total_pixels
-        return ratio >= threshold
+        return red_black_ratio(image_path) >= threshold
     except Exception as e:
         print(f"[COLOR FILTER ERROR] {e}")
         return False
 
+def image_dhash(image_path, hash_size=8):
+    """64-bit difference hash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour"""
+    image = Image.open(image_path)
+    image.draft('L', (hash_size * 4, hash_size * 4))
+    pixels = np.asarray(image.convert('L').resize((hash_size + 1, hash_size)), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def red_or_black_heavy_batch(image_paths, threshold=0.7, workers=None):
+    """is_image_red_or_black_heavy for many images, spread over a process pool.
+
+    Returns a list of booleans in the order of image_paths.
+    """
+    image_paths = list(image_paths)
+    if not image_paths:
+        return []
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(image_paths) == 1:
+        return [is_image_red_or_black_heavy(path, threshold) for path in image_paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(image_paths) // (workers * 4))
+        return list(executor.map(is_image_red_or_black_heavy, image_paths,
+                                 [threshold] * len(image_paths), chunksize=chunksize))
+
 def remove_hashtags(text):
     import re
     return re.sub(r"#\S+\s*", "", text) 
\ No newline at end of file